@@ -0,0 +1,166 @@
+"""
+Benchmark: XML-RPC vs JSON-RPC en Odoo
+Compara los dos protocolos de odoo_client con payloads idénticos
+
+1. Con credenciales de Odoo: el mismo search_read (modelo, campos, límite)
+   por cada protocolo, midiendo tiempo total y CPU del cliente, y
+   verificando que ambos devuelven los mismos registros.
+2. Decodificación: las mismas filas codificadas como respuesta XML-RPC y
+   como respuesta JSON-RPC, midiendo solo el parseo en el cliente. Usa las
+   filas obtenidas de Odoo o, sin credenciales, filas sintéticas de
+   product.template.
+
+Variables opcionales:
+    BENCH_MODELS   modelos separados por coma (product.template,sale.order,account.move)
+    BENCH_LIMIT    registros por search_read (2000)
+    BENCH_REPEAT   repeticiones por protocolo; se reporta la mediana (5)
+    BENCH_SYNTHETIC_ROWS  filas sintéticas sin Odoo (20000)
+"""
+from dotenv import load_dotenv
+import os
+import json
+import time
+import random
+import statistics
+import xmlrpc.client
+from typing import Dict, List, Optional
+
+from odoo_client import PROTOCOLS, OdooClient
+
+# Cargar variables de entorno
+load_dotenv('.env.local')
+
+BENCH_MODELS = [m.strip() for m in os.getenv('BENCH_MODELS', 'product.template,sale.order,account.move').split(',') if m.strip()]
+BENCH_LIMIT = int(os.getenv('BENCH_LIMIT', '2000'))
+BENCH_REPEAT = int(os.getenv('BENCH_REPEAT', '5'))
+BENCH_SYNTHETIC_ROWS = int(os.getenv('BENCH_SYNTHETIC_ROWS', '20000'))
+
+# Campos por modelo (los de los scripts de inspección); None = todos
+MODEL_FIELDS = {
+    'product.template': ['id', 'name', 'default_code', 'detailed_type', 'list_price',
+                         'standard_price', 'categ_id', 'taxes_id', 'description', 'active', 'write_date'],
+    'sale.order': ['id', 'name', 'partner_id', 'amount_total', 'state', 'date_order',
+                   'order_line', 'write_date'],
+    'account.move': ['id', 'name', 'partner_id', 'amount_total', 'amount_tax', 'state',
+                     'invoice_date', 'payment_state', 'invoice_line_ids', 'write_date'],
+}
+
+def measure(fn, repeat: int) -> Dict:
+    """Mediana de tiempo total y de CPU del proceso (el cliente) de `repeat` llamadas"""
+    walls, cpus = [], []
+    result = None
+    for _ in range(max(1, repeat)):
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = fn()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+    return {'wall': statistics.median(walls), 'cpu': statistics.median(cpus), 'result': result}
+
+def print_row(label: str, protocol: str, stats: Dict, extra: str = ''):
+    print(f"   {label:<18} {protocol:<8} total {stats['wall'] * 1000:9.1f} ms   "
+          f"CPU cliente {stats['cpu'] * 1000:9.1f} ms {extra}")
+
+def print_speedup(label: str, results: Dict[str, Dict]):
+    xml, js = results.get('xmlrpc'), results.get('jsonrpc')
+    if xml and js and js['cpu'] > 0 and js['wall'] > 0:
+        print(f"   ➡️  {label}: JSON-RPC {xml['wall'] / js['wall']:.2f}x en tiempo total, "
+              f"{xml['cpu'] / js['cpu']:.2f}x en CPU del cliente")
+
+def benchmark_online(model: str) -> Optional[List[Dict]]:
+    """Mismo search_read por ambos protocolos. Devuelve las filas obtenidas"""
+    fields = MODEL_FIELDS.get(model)
+    print(f"\n📦 {model} (límite {BENCH_LIMIT}, {len(fields) if fields else 'todos los'} campos)")
+
+    results, rows_by_protocol = {}, {}
+    for protocol in PROTOCOLS:
+        client = OdooClient(os.getenv('ODOO_URL'), os.getenv('ODOO_DB'), os.getenv('ODOO_USERNAME'),
+                            os.getenv('ODOO_PASSWORD'), pool_size=1, protocol=protocol)
+        try:
+            # Calentamiento: autenticación y conexión fuera de la medición
+            client.search_read(model, [], ['id'], limit=1)
+            stats = measure(lambda: client.search_read(model, [], fields, order='id asc', limit=BENCH_LIMIT),
+                            BENCH_REPEAT)
+        except Exception as e:
+            print(f"   ❌ {protocol}: {str(e)}")
+            continue
+        rows_by_protocol[protocol] = stats['result']
+        results[protocol] = stats
+        print_row('search_read', protocol, stats, f"({len(stats['result'])} registros)")
+
+    if len(rows_by_protocol) == len(PROTOCOLS):
+        ids = {protocol: [r['id'] for r in rows] for protocol, rows in rows_by_protocol.items()}
+        if len(set(map(tuple, ids.values()))) == 1:
+            print(f"   ✅ Ambos protocolos devolvieron los mismos {len(ids['xmlrpc'])} registros")
+        else:
+            print("   ⚠️  Los protocolos devolvieron registros distintos (¿cambios en Odoo durante la prueba?)")
+    print_speedup('search_read', results)
+    return rows_by_protocol.get('xmlrpc') or rows_by_protocol.get('jsonrpc')
+
+def benchmark_decode(rows: List[Dict]):
+    """Parseo en el cliente de la misma respuesta codificada por cada protocolo"""
+    bodies = {
+        'xmlrpc': xmlrpc.client.dumps((rows,), methodresponse=True, allow_none=True).encode('utf-8'),
+        'jsonrpc': json.dumps({'jsonrpc': '2.0', 'id': 1, 'result': rows}).encode('utf-8'),
+    }
+    decoders = {
+        # Mismo camino que xmlrpc.client.Transport.parse_response
+        'xmlrpc': lambda body: xmlrpc.client.loads(body)[0][0],
+        'jsonrpc': lambda body: json.loads(body)['result'],
+    }
+    results = {}
+    for protocol, body in bodies.items():
+        stats = measure(lambda: decoders[protocol](body), BENCH_REPEAT)
+        results[protocol] = stats
+        print_row('decodificar', protocol, stats, f"({len(body) / 1024:,.0f} KB)")
+    print_speedup('decodificar', results)
+
+def synthetic_product_templates(count: int) -> List[Dict]:
+    """Filas con la forma de product.template (many2one, listas de ids, texto)"""
+    rnd = random.Random(42)
+    categories = [[i, f'Laboratorio / Categoría {i}'] for i in range(1, 30)]
+    return [{
+        'id': i,
+        'name': f'Producto dental {i}',
+        'default_code': f'PROD-{i:06d}',
+        'detailed_type': rnd.choice(['service', 'product', 'consu']),
+        'list_price': round(rnd.uniform(10, 5000), 2),
+        'standard_price': round(rnd.uniform(5, 2500), 2),
+        'categ_id': rnd.choice(categories),
+        'taxes_id': [rnd.randint(1, 10) for _ in range(rnd.randint(0, 3))],
+        'description': rnd.choice([False, 'Corona de zirconio con acabado estético. ' * rnd.randint(1, 5)]),
+        'active': True,
+        'write_date': f'2026-01-{rnd.randint(1, 28):02d} {rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}:00',
+    } for i in range(1, count + 1)]
+
+def main():
+    """Función principal"""
+    print("\n🚀 Benchmark de protocolos Odoo: XML-RPC vs JSON-RPC\n")
+    print(f"Repeticiones por medición: {BENCH_REPEAT} (se reporta la mediana)")
+
+    has_odoo = all(os.getenv(var) for var in ('ODOO_URL', 'ODOO_DB', 'ODOO_USERNAME', 'ODOO_PASSWORD'))
+
+    print("\n" + "=" * 60)
+    print("PARTE 1: search_read contra Odoo")
+    print("=" * 60)
+    samples = {}
+    if has_odoo:
+        for model in BENCH_MODELS:
+            rows = benchmark_online(model)
+            if rows:
+                samples[model] = rows
+    else:
+        print("\n⚠️  Sin variables ODOO_* en .env.local: se omite la prueba contra Odoo")
+
+    print("\n" + "=" * 60)
+    print("PARTE 2: Decodificación en el cliente (payload idéntico)")
+    print("=" * 60)
+    if not samples:
+        samples = {f'{BENCH_SYNTHETIC_ROWS} product.template sintéticos':
+                   synthetic_product_templates(BENCH_SYNTHETIC_ROWS)}
+    for label, rows in samples.items():
+        print(f"\n📦 {label} ({len(rows)} filas)")
+        benchmark_decode(rows)
+    print("\n")
+
+if __name__ == "__main__":
+    main()
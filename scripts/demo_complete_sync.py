@@ -2,25 +2,53 @@
 Script 3: Demo Complete Odoo Sync
 Sincronización completa de Odoo → Supabase
 """
-import xmlrpc.client
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import os
 import json
-from datetime import datetime
-from typing import Dict, List, Optional
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from odoo_client import OdooClient, get_client
 
 # Cargar variables de entorno
 load_dotenv('.env.local')
 
 # Configuración
-ODOO_URL = os.getenv('ODOO_URL')
-ODOO_DB = os.getenv('ODOO_DB')
-ODOO_USERNAME = os.getenv('ODOO_USERNAME')
-ODOO_PASSWORD = os.getenv('ODOO_PASSWORD')
 SUPABASE_URL = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 
+# Registros por upsert en Supabase (un round trip por lote)
+SYNC_BATCH_SIZE = int(os.getenv('SYNC_BATCH_SIZE', '500'))
+# Registros por página de search_read en Odoo
+ODOO_PAGE_SIZE = int(os.getenv('ODOO_PAGE_SIZE', '1000'))
+
+PARTNER_DOMAIN = [('is_company', '=', True), ('customer_rank', '>', 0)]
+PARTNER_FIELDS = ['id', 'write_date', 'name', 'email', 'phone', 'mobile', 'vat',
+                  'street', 'city', 'country_id', 'property_payment_term_id']
+PRODUCT_DOMAIN = [('sale_ok', '=', True), ('active', '=', True), ('type', '=', 'service')]
+PRODUCT_FIELDS = ['id', 'write_date', 'default_code', 'name', 'categ_id',
+                  'list_price', 'standard_price', 'description', 'active']
+
+# Sincronización incremental por write_date (tabla odoo_sync_watermarks)
+ODOO_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'  # write_date de Odoo, en UTC
+# Cada cuántas horas se hace una pasada completa de reconciliación
+ODOO_FULL_SYNC_HOURS = float(os.getenv('ODOO_FULL_SYNC_HOURS', '24'))
+# Margen hacia atrás sobre la marca, por desfase de relojes o transacciones en curso
+ODOO_WATERMARK_OVERLAP_SECONDS = int(os.getenv('ODOO_WATERMARK_OVERLAP_SECONDS', '300'))
+
+# Pipeline fetch → transform → load: hilos por etapa y tamaño de las colas
+# (una cola llena frena a la etapa anterior)
+SYNC_TRANSFORM_WORKERS = int(os.getenv('SYNC_TRANSFORM_WORKERS', '2'))
+SYNC_LOAD_WORKERS = int(os.getenv('SYNC_LOAD_WORKERS', '4'))
+SYNC_QUEUE_SIZE = int(os.getenv('SYNC_QUEUE_SIZE', '2000'))
+
+# Marca de fin de etapa en las colas del pipeline
+_DONE = object()
+
 # Mapeo de categorías a días de entrega
 TURNAROUND_MAP = {
     'Prótesis': 10,
@@ -29,10 +57,92 @@ TURNAROUND_MAP = {
     'Coronas': 5,
 }
 
+class SyncPipeline:
+    """fetch → transform → load con colas acotadas entre etapas.
+    
+    Un hilo recorre los registros de Odoo (página a página), transform_workers
+    hilos los convierten y load_workers hilos arman lotes y hacen los upserts.
+    Así la latencia de Odoo y la de Supabase se solapan; como las colas son
+    acotadas, si Supabase va lento la descarga espera en vez de acumular
+    memoria.
+    """
+    
+    def __init__(self, sync: 'OdooSyncDemo', table: str, records: Iterable[Dict],
+                 transform: Callable[[Dict], Dict], transform_workers: int = SYNC_TRANSFORM_WORKERS,
+                 load_workers: int = SYNC_LOAD_WORKERS, queue_size: int = SYNC_QUEUE_SIZE):
+        self.sync = sync
+        self.table = table
+        self.records = records
+        self.transform = transform
+        self.transform_workers = max(1, transform_workers)
+        self.load_workers = max(1, load_workers)
+        self.fetched: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.transformed: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.count = 0
+        self.fetch_ok = True
+    
+    def fetch(self):
+        try:
+            for record in self.records:
+                self.count += 1
+                self.fetched.put(record)
+        except Exception as e:
+            # Falla de Odoo a mitad de la descarga: se sube lo ya leído
+            self.fetch_ok = False
+            self.sync.add_error(f"Error obteniendo registros para '{self.table}' tras {self.count}: {str(e)}")
+        finally:
+            for _ in range(self.transform_workers):
+                self.fetched.put(_DONE)
+    
+    def transform_loop(self):
+        while True:
+            record = self.fetched.get()
+            if record is _DONE:
+                return
+            try:
+                self.transformed.put(self.transform(record))
+            except Exception as e:
+                self.sync.record_error(self.table, record.get('name'), str(e))
+    
+    def load_loop(self):
+        batch = []
+        while True:
+            row = self.transformed.get()
+            if row is _DONE:
+                break
+            batch.append(row)
+            if len(batch) >= self.sync.batch_size:
+                self.sync.upsert_batch(self.table, batch)
+                batch = []
+        if batch:
+            self.sync.upsert_batch(self.table, batch)
+    
+    def run(self):
+        """Ejecutar las tres etapas. Devuelve (registros leídos, False si la descarga se cortó)."""
+        fetcher = threading.Thread(target=self.fetch, name=f"{self.table}-fetch")
+        transformers = [threading.Thread(target=self.transform_loop, name=f"{self.table}-transform-{i}")
+                        for i in range(self.transform_workers)]
+        loaders = [threading.Thread(target=self.load_loop, name=f"{self.table}-load-{i}")
+                   for i in range(self.load_workers)]
+        for thread in [fetcher] + transformers + loaders:
+            thread.start()
+        
+        fetcher.join()
+        for thread in transformers:
+            thread.join()
+        # Los loaders terminan cuando ya no queda nada por transformar
+        for _ in loaders:
+            self.transformed.put(_DONE)
+        for thread in loaders:
+            thread.join()
+        return self.count, self.fetch_ok
+
 class OdooSyncDemo:
-    def __init__(self):
-        self.odoo_uid = None
-        self.odoo_models = None
+    def __init__(self, batch_size: int = SYNC_BATCH_SIZE, page_size: int = ODOO_PAGE_SIZE):
+        self.batch_size = max(1, batch_size)
+        self.page_size = max(1, page_size)
+        self.odoo: Optional[OdooClient] = None
+        self._stats_lock = threading.Lock()
         self.supabase: Optional[Client] = None
         self.stats = {
             'clinics_synced': 0,
@@ -49,16 +159,10 @@ class OdooSyncDemo:
         print("=" * 60)
         
         try:
-            common = xmlrpc.client.ServerProxy(f'{ODOO_URL}/xmlrpc/2/common')
-            self.odoo_uid = common.authenticate(ODOO_DB, ODOO_USERNAME, ODOO_PASSWORD, {})
-            
-            if self.odoo_uid:
-                self.odoo_models = xmlrpc.client.ServerProxy(f'{ODOO_URL}/xmlrpc/2/object')
-                print(f"✅ Conectado a Odoo (UID: {self.odoo_uid})")
-                return True
-            else:
-                print("❌ Error: Autenticación fallida")
-                return False
+            # Cliente compartido: pool de conexiones seguro entre hilos y uid en caché
+            self.odoo = get_client()
+            print(f"✅ Conectado a Odoo (UID: {self.odoo.uid})")
+            return True
                 
         except Exception as e:
             print(f"❌ Error conectando a Odoo: {str(e)}")
@@ -79,41 +183,41 @@ class OdooSyncDemo:
             print(f"❌ Error conectando a Supabase: {str(e)}")
             return False
     
-    def fetch_odoo_partners(self, limit: int = 10) -> List[Dict]:
-        """Obtener partners de Odoo"""
-        print("\n" + "=" * 60)
-        print(f"PASO 3: Obteniendo Partners de Odoo (límite: {limit})")
-        print("=" * 60)
+    def iter_odoo_records(self, model: str, domain: List, fields: List[str],
+                          limit: Optional[int] = None) -> Iterator[Dict]:
+        """Recorrer un modelo de Odoo por páginas de search_read.
         
-        try:
-            # Buscar partners
-            partner_ids = self.odoo_models.execute_kw(
-                ODOO_DB, self.odoo_uid, ODOO_PASSWORD,
-                'res.partner', 'search',
-                [[('is_company', '=', True), ('customer_rank', '>', 0)]],
-                {'limit': limit}
+        Pagina con un cursor sobre id (id > último id visto, orden por id), así
+        cada página es una consulta indexada aunque haya cientos de miles de
+        registros, y los registros se entregan apenas llega cada página.
+        """
+        last_id = 0
+        fetched = 0
+        while limit is None or fetched < limit:
+            page_limit = self.page_size if limit is None else min(self.page_size, limit - fetched)
+            page = self.odoo.search_read(
+                model, domain + [('id', '>', last_id)], fields,
+                order='id asc', limit=page_limit
             )
+            if not page:
+                return
             
-            print(f"📋 Encontrados {len(partner_ids)} partners")
+            fetched += len(page)
+            last_id = page[-1]['id']
+            print(f"   📄 {model}: página de {len(page)} registros ({fetched} en total)")
+            yield from page
             
-            if not partner_ids:
-                return []
-            
-            # Leer datos completos
-            partners = self.odoo_models.execute_kw(
-                ODOO_DB, self.odoo_uid, ODOO_PASSWORD,
-                'res.partner', 'read',
-                [partner_ids],
-                {'fields': ['id', 'name', 'email', 'phone', 'mobile', 'vat',
-                           'street', 'city', 'country_id', 'property_payment_term_id']}
-            )
-            
-            print(f"✅ Datos obtenidos de {len(partners)} partners")
-            return partners
-            
-        except Exception as e:
-            print(f"❌ Error obteniendo partners: {str(e)}")
-            return []
+            if len(page) < page_limit:
+                return
+    
+    def fetch_odoo_partners(self, limit: Optional[int] = None, since: Optional[str] = None) -> Iterator[Dict]:
+        """Obtener partners de Odoo (generador paginado), opcionalmente solo los modificados desde `since`"""
+        print("\n" + "=" * 60)
+        print(f"PASO 3: Obteniendo Partners de Odoo (límite: {limit or 'todos'}, páginas de {self.page_size})")
+        print("=" * 60)
+        
+        domain = PARTNER_DOMAIN + ([('write_date', '>=', since)] if since else [])
+        return self.iter_odoo_records('res.partner', domain, PARTNER_FIELDS, limit)
     
     def transform_partner_to_clinic(self, partner: Dict) -> Dict:
         """Transformar partner de Odoo a clinic de la app"""
@@ -145,77 +249,88 @@ class OdooSyncDemo:
         
         return clinic
     
-    def sync_clinics(self, partners: List[Dict]):
-        """Sincronizar partners como clinics en Supabase"""
-        print("\n" + "=" * 60)
-        print(f"PASO 4: Sincronizando {len(partners)} Clinics a Supabase")
-        print("=" * 60)
+    def upsert_batch(self, table: str, rows: List[Dict]):
+        """Upsert de un lote; si el lote falla, reintenta fila por fila.
         
-        for i, partner in enumerate(partners, 1):
+        Las estadísticas usan el nombre de la tabla ('clinics', 'services').
+        """
+        # Postgres rechaza un upsert que toca la misma fila dos veces
+        rows = list({row['odoo_id']: row for row in rows}.values())
+        
+        try:
+            response = self.supabase.table(table).upsert(
+                rows,
+                on_conflict='odoo_id'
+            ).execute()
+            returned = {r.get('odoo_id') for r in (response.data or [])}
+            for row in rows:
+                if row['odoo_id'] in returned:
+                    self.count_synced(table)
+                else:
+                    self.record_error(table, row['name'], 'Sin datos retornados')
+            print(f"   ✅ {table}: lote de {len(rows)} registros sincronizado")
+            return
+        except Exception as e:
+            print(f"   ⚠️  {table}: lote de {len(rows)} falló ({str(e)}), reintentando fila por fila")
+        
+        for row in rows:
             try:
-                # Transformar
-                clinic = self.transform_partner_to_clinic(partner)
-                
-                print(f"\n[{i}/{len(partners)}] Sincronizando: {clinic['name']}")
-                print(f"   Odoo ID: {clinic['odoo_id']}")
-                print(f"   Email: {clinic.get('email') or 'N/A'}")
-                print(f"   Phone: {clinic.get('phone') or 'N/A'}")
-                print(f"   Payment: {clinic['payment_policy']}")
-                
-                # Upsert en Supabase
-                response = self.supabase.table('clinics').upsert(
-                    clinic,
+                response = self.supabase.table(table).upsert(
+                    row,
                     on_conflict='odoo_id'
                 ).execute()
                 
                 if response.data:
-                    print(f"   ✅ Sincronizado (ID: {response.data[0]['id']})")
-                    self.stats['clinics_synced'] += 1
+                    self.count_synced(table)
                 else:
-                    print(f"   ⚠️  Sin datos retornados")
-                    self.stats['clinics_errors'] += 1
+                    self.record_error(table, row['name'], 'Sin datos retornados')
                     
             except Exception as e:
-                error_msg = f"Error sincronizando {partner.get('name')}: {str(e)}"
-                print(f"   ❌ {error_msg}")
-                self.stats['clinics_errors'] += 1
-                self.stats['errors'].append(error_msg)
+                self.record_error(table, row['name'], str(e))
+    
+    def count_synced(self, table: str):
+        with self._stats_lock:
+            self.stats[f'{table}_synced'] += 1
+    
+    def record_error(self, table: str, name: Optional[str], message: str):
+        """Registrar el error de un registro en las estadísticas"""
+        with self._stats_lock:
+            self.stats[f'{table}_errors'] += 1
+        self.add_error(f"Error sincronizando {name}: {message}")
+    
+    def add_error(self, error_msg: str):
+        print(f"   ❌ {error_msg}")
+        with self._stats_lock:
+            self.stats['errors'].append(error_msg)
     
-    def fetch_odoo_products(self, limit: int = 10) -> List[Dict]:
-        """Obtener productos de Odoo"""
+    def sync_records(self, table: str, records: Iterable[Dict], transform: Callable[[Dict], Dict]):
+        """Transformar registros de Odoo y subirlos en lotes de batch_size.
+        
+        records puede ser un generador: corre en su propio hilo del pipeline y
+        cada lote se envía en cuanto se llena, sin esperar a que termine la
+        descarga. Devuelve (registros leídos, False si la descarga de Odoo se
+        cortó).
+        """
+        return SyncPipeline(self, table, records, transform).run()
+    
+    def sync_clinics(self, partners: Iterable[Dict]):
+        """Sincronizar partners como clinics en Supabase"""
         print("\n" + "=" * 60)
-        print(f"PASO 5: Obteniendo Productos de Odoo (límite: {limit})")
+        print(f"PASO 4: Sincronizando Clinics a Supabase (lotes de {self.batch_size})")
         print("=" * 60)
         
-        try:
-            # Buscar productos
-            product_ids = self.odoo_models.execute_kw(
-                ODOO_DB, self.odoo_uid, ODOO_PASSWORD,
-                'product.product', 'search',
-                [[('sale_ok', '=', True), ('active', '=', True), ('type', '=', 'service')]],
-                {'limit': limit}
-            )
-            
-            print(f"📋 Encontrados {len(product_ids)} productos")
-            
-            if not product_ids:
-                return []
-            
-            # Leer datos completos
-            products = self.odoo_models.execute_kw(
-                ODOO_DB, self.odoo_uid, ODOO_PASSWORD,
-                'product.product', 'read',
-                [product_ids],
-                {'fields': ['id', 'default_code', 'name', 'categ_id',
-                           'list_price', 'standard_price', 'description', 'active']}
-            )
-            
-            print(f"✅ Datos obtenidos de {len(products)} productos")
-            return products
-            
-        except Exception as e:
-            print(f"❌ Error obteniendo productos: {str(e)}")
-            return []
+        count, fetch_ok = self.sync_records('clinics', partners, self.transform_partner_to_clinic)
+        print(f"\n📋 {count} partners procesados")
+        return count, fetch_ok
+    
+    def fetch_odoo_products(self, limit: Optional[int] = None, since: Optional[str] = None) -> Iterator[Dict]:
+        """Obtener productos de Odoo (generador paginado), opcionalmente solo los modificados desde `since`"""
+        print("\n" + "=" * 60)
+        print(f"PASO 5: Obteniendo Productos de Odoo (límite: {limit or 'todos'}, páginas de {self.page_size})")
+        print("=" * 60)
+        
+        domain = PRODUCT_DOMAIN + ([('write_date', '>=', since)] if since else [])
+        return self.iter_odoo_records('product.product', domain, PRODUCT_FIELDS, limit)
     
     def transform_product_to_service(self, product: Dict) -> Dict:
         """Transformar producto de Odoo a service de la app"""
@@ -243,42 +358,105 @@ class OdooSyncDemo:
         
         return service
     
-    def sync_services(self, products: List[Dict]):
+    def sync_services(self, products: Iterable[Dict]):
         """Sincronizar productos como services en Supabase"""
         print("\n" + "=" * 60)
-        print(f"PASO 6: Sincronizando {len(products)} Services a Supabase")
+        print(f"PASO 6: Sincronizando Services a Supabase (lotes de {self.batch_size})")
         print("=" * 60)
         
-        for i, product in enumerate(products, 1):
-            try:
-                # Transformar
-                service = self.transform_product_to_service(product)
-                
-                print(f"\n[{i}/{len(products)}] Sincronizando: {service['name']}")
-                print(f"   Odoo ID: {service['odoo_id']}")
-                print(f"   Código: {service['code']}")
-                print(f"   Categoría: {service.get('category') or 'N/A'}")
-                print(f"   Precio GTQ: Q{service['cost_price_gtq']:.2f}")
-                print(f"   Precio USD: ${service['cost_price_usd']:.2f}")
-                
-                # Upsert en Supabase
-                response = self.supabase.table('services').upsert(
-                    service,
-                    on_conflict='odoo_id'
-                ).execute()
-                
-                if response.data:
-                    print(f"   ✅ Sincronizado (ID: {response.data[0]['id']})")
-                    self.stats['services_synced'] += 1
-                else:
-                    print(f"   ⚠️  Sin datos retornados")
-                    self.stats['services_errors'] += 1
-                    
-            except Exception as e:
-                error_msg = f"Error sincronizando {product.get('name')}: {str(e)}"
-                print(f"   ❌ {error_msg}")
-                self.stats['services_errors'] += 1
-                self.stats['errors'].append(error_msg)
+        count, fetch_ok = self.sync_records('services', products, self.transform_product_to_service)
+        print(f"\n📦 {count} productos procesados")
+        return count, fetch_ok
+    
+    def load_watermark(self, model: str) -> Optional[Dict]:
+        """Leer la marca de write_date de un modelo (None = nunca sincronizado)"""
+        try:
+            response = self.supabase.table('odoo_sync_watermarks').select('*').eq('model', model).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            print(f"⚠️  No se pudo leer la marca de {model} ({str(e)}), se hará sincronización completa")
+            return None
+    
+    def save_watermark(self, model: str, watermark: Optional[Dict], max_write_date: Optional[str],
+                       full: bool, count: int, started: datetime):
+        """Avanzar la marca de un modelo tras una sincronización sin errores"""
+        row = {
+            'model': model,
+            # Sin cambios en esta corrida: se conserva la marca anterior
+            'last_write_date': f"{max_write_date}+00" if max_write_date else (watermark or {}).get('last_write_date'),
+            'last_full_sync': started.isoformat() if full else (watermark or {}).get('last_full_sync'),
+            'records_synced': count,
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+        }
+        try:
+            self.supabase.table('odoo_sync_watermarks').upsert(row, on_conflict='model').execute()
+        except Exception as e:
+            self.add_error(f"Error guardando la marca de {model}: {str(e)}")
+    
+    def log_sync(self, module: str, status: str, processed: int, failed: int,
+                 started: datetime, error_message: Optional[str] = None):
+        """Registrar la corrida en odoo_sync_log"""
+        try:
+            self.supabase.table('odoo_sync_log').insert({
+                'module': module,
+                'operation': 'import',
+                'status': status,
+                'records_processed': processed,
+                'records_failed': failed,
+                'error_message': error_message,
+                'started_at': started.isoformat(),
+                'completed_at': datetime.now(timezone.utc).isoformat(),
+            }).execute()
+        except Exception as e:
+            print(f"⚠️  No se pudo registrar en odoo_sync_log: {str(e)}")
+    
+    def incremental_since(self, watermark: Optional[Dict], now: datetime) -> Optional[str]:
+        """write_date desde el que pedir cambios, o None si toca pasada completa"""
+        if not watermark or not watermark.get('last_write_date'):
+            return None
+        last_full = watermark.get('last_full_sync')
+        if not last_full or now - datetime.fromisoformat(last_full) >= timedelta(hours=ODOO_FULL_SYNC_HOURS):
+            return None
+        since = datetime.fromisoformat(watermark['last_write_date']).astimezone(timezone.utc)
+        since -= timedelta(seconds=ODOO_WATERMARK_OVERLAP_SECONDS)
+        return since.strftime(ODOO_DATETIME_FORMAT)
+    
+    def sync_model(self, model: str, module: str, table: str, fetch, sync,
+                   limit: Optional[int] = None, full: bool = False):
+        """Sincronizar un modelo de forma incremental según su marca de write_date.
+        
+        La marca solo avanza si la corrida no tuvo errores y no tenía límite;
+        si no, la próxima corrida vuelve a pedir el mismo delta (los upserts
+        son idempotentes).
+        """
+        started = datetime.now(timezone.utc)
+        watermark = self.load_watermark(model)
+        since = None if full else self.incremental_since(watermark, started)
+        print(f"\n🔖 {model}: " + (f"sincronización incremental (write_date >= {since})" if since
+                                    else "sincronización completa (reconciliación)"))
+        
+        max_write_date = None
+        
+        def track_write_date(records):
+            nonlocal max_write_date
+            for record in records:
+                write_date = record.get('write_date')
+                # Formato fijo de Odoo: la comparación de cadenas sigue el orden cronológico
+                if write_date and (max_write_date is None or write_date > max_write_date):
+                    max_write_date = write_date
+                yield record
+        
+        errors_before = self.stats[f'{table}_errors']
+        count, fetch_ok = sync(track_write_date(fetch(limit=limit, since=since)))
+        failed = self.stats[f'{table}_errors'] - errors_before
+        
+        if fetch_ok and not failed and limit is None:
+            self.save_watermark(model, watermark, max_write_date, since is None, count, started)
+        else:
+            print(f"   ⚠️  Marca de {model} sin avanzar (errores o corrida limitada)")
+        status = 'error' if not fetch_ok else 'partial' if failed else 'success'
+        self.log_sync(module, status, count, failed, started,
+                      None if fetch_ok else f"Descarga de {model} interrumpida")
     
     def print_summary(self):
         """Imprimir resumen de la sincronización"""
@@ -317,7 +495,8 @@ class OdooSyncDemo:
         
         print(f"\n💾 Reporte guardado en 'scripts/sync_report.json'")
     
-    def run(self, limit_clinics: int = 10, limit_services: int = 10):
+    def run(self, limit_clinics: Optional[int] = None, limit_services: Optional[int] = None,
+            full: bool = False):
         """Ejecutar sincronización completa"""
         print("\n🚀 DEMO: Sincronización Completa Odoo → Supabase\n")
         
@@ -329,15 +508,17 @@ class OdooSyncDemo:
         if not self.connect_supabase():
             return
         
-        # Sincronizar Clinics
-        partners = self.fetch_odoo_partners(limit=limit_clinics)
-        if partners:
-            self.sync_clinics(partners)
-        
-        # Sincronizar Services
-        products = self.fetch_odoo_products(limit=limit_services)
-        if products:
-            self.sync_services(products)
+        # Clinics y Services en paralelo, cada uno con su pipeline (solo
+        # cambios desde la última marca)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            jobs = [
+                pool.submit(self.sync_model, 'res.partner', 'customers', 'clinics',
+                            self.fetch_odoo_partners, self.sync_clinics, limit=limit_clinics, full=full),
+                pool.submit(self.sync_model, 'product.product', 'products', 'services',
+                            self.fetch_odoo_products, self.sync_services, limit=limit_services, full=full),
+            ]
+            for job in jobs:
+                job.result()
         
         # Resumen
         self.print_summary()
@@ -365,7 +546,10 @@ def main():
     
     # Ejecutar demo
     demo = OdooSyncDemo()
-    demo.run(limit_clinics=10, limit_services=10)
+    limit = int(os.getenv('SYNC_LIMIT', '0')) or None
+    # SYNC_FULL=1 fuerza la pasada completa aunque haya marca reciente
+    full = os.getenv('SYNC_FULL', '').lower() in ('1', 'true', 'yes')
+    demo.run(limit_clinics=limit, limit_services=limit, full=full)
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,8 @@
-import xmlrpc.client
 import os
 from dotenv import load_dotenv
 
+from odoo_client import get_client
+
 load_dotenv('.env.local')
 
 url = os.getenv('ODOO_URL')
@@ -13,17 +14,12 @@ if not all([url, db, username, password]):
     print("❌ Missing vars")
     exit(1)
 
-common = xmlrpc.client.ServerProxy('{}/xmlrpc/2/common'.format(url))
-uid = common.authenticate(db, username, password, {})
-models = xmlrpc.client.ServerProxy('{}/xmlrpc/2/object'.format(url))
+odoo = get_client()
 
 print("📦 ANALYZING CATEGORIES...")
 
 # Get unique category IDs from products first
-products = models.execute_kw(db, uid, password, 'product.template', 'search_read',
-    [], 
-    {'fields': ['categ_id', 'detailed_type'], 'limit': 100}
-)
+products = odoo.search_read('product.template', [], ['categ_id', 'detailed_type'], limit=100)
 
 cat_ids = set()
 types = set()
@@ -37,10 +33,7 @@ print(f"Found types: {types}")
 
 # Fetch Category Details
 if cat_ids:
-    cats = models.execute_kw(db, uid, password, 'product.category', 'search_read',
-        [[('id', 'in', list(cat_ids))]], 
-        {'fields': ['id', 'name', 'parent_id']}
-    )
+    cats = odoo.search_read('product.category', [('id', 'in', list(cat_ids))], ['id', 'name', 'parent_id'])
     
     print("\nEXISTING ODOO CATEGORIES:")
     for c in cats:
@@ -1,7 +1,8 @@
-import xmlrpc.client
 import os
 from dotenv import load_dotenv
 
+from odoo_client import get_client
+
 load_dotenv('.env.local')
 
 url = os.getenv('ODOO_URL')
@@ -12,9 +13,7 @@ password = os.getenv('ODOO_PASSWORD')
 if not all([url, db, username, password]):
     exit(1)
 
-common = xmlrpc.client.ServerProxy('{}/xmlrpc/2/common'.format(url))
-uid = common.authenticate(db, username, password, {})
-models = xmlrpc.client.ServerProxy('{}/xmlrpc/2/object'.format(url))
+odoo = get_client()
 
 print("📄 FETCHING INVOICES (account.move)...")
 
@@ -25,10 +24,7 @@ fields = [
     'state', 'invoice_date', 'payment_state', 'invoice_line_ids'
 ]
 
-invoices = models.execute_kw(db, uid, password, 'account.move', 'search_read',
-    [domain], 
-    {'fields': fields, 'limit': 5}
-)
+invoices = odoo.search_read('account.move', domain, fields, limit=5)
 
 print(f"Found {len(invoices)} invoices.\n")
 
@@ -1,8 +1,9 @@
-import xmlrpc.client
 import os
 import json
 from dotenv import load_dotenv
 
+from odoo_client import get_client
+
 # Load environment variables
 load_dotenv('.env.local')
 
@@ -18,15 +19,8 @@ if not all([url, db, username, password]):
 print(f"CONNECTING TO: {url} ({db})")
 
 try:
-    common = xmlrpc.client.ServerProxy('{}/xmlrpc/2/common'.format(url))
-    uid = common.authenticate(db, username, password, {})
-    
-    if not uid:
-        print("❌ Authentication Failed")
-        exit(1)
-        
-    print(f"✅ Authenticated with UID: {uid}")
-    models = xmlrpc.client.ServerProxy('{}/xmlrpc/2/object'.format(url))
+    odoo = get_client()
+    print(f"✅ Authenticated with UID: {odoo.uid}")
 
     # --- TEST PRODUCTS (product.template) ---
     print("\n📦 FETCHING PRODUCTS (product.template)...")
@@ -45,10 +39,7 @@ try:
     ]
     
     # Fetch first 10 products
-    products = models.execute_kw(db, uid, password, 'product.template', 'search_read',
-        [[('active', '=', True)]], 
-        {'fields': fields, 'limit': 10}
-    )
+    products = odoo.search_read('product.template', [('active', '=', True)], fields, limit=10)
     
     print(f"Found {len(products)} products. Analyzing structure...\n")
     
@@ -65,10 +56,7 @@ try:
     # --- TEST SALES (sale.order) ---
     print("\n💰 FETCHING SALES (sale.order)...")
     sale_fields = ['id', 'name', 'partner_id', 'amount_total', 'state', 'date_order', 'order_line']
-    sales = models.execute_kw(db, uid, password, 'sale.order', 'search_read',
-        [], 
-        {'fields': sale_fields, 'limit': 5}
-    )
+    sales = odoo.search_read('sale.order', [], sale_fields, limit=5)
     
     for s in sales:
         total = s.get('amount_total') or 0.0
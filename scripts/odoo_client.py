@@ -0,0 +1,314 @@
+"""
+Cliente Odoo compartido por los scripts de sincronización
+
+- Dos protocolos con la misma interfaz, elegidos con ODOO_PROTOCOL:
+  'xmlrpc' (/xmlrpc/2/*, por defecto) o 'jsonrpc' (/jsonrpc). Con
+  resultados grandes de search_read, JSON se decodifica bastante más rápido
+  que XML (ver benchmark_odoo_transports.py). Los errores de Odoo llegan
+  como xmlrpc.client.Fault en ambos casos.
+- Pool de conexiones HTTP keep-alive: cada conexión reutiliza su socket
+  entre llamadas.
+- uid en caché: se autentica una vez por proceso y el uid se guarda en
+  ODOO_SESSION_CACHE para las siguientes corridas (si Odoo lo rechaza, se
+  vuelve a autenticar).
+- Seguro entre hilos: cada llamada toma una conexión del pool, así varios
+  workers pueden consultar Odoo a la vez.
+- Reintentos con backoff exponencial ante errores transitorios (conexión
+  caída, timeout, HTTP 429/502/503/504).
+
+Uso:
+    from odoo_client import get_client
+
+    odoo = get_client()
+    partners = odoo.search_read('res.partner', [('is_company', '=', True)], ['name'], limit=5)
+"""
+import xmlrpc.client
+import http.client
+import itertools
+import os
+import json
+import queue
+import random
+import socket
+import tempfile
+import threading
+import time
+import urllib.parse
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+# Cargar variables de entorno (también las de este módulo)
+load_dotenv('.env.local')
+
+# 'xmlrpc' o 'jsonrpc'
+ODOO_PROTOCOL = os.getenv('ODOO_PROTOCOL', 'xmlrpc').lower()
+# Conexiones simultáneas como máximo (una por hilo que esté llamando a Odoo)
+ODOO_POOL_SIZE = int(os.getenv('ODOO_POOL_SIZE', '8'))
+ODOO_TIMEOUT_SECONDS = float(os.getenv('ODOO_TIMEOUT_SECONDS', '60'))
+ODOO_RETRIES = int(os.getenv('ODOO_RETRIES', '3'))
+ODOO_BACKOFF_SECONDS = float(os.getenv('ODOO_BACKOFF_SECONDS', '0.5'))
+ODOO_SESSION_CACHE = os.getenv('ODOO_SESSION_CACHE',
+                               os.path.join(tempfile.gettempdir(), 'odoo_session.json'))
+
+# Códigos HTTP que indican sobrecarga o un proxy caído, no un error de la llamada
+RETRY_HTTP_CODES = {429, 502, 503, 504}
+
+# Métodos de solo lectura: se reintentan ante cualquier error transitorio. El
+# resto (create, write...) solo si la petición no llegó a Odoo, para no
+# aplicar un cambio dos veces.
+READ_METHODS = {
+    'search', 'read', 'search_read', 'search_count', 'read_group',
+    'fields_get', 'name_search', 'name_get', 'default_get',
+}
+
+class OdooError(Exception):
+    """Error de Odoo o de autenticación"""
+
+class _TimeoutTransport(xmlrpc.client.Transport):
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        conn = super().make_connection(host)
+        conn.timeout = self.timeout
+        return conn
+
+class _SafeTimeoutTransport(xmlrpc.client.SafeTransport):
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        conn = super().make_connection(host)
+        conn.timeout = self.timeout
+        return conn
+
+class _XmlRpcConnection:
+    """Conexión keep-alive a /xmlrpc/2/<service>"""
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url
+        if url.startswith('https'):
+            self.transport = _SafeTimeoutTransport(timeout)
+        else:
+            self.transport = _TimeoutTransport(timeout)
+
+    def call(self, service: str, method: str, args: tuple) -> Any:
+        proxy = xmlrpc.client.ServerProxy(f'{self.url}/xmlrpc/2/{service}',
+                                          transport=self.transport, allow_none=True)
+        return getattr(proxy, method)(*args)
+
+    def close(self):
+        self.transport.close()
+
+class _JsonRpcConnection:
+    """Conexión keep-alive a /jsonrpc: mismos service/method/args que XML-RPC"""
+
+    def __init__(self, url: str, timeout: float):
+        parts = urllib.parse.urlsplit(url)
+        self.endpoint = f'{url}/jsonrpc'
+        self.path = parts.path.rstrip('/') + '/jsonrpc'
+        if parts.scheme == 'https':
+            self.conn = http.client.HTTPSConnection(parts.netloc, timeout=timeout)
+        else:
+            self.conn = http.client.HTTPConnection(parts.netloc, timeout=timeout)
+        self._ids = itertools.count(1)
+
+    def call(self, service: str, method: str, args: tuple) -> Any:
+        body = json.dumps({
+            'jsonrpc': '2.0',
+            'method': 'call',
+            'params': {'service': service, 'method': method, 'args': list(args)},
+            'id': next(self._ids),
+        }).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        for attempt in (0, 1):
+            try:
+                self.conn.request('POST', self.path, body, headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError):
+                # El servidor cerró el socket keep-alive: se reconecta una vez,
+                # igual que xmlrpc.client.Transport
+                self.conn.close()
+                if attempt:
+                    raise
+
+        if response.status != 200:
+            raise xmlrpc.client.ProtocolError(self.endpoint, response.status, response.reason,
+                                              dict(response.getheaders()))
+        reply = json.loads(data)
+        error = reply.get('error')
+        if error:
+            info = error.get('data') or {}
+            raise xmlrpc.client.Fault(error.get('code', 0),
+                                      f"{info.get('name', '')}: {info.get('message') or error.get('message')}")
+        return reply.get('result')
+
+    def close(self):
+        self.conn.close()
+
+PROTOCOLS = {'xmlrpc': _XmlRpcConnection, 'jsonrpc': _JsonRpcConnection}
+
+def _is_access_denied(fault: xmlrpc.client.Fault) -> bool:
+    return 'AccessDenied' in fault.faultString or 'Access Denied' in fault.faultString
+
+class OdooClient:
+    """Cliente de Odoo (XML-RPC o JSON-RPC) con pool de conexiones, uid en caché y reintentos"""
+
+    def __init__(self, url: str, db: str, username: str, password: str,
+                 pool_size: int = ODOO_POOL_SIZE, timeout: float = ODOO_TIMEOUT_SECONDS,
+                 retries: int = ODOO_RETRIES, backoff: float = ODOO_BACKOFF_SECONDS,
+                 session_cache: Optional[str] = ODOO_SESSION_CACHE, protocol: str = ODOO_PROTOCOL):
+        if protocol not in PROTOCOLS:
+            raise OdooError(f"Protocolo no soportado: {protocol} (usar {' o '.join(PROTOCOLS)})")
+        self.url = url.rstrip('/')
+        self.protocol = protocol
+        self.db = db
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.session_cache = session_cache
+        self._uid: Optional[int] = None
+        self._auth_lock = threading.Lock()
+        # LIFO: se reutiliza primero la conexión más reciente (socket aún abierto)
+        self._pool: queue.LifoQueue = queue.LifoQueue(maxsize=max(1, pool_size))
+        for _ in range(max(1, pool_size)):
+            self._pool.put(None)  # Conexión creada al primer uso
+
+    # --- conexiones ---
+
+    def _call(self, service: str, method: str, *args, retry_all: bool = True) -> Any:
+        """Llamar a <service>.<method> con una conexión del pool, reintentando errores transitorios"""
+        attempt = 0
+        while True:
+            conn = self._pool.get() or PROTOCOLS[self.protocol](self.url, self.timeout)
+            keep = True
+            try:
+                return conn.call(service, method, args)
+            except xmlrpc.client.Fault:
+                raise
+            except Exception as e:
+                # La conexión puede haber quedado a medias: se descarta
+                keep = False
+                conn.close()
+                if attempt >= self.retries or not self._is_transient(e, retry_all):
+                    raise
+            finally:
+                self._pool.put(conn if keep else None)
+
+            delay = self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+            attempt += 1
+            print(f"   ⚠️  Odoo {service}.{method}: error transitorio, reintento {attempt}/{self.retries} en {delay:.1f}s")
+            time.sleep(delay)
+
+    @staticmethod
+    def _is_transient(error: Exception, retry_all: bool) -> bool:
+        if isinstance(error, ConnectionRefusedError):
+            return True  # La petición no llegó a enviarse
+        if isinstance(error, xmlrpc.client.ProtocolError):
+            return error.errcode in RETRY_HTTP_CODES and (retry_all or error.errcode in (429, 503))
+        return retry_all and isinstance(error, (ConnectionError, socket.timeout, http.client.HTTPException))
+
+    # --- sesión ---
+
+    def _cache_key(self) -> str:
+        return f"{self.url}|{self.db}|{self.username}"
+
+    def _load_cached_uid(self) -> Optional[int]:
+        if not self.session_cache:
+            return None
+        try:
+            with open(self.session_cache, 'r', encoding='utf-8') as f:
+                return json.load(f).get(self._cache_key())
+        except (OSError, ValueError):
+            return None
+
+    def _save_cached_uid(self, uid: Optional[int]):
+        if not self.session_cache:
+            return
+        try:
+            with open(self.session_cache, 'r', encoding='utf-8') as f:
+                sessions = json.load(f)
+        except (OSError, ValueError):
+            sessions = {}
+        if uid:
+            sessions[self._cache_key()] = uid
+        else:
+            sessions.pop(self._cache_key(), None)
+        try:
+            with open(self.session_cache, 'w', encoding='utf-8') as f:
+                json.dump(sessions, f)
+        except OSError:
+            pass  # Sin caché en disco solo se pierde la autenticación ahorrada
+
+    def authenticate(self, force: bool = False) -> int:
+        """Devolver el uid, autenticando solo si no está en caché"""
+        with self._auth_lock:
+            if self._uid and not force:
+                return self._uid
+            uid = None if force else self._load_cached_uid()
+            if not uid:
+                uid = self._call('common', 'authenticate', self.db, self.username, self.password, {})
+                if not uid:
+                    raise OdooError(f"Autenticación fallida para {self.username} en {self.db}")
+                self._save_cached_uid(uid)
+            self._uid = uid
+            return uid
+
+    @property
+    def uid(self) -> int:
+        return self._uid or self.authenticate()
+
+    def version(self) -> Dict:
+        return self._call('common', 'version')
+
+    # --- modelos ---
+
+    def execute_kw(self, model: str, method: str, args: Optional[List] = None,
+                   kwargs: Optional[Dict] = None) -> Any:
+        """execute_kw sobre /object; si Odoo rechaza un uid en caché, se reautentica una vez"""
+        retry_all = method in READ_METHODS
+        uid = self.uid
+        try:
+            return self._call('object', 'execute_kw', self.db, uid, self.password,
+                              model, method, args or [], kwargs or {}, retry_all=retry_all)
+        except xmlrpc.client.Fault as e:
+            if not _is_access_denied(e):
+                raise
+            self._save_cached_uid(None)
+            uid = self.authenticate(force=True)
+            return self._call('object', 'execute_kw', self.db, uid, self.password,
+                              model, method, args or [], kwargs or {}, retry_all=retry_all)
+
+    def search(self, model: str, domain: List, **kwargs) -> List[int]:
+        return self.execute_kw(model, 'search', [domain], kwargs)
+
+    def read(self, model: str, ids: List[int], fields: Optional[List[str]] = None) -> List[Dict]:
+        return self.execute_kw(model, 'read', [ids], {'fields': fields} if fields else {})
+
+    def search_read(self, model: str, domain: Optional[List] = None,
+                    fields: Optional[List[str]] = None, **kwargs) -> List[Dict]:
+        if fields:
+            kwargs['fields'] = fields
+        return self.execute_kw(model, 'search_read', [domain or []], kwargs)
+
+_shared_client: Optional[OdooClient] = None
+_shared_lock = threading.Lock()
+
+def get_client() -> OdooClient:
+    """Cliente compartido del proceso, configurado con ODOO_URL/ODOO_DB/ODOO_USERNAME/ODOO_PASSWORD"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            missing = [var for var in ('ODOO_URL', 'ODOO_DB', 'ODOO_USERNAME', 'ODOO_PASSWORD')
+                       if not os.getenv(var)]
+            if missing:
+                raise OdooError(f"Faltan variables de entorno: {', '.join(missing)}")
+            _shared_client = OdooClient(os.getenv('ODOO_URL'), os.getenv('ODOO_DB'),
+                                        os.getenv('ODOO_USERNAME'), os.getenv('ODOO_PASSWORD'))
+        return _shared_client
@@ -1,52 +1,32 @@
 """
 Query Odoo: Companies and their Contacts
 """
-import xmlrpc.client
 from dotenv import load_dotenv
 import os
 from tabulate import tabulate
 
+from odoo_client import get_client
+
 # Cargar variables de entorno
 load_dotenv('.env.local')
 
-# Configuración de Odoo
-ODOO_URL = os.getenv('ODOO_URL')
-ODOO_DB = os.getenv('ODOO_DB')
-ODOO_USERNAME = os.getenv('ODOO_USERNAME')
-ODOO_PASSWORD = os.getenv('ODOO_PASSWORD')
-
 def main():
     print("=" * 80)
     print("CONSULTA ODOO: Empresas y sus Contactos")
     print("=" * 80)
     
     try:
-        # Conectar a Odoo
-        common = xmlrpc.client.ServerProxy(f'{ODOO_URL}/xmlrpc/2/common')
-        uid = common.authenticate(ODOO_DB, ODOO_USERNAME, ODOO_PASSWORD, {})
-        
-        if not uid:
-            print("❌ Error: Autenticación fallida")
-            return
-        
-        print(f"\n✅ Conectado a Odoo (UID: {uid})")
-        
-        models = xmlrpc.client.ServerProxy(f'{ODOO_URL}/xmlrpc/2/object')
+        # Conectar a Odoo (cliente compartido, uid en caché)
+        odoo = get_client()
+        print(f"\n✅ Conectado a Odoo (UID: {odoo.uid})")
         
         # 1. Obtener empresas (is_company=True, customer_rank>0)
         print("\n📋 Obteniendo empresas...")
-        company_ids = models.execute_kw(
-            ODOO_DB, uid, ODOO_PASSWORD,
-            'res.partner', 'search',
-            [[('is_company', '=', True), ('customer_rank', '>', 0)]],
-            {'limit': 20}
-        )
-        
-        companies = models.execute_kw(
-            ODOO_DB, uid, ODOO_PASSWORD,
-            'res.partner', 'read',
-            [company_ids],
-            {'fields': ['id', 'name', 'email', 'phone', 'mobile', 'vat', 'child_ids']}
+        companies = odoo.search_read(
+            'res.partner',
+            [('is_company', '=', True), ('customer_rank', '>', 0)],
+            ['id', 'name', 'email', 'phone', 'mobile', 'vat', 'child_ids'],
+            limit=20
         )
         
         print(f"✅ Encontradas {len(companies)} empresas\n")
@@ -65,11 +45,10 @@ def main():
             contact_ids = company.get('child_ids', [])
             
             if contact_ids:
-                contacts = models.execute_kw(
-                    ODOO_DB, uid, ODOO_PASSWORD,
-                    'res.partner', 'read',
-                    [contact_ids],
-                    {'fields': ['id', 'name', 'email', 'phone', 'mobile', 'function']}
+                contacts = odoo.read(
+                    'res.partner',
+                    contact_ids,
+                    ['id', 'name', 'email', 'phone', 'mobile', 'function']
                 )
                 
                 for contact in contacts:
@@ -2,11 +2,12 @@
 Script 1: Test Odoo Connection
 Prueba la conexión con Odoo y lista los primeros partners
 """
-import xmlrpc.client
 from dotenv import load_dotenv
 import os
 import json
 
+from odoo_client import OdooClient, get_client
+
 # Cargar variables de entorno
 load_dotenv('.env.local')
 
@@ -24,61 +25,48 @@ def test_connection():
     
     try:
         # Conectar a Odoo
-        common = xmlrpc.client.ServerProxy(f'{ODOO_URL}/xmlrpc/2/common')
+        client = get_client()
         
         # Autenticar
         print(f"\n📡 Conectando a: {ODOO_URL}")
         print(f"📊 Base de datos: {ODOO_DB}")
         print(f"👤 Usuario: {ODOO_USERNAME}")
         
-        uid = common.authenticate(ODOO_DB, ODOO_USERNAME, ODOO_PASSWORD, {})
+        # force=True: el test verifica las credenciales, no el uid en caché
+        uid = client.authenticate(force=True)
+        print(f"\n✅ Autenticación exitosa! UID: {uid}")
         
-        if uid:
-            print(f"\n✅ Autenticación exitosa! UID: {uid}")
-            
-            # Obtener versión de Odoo
-            version = common.version()
-            print(f"\n📦 Versión de Odoo:")
-            print(f"   - Server: {version.get('server_version')}")
-            print(f"   - Protocol: {version.get('protocol_version')}")
-            
-            return uid
-        else:
-            print("\n❌ Error: Autenticación fallida")
-            return None
+        # Obtener versión de Odoo
+        version = client.version()
+        print(f"\n📦 Versión de Odoo:")
+        print(f"   - Server: {version.get('server_version')}")
+        print(f"   - Protocol: {version.get('protocol_version')}")
+        
+        return client
             
     except Exception as e:
         print(f"\n❌ Error de conexión: {str(e)}")
         return None
 
-def list_partners(uid):
+def list_partners(client: OdooClient):
     """Lista los primeros 5 partners de Odoo"""
     print("\n" + "=" * 60)
     print("TEST 2: Listar Partners (Clientes)")
     print("=" * 60)
     
     try:
-        models = xmlrpc.client.ServerProxy(f'{ODOO_URL}/xmlrpc/2/object')
-        
-        # Buscar partners que sean compañías y clientes
-        partner_ids = models.execute_kw(
-            ODOO_DB, uid, ODOO_PASSWORD,
-            'res.partner', 'search',
-            [[('is_company', '=', True), ('customer_rank', '>', 0)]],
-            {'limit': 5}
+        # Buscar y leer partners que sean compañías y clientes (una sola llamada)
+        partners = client.search_read(
+            'res.partner',
+            [('is_company', '=', True), ('customer_rank', '>', 0)],
+            ['id', 'name', 'email', 'phone', 'mobile', 'vat',
+             'street', 'city', 'country_id', 'property_payment_term_id'],
+            limit=5
         )
         
-        print(f"\n📋 Encontrados {len(partner_ids)} partners (mostrando primeros 5)")
+        print(f"\n📋 Encontrados {len(partners)} partners (mostrando primeros 5)")
         
-        if partner_ids:
-            # Leer datos de los partners
-            partners = models.execute_kw(
-                ODOO_DB, uid, ODOO_PASSWORD,
-                'res.partner', 'read',
-                [partner_ids],
-                {'fields': ['id', 'name', 'email', 'phone', 'mobile', 'vat', 
-                           'street', 'city', 'country_id', 'property_payment_term_id']}
-            )
+        if partners:
             
             # Mostrar cada partner
             for i, partner in enumerate(partners, 1):
@@ -119,34 +107,25 @@ def list_partners(uid):
     except Exception as e:
         print(f"\n❌ Error listando partners: {str(e)}")
 
-def list_products(uid):
+def list_products(client: OdooClient):
     """Lista los primeros 5 productos de Odoo"""
     print("\n" + "=" * 60)
     print("TEST 3: Listar Productos (Servicios)")
     print("=" * 60)
     
     try:
-        models = xmlrpc.client.ServerProxy(f'{ODOO_URL}/xmlrpc/2/object')
-        
-        # Buscar productos que sean servicios y estén activos
-        product_ids = models.execute_kw(
-            ODOO_DB, uid, ODOO_PASSWORD,
-            'product.product', 'search',
-            [[('sale_ok', '=', True), ('active', '=', True), ('type', '=', 'service')]],
-            {'limit': 5}
+        # Buscar y leer productos que sean servicios y estén activos
+        products = client.search_read(
+            'product.product',
+            [('sale_ok', '=', True), ('active', '=', True), ('type', '=', 'service')],
+            ['id', 'default_code', 'name', 'categ_id',
+             'list_price', 'standard_price', 'description', 'active'],
+            limit=5
         )
         
-        print(f"\n📋 Encontrados {len(product_ids)} productos (mostrando primeros 5)")
+        print(f"\n📋 Encontrados {len(products)} productos (mostrando primeros 5)")
         
-        if product_ids:
-            # Leer datos de los productos
-            products = models.execute_kw(
-                ODOO_DB, uid, ODOO_PASSWORD,
-                'product.product', 'read',
-                [product_ids],
-                {'fields': ['id', 'default_code', 'name', 'categ_id', 
-                           'list_price', 'standard_price', 'description', 'active']}
-            )
+        if products:
             
             # Mostrar cada producto
             for i, product in enumerate(products, 1):
@@ -199,14 +178,14 @@ def main():
         return
     
     # Test 1: Conexión
-    uid = test_connection()
+    client = test_connection()
     
-    if uid:
+    if client:
         # Test 2: Listar partners
-        list_partners(uid)
+        list_partners(client)
         
         # Test 3: Listar productos
-        list_products(uid)
+        list_products(client)
         
         print("\n" + "=" * 60)
         print("✅ TODOS LOS TESTS COMPLETADOS")
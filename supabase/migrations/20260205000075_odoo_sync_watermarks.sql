@@ -0,0 +1,19 @@
+-- 🔗 ODOO SYNC WATERMARKS
+-- Description: write_date high-water mark per Odoo model for incremental sync
+-- (scripts/demo_complete_sync.py). Each run only fetches records changed since
+-- last_write_date; a full pass runs again once last_full_sync is old enough.
+
+CREATE TABLE IF NOT EXISTS schema_core.odoo_sync_watermarks (
+    model TEXT PRIMARY KEY, -- 'res.partner', 'product.product'
+    last_write_date TIMESTAMPTZ, -- Highest Odoo write_date synced (UTC)
+    last_full_sync TIMESTAMPTZ, -- Last full reconciliation pass
+    records_synced INTEGER DEFAULT 0, -- Records in the last run
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Expose via view for PostgREST access (same as the other odoo_* tables)
+CREATE OR REPLACE VIEW public.odoo_sync_watermarks AS
+SELECT * FROM schema_core.odoo_sync_watermarks;
+
+GRANT SELECT, INSERT, UPDATE ON public.odoo_sync_watermarks TO authenticated;
+GRANT SELECT, INSERT, UPDATE ON public.odoo_sync_watermarks TO service_role;
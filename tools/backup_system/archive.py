@@ -0,0 +1,195 @@
+"""Source-code archives for code_mode "zip".
+
+zip_source_code deflates members on a thread pool (zlib releases the GIL,
+so every core is used) and writes them in order into a standard zip,
+building the headers itself because zipfile can only compress on the
+writing thread. Formats listed in STORE_UNCOMPRESSED_EXTENSIONS (PNG,
+JPG, video, archives...) are stored as-is, as is any member that deflate
+does not shrink. Large files are streamed on the writing thread instead of
+being read into memory whole. ZIP64 records are added when sizes or
+offsets need them, so archives over 4 GB stay valid.
+
+tar_source_code streams a tar through the compression stage, which is
+already multi-threaded for zstd and gzip (see compression.py).
+"""
+import os
+import stat
+import time
+import zlib
+import struct
+import tarfile
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import SOURCE_DIR, STORE_UNCOMPRESSED_EXTENSIONS, ARCHIVE_WORKERS
+from content_store import iter_source_files
+from compression import CompressedWriter
+
+logger = logging.getLogger(__name__)
+
+# Members up to this size are read whole and deflated by a worker
+PARALLEL_MAX_BYTES = 32 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_STORED, ZIP_DEFLATED = 0, 8
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+def _dos_time(mtime):
+    t = time.localtime(max(mtime, 315532800))  # zip dates start in 1980
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+def _store_as_is(arcname):
+    return os.path.splitext(arcname)[1].lower() in STORE_UNCOMPRESSED_EXTENSIONS
+
+def _deflate_member(path, store, level):
+    """Read and compress one small file. Returns (crc, size, payload, method)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    crc = zlib.crc32(data)
+    if store or not data:
+        return crc, len(data), data, ZIP_STORED
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    payload = compressor.compress(data) + compressor.flush()
+    if len(payload) >= len(data):
+        return crc, len(data), data, ZIP_STORED
+    return crc, len(data), payload, ZIP_DEFLATED
+
+class ZipBuilder:
+    """Minimal zip writer for members whose compressed bytes are produced elsewhere."""
+
+    def __init__(self, fileobj):
+        self.f = fileobj
+        self.offset = 0
+        self.entries = []
+        self.bytes_raw = 0
+
+    def _write(self, data):
+        self.f.write(data)
+        self.offset += len(data)
+
+    def add(self, arcname, st, crc, size, payload, method):
+        """Member whose crc and sizes are known up front."""
+        name = arcname.encode('utf-8')
+        header_offset = self.offset
+        zip64 = size >= ZIP64_LIMIT or len(payload) >= ZIP64_LIMIT
+        extra = struct.pack("<HHQQ", 1, 16, size, len(payload)) if zip64 else b""
+        dostime, dosdate = _dos_time(st.st_mtime)
+        self._write(struct.pack(
+            "<IHHHHHIIIHH", 0x04034b50, 45 if zip64 else 20, FLAG_UTF8, method, dostime, dosdate,
+            crc, ZIP64_LIMIT if zip64 else len(payload), ZIP64_LIMIT if zip64 else size,
+            len(name), len(extra)) + name + extra)
+        self._write(payload)
+        self.entries.append((name, st, crc, size, len(payload), method, FLAG_UTF8, header_offset))
+        self.bytes_raw += size
+
+    def add_streamed(self, arcname, path, st, store, level):
+        """Large member: compressed while read, sizes in a trailing data descriptor."""
+        name = arcname.encode('utf-8')
+        header_offset = self.offset
+        flags = FLAG_UTF8 | FLAG_DATA_DESCRIPTOR
+        method = ZIP_STORED if store else ZIP_DEFLATED
+        dostime, dosdate = _dos_time(st.st_mtime)
+        extra = struct.pack("<HHQQ", 1, 16, 0, 0)
+        self._write(struct.pack(
+            "<IHHHHHIIIHH", 0x04034b50, 45, flags, method, dostime, dosdate,
+            0, ZIP64_LIMIT, ZIP64_LIMIT, len(name), len(extra)) + name + extra)
+        compressor = None if store else zlib.compressobj(level, zlib.DEFLATED, -15)
+        crc = size = written = 0
+        with open(path, 'rb') as f:
+            for buf in iter(lambda: f.read(READ_SIZE), b''):
+                crc = zlib.crc32(buf, crc)
+                size += len(buf)
+                out = compressor.compress(buf) if compressor else buf
+                self._write(out)
+                written += len(out)
+        if compressor:
+            out = compressor.flush()
+            self._write(out)
+            written += len(out)
+        self._write(struct.pack("<IIQQ", 0x08074b50, crc, written, size))
+        self.entries.append((name, st, crc, size, written, method, flags, header_offset))
+        self.bytes_raw += size
+
+    def close(self):
+        cd_offset = self.offset
+        for name, st, crc, size, csize, method, flags, header_offset in self.entries:
+            fields = [v for v in (size, csize, header_offset) if v >= ZIP64_LIMIT]
+            extra = struct.pack("<HH" + "Q" * len(fields), 1, 8 * len(fields), *fields) if fields else b""
+            dostime, dosdate = _dos_time(st.st_mtime)
+            self._write(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014b50, (3 << 8) | 45, 45 if extra else 20, flags, method,
+                dostime, dosdate, crc, min(csize, ZIP64_LIMIT), min(size, ZIP64_LIMIT),
+                len(name), len(extra), 0, 0, 0, (stat.S_IFREG | (st.st_mode & 0o777)) << 16,
+                min(header_offset, ZIP64_LIMIT)) + name + extra)
+        cd_size = self.offset - cd_offset
+        count = len(self.entries)
+        if count >= 0xFFFF or cd_offset >= ZIP64_LIMIT or cd_size >= ZIP64_LIMIT:
+            zip64_eocd = self.offset
+            self._write(struct.pack("<IQHHIIQQQQ", 0x06064b50, 44, 45, 45, 0, 0,
+                                    count, count, cd_size, cd_offset))
+            self._write(struct.pack("<IIQI", 0x07064b50, 0, zip64_eocd, 1))
+        self._write(struct.pack("<IHHHHIIH", 0x06054b50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                                min(cd_size, ZIP64_LIMIT), min(cd_offset, ZIP64_LIMIT), 0))
+
+def zip_source_code(output_path, on_file_done=None, workers=ARCHIVE_WORKERS, level=6,
+                    source_dir=SOURCE_DIR):
+    """Zip SOURCE_DIR with members deflated in parallel. Returns archive stats."""
+    count = stored = 0
+    window = deque()
+    with open(output_path, 'wb') as out, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        zipf = ZipBuilder(out)
+
+        def drain(limit):
+            nonlocal count, stored
+            # Write finished members in submission order, keeping at most
+            # `limit` in flight so memory stays bounded
+            while len(window) > limit:
+                arcname, st, future = window.popleft()
+                crc, size, payload, method = future.result()
+                zipf.add(arcname, st, crc, size, payload, method)
+                count += 1
+                stored += method == ZIP_STORED
+                if on_file_done:
+                    on_file_done(count, arcname)
+
+        for file_path in iter_source_files(source_dir):
+            arcname = os.path.relpath(file_path, source_dir).replace(os.sep, '/')
+            try:
+                st = os.stat(file_path)
+            except OSError as e:
+                logger.warning(f"Skipping {file_path}: {e}")
+                continue
+            store = _store_as_is(arcname)
+            if st.st_size > PARALLEL_MAX_BYTES:
+                drain(0)
+                zipf.add_streamed(arcname, file_path, st, store, level)
+                count += 1
+                stored += store
+                if on_file_done:
+                    on_file_done(count, arcname)
+                continue
+            window.append((arcname, st, pool.submit(_deflate_member, file_path, store, level)))
+            drain(workers * 4)
+        drain(0)
+        zipf.close()
+    return {"files": count, "stored": stored, "bytes_raw": zipf.bytes_raw,
+            "bytes_compressed": os.path.getsize(output_path)}
+
+def tar_source_code(output_path, compression, on_file_done=None, source_dir=SOURCE_DIR):
+    """Stream SOURCE_DIR as a tar archive through the compression stage.
+
+    Returns (bytes_raw, bytes_compressed).
+    """
+    count = 0
+    with CompressedWriter(output_path, *compression) as out:
+        with tarfile.open(fileobj=out, mode='w|') as tar:
+            for file_path in iter_source_files(source_dir):
+                arcname = os.path.relpath(file_path, source_dir)
+                tar.add(file_path, arcname)
+                count += 1
+                if on_file_done:
+                    on_file_done(count, arcname)
+    return out.bytes_raw, out.bytes_compressed
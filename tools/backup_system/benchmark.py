@@ -0,0 +1,357 @@
+"""Reproducible backup benchmark on a synthetic dental dataset.
+
+Seeds a scratch Postgres with clinics, patients, odontograms, lab orders,
+stage times and sync logs (all in the `bench` schema, nothing else is
+touched), then runs every requested dump format x compression codec x
+worker count and, with --restore-url, restores each dump into a second
+scratch database. The JSON report records throughput, peak memory and
+output size per run together with the scale and machine, so two reports
+can be compared with --compare.
+
+Never point --dsn or --restore-url at a production database.
+
+Usage:
+    python benchmark.py --dsn postgresql://localhost/bench --rows 1000000
+        [--formats jsonl,csv,binary] [--codecs none,gzip,zstd] [--workers 1,4]
+        [--restore-url postgresql://localhost/bench_restore]
+        [--skip-seed] [--output report.json] [--compare previous.json]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import datetime
+import platform
+import tempfile
+import threading
+
+import psycopg2
+import psutil
+
+SCHEMA = "bench"
+
+DDL = f"""
+CREATE SCHEMA IF NOT EXISTS {SCHEMA};
+CREATE TABLE IF NOT EXISTS {SCHEMA}.clinics (
+    id integer PRIMARY KEY,
+    name text NOT NULL,
+    city text,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS {SCHEMA}.patients (
+    id bigint PRIMARY KEY,
+    clinic_id integer NOT NULL,
+    first_name text,
+    last_name text,
+    birth_date date,
+    phone text,
+    email text,
+    notes text,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS {SCHEMA}.odontograms (
+    id bigint PRIMARY KEY,
+    patient_id bigint NOT NULL,
+    teeth jsonb NOT NULL,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS {SCHEMA}.lab_orders (
+    id uuid PRIMARY KEY,
+    order_no bigint NOT NULL,
+    clinic_id integer NOT NULL,
+    patient_id bigint NOT NULL,
+    status text NOT NULL,
+    due_date date,
+    price numeric(10, 2),
+    items text[],
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS {SCHEMA}.order_stage_times (
+    id bigint PRIMARY KEY,
+    order_no bigint NOT NULL,
+    stage text NOT NULL,
+    entered_at timestamptz NOT NULL,
+    left_at timestamptz,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS {SCHEMA}.sync_logs (
+    level text NOT NULL,
+    message text,
+    payload jsonb,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+"""
+
+# Share of the requested row count per table (clinics are sized separately)
+TABLE_SHARES = {
+    "patients": 0.15,
+    "odontograms": 0.15,
+    "lab_orders": 0.25,
+    "order_stage_times": 0.35,
+    "sync_logs": 0.10,
+}
+
+# INSERT ... SELECT over generate_series(%(lo)s, %(hi)s) AS g; server-side, so
+# seeding 10M rows does not stream data through Python
+SEED_SQL = {
+    "clinics": """
+        INSERT INTO {s}.clinics (id, name, city)
+        SELECT g, 'Clinica ' || g, (ARRAY['Guatemala','Mixco','Antigua','Quetzaltenango','Escuintla'])[1 + g %% 5]
+        FROM generate_series(%(lo)s, %(hi)s) g""",
+    "patients": """
+        INSERT INTO {s}.patients (id, clinic_id, first_name, last_name, birth_date, phone, email, notes)
+        SELECT g, 1 + g %% %(clinics)s, 'Nombre' || g, 'Apellido' || (g * 7 %% 1000),
+               date '1950-01-01' + (g %% 25000), '+502 ' || lpad((g %% 100000000)::text, 8, '0'),
+               'paciente' || g || '@example.com',
+               CASE WHEN g %% 3 = 0 THEN repeat('Historial clinico. ', 1 + g %% 20) END
+        FROM generate_series(%(lo)s, %(hi)s) g""",
+    "odontograms": """
+        INSERT INTO {s}.odontograms (id, patient_id, teeth)
+        SELECT g, 1 + g %% %(patients)s,
+               (SELECT jsonb_object_agg(t::text, jsonb_build_object(
+                    'estado', (ARRAY['sano','caries','obturado','ausente','corona'])[1 + (g + t) %% 5],
+                    'caras', (ARRAY['M','D','O','V','L'])[1 + (g * t) %% 5]))
+                FROM generate_series(11, 48) t WHERE t %% 10 BETWEEN 1 AND 8)
+        FROM generate_series(%(lo)s, %(hi)s) g""",
+    "lab_orders": """
+        INSERT INTO {s}.lab_orders (id, order_no, clinic_id, patient_id, status, due_date, price, items)
+        SELECT md5(g::text)::uuid, g, 1 + g %% %(clinics)s, 1 + g %% %(patients)s,
+               (ARRAY['nuevo','en_diseno','en_fresado','en_horno','control_calidad','entregado'])[1 + g %% 6],
+               date '2025-01-01' + (g %% 730), round((50 + (g %% 5000) / 7.0)::numeric, 2),
+               ARRAY['corona_zirconio', 'carilla_emax'][1:1 + g %% 2]
+        FROM generate_series(%(lo)s, %(hi)s) g""",
+    "order_stage_times": """
+        INSERT INTO {s}.order_stage_times (id, order_no, stage, entered_at, left_at)
+        SELECT g, 1 + g %% %(lab_orders)s,
+               (ARRAY['recepcion','diseno','fresado','sinterizado','acabado','despacho'])[1 + g %% 6],
+               timestamptz '2025-01-01' + g * interval '37 seconds',
+               CASE WHEN g %% 4 <> 0 THEN timestamptz '2025-01-01' + g * interval '37 seconds' + interval '5 hours' END
+        FROM generate_series(%(lo)s, %(hi)s) g""",
+    "sync_logs": """
+        INSERT INTO {s}.sync_logs (level, message, payload, created_at)
+        SELECT (ARRAY['info','info','info','warning','error'])[1 + g %% 5],
+               'Sincronizacion Odoo lote ' || g,
+               jsonb_build_object('partner_id', g %% 5000, 'records', g %% 200, 'ok', g %% 5 <> 4),
+               timestamptz '2025-01-01' + g * interval '11 seconds'
+        FROM generate_series(%(lo)s, %(hi)s) g""",
+}
+SEED_BATCH = 1_000_000
+
+def table_counts(rows):
+    counts = {"clinics": max(10, rows // 10000)}
+    for table, share in TABLE_SHARES.items():
+        counts[table] = max(1, int(rows * share))
+    return counts
+
+def seed(dsn, rows):
+    """(Re)create the bench schema with about `rows` rows in total."""
+    counts = table_counts(rows)
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cur.execute(DDL)
+            conn.commit()
+            for table, count in counts.items():
+                started = time.perf_counter()
+                for lo in range(1, count + 1, SEED_BATCH):
+                    params = dict(counts, lo=lo, hi=min(count, lo + SEED_BATCH - 1))
+                    cur.execute(SEED_SQL[table].format(s=SCHEMA), params)
+                    conn.commit()
+                print(f"  {SCHEMA}.{table}: {count:,} rows in {time.perf_counter() - started:.1f}s")
+            cur.execute("ANALYZE")
+            conn.commit()
+    finally:
+        conn.close()
+    return counts
+
+def prepare_target(dsn):
+    """Create the bench tables (empty) in the restore database."""
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cur.execute(DDL)
+        conn.commit()
+    finally:
+        conn.close()
+
+class RssSampler:
+    """Samples the process RSS in the background; peak_mb after the with block."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._process = psutil.Process()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, self._process.memory_info().rss / (1024 * 1024))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+def run_case(fmt, codec, workers, work_dir, restore_url=None, keep_output=False):
+    """Dump (and optionally restore) the bench schema once. Returns the report entry."""
+    # Imported here: benchmark() points DATABASE_URL at the scratch DB first
+    from config import FETCH_BATCH_SIZE, TABLE_MEMORY_LIMIT_MB, CHUNK_THRESHOLD_MB, COMPRESSION_THREADS
+    from db_dump import dump_tables_parallel
+    from restore import restore_database
+
+    tables = [(SCHEMA, t) for t in SEED_SQL]
+    backup_dir = tempfile.mkdtemp(prefix=f"bench_{fmt}_{codec}_", dir=work_dir)
+    db_dir = os.path.join(backup_dir, "database")
+    os.makedirs(db_dir)
+    entry = {"format": fmt, "codec": codec, "workers": workers}
+    try:
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            stats, chunks, _ = dump_tables_parallel(
+                tables, db_dir, fmt, FETCH_BATCH_SIZE, TABLE_MEMORY_LIMIT_MB, workers,
+                CHUNK_THRESHOLD_MB, compression=(codec, 0, COMPRESSION_THREADS),
+            )
+            seconds = time.perf_counter() - started
+        rows = sum(s["rows"] for s in stats.values())
+        bytes_raw = sum(s["bytes_raw"] for s in stats.values())
+        on_disk = _dir_size(db_dir)
+        entry.update(
+            tables=len(stats), rows=rows, dump_seconds=round(seconds, 3),
+            dump_rows_per_second=round(rows / seconds, 1),
+            dump_mb_per_second=round(bytes_raw / seconds / (1024 * 1024), 2),
+            bytes_raw=bytes_raw, bytes_on_disk=on_disk,
+            compression_ratio=round(bytes_raw / on_disk, 2) if on_disk else None,
+            dump_peak_rss_mb=round(rss.peak_mb, 1),
+            db_seconds=round(sum(s.get("db_seconds", 0) for s in stats.values()), 3),
+            serialize_seconds=round(sum(s.get("serialize_seconds", 0) for s in stats.values()), 3),
+            write_seconds=round(sum(s.get("write_seconds", 0) for s in stats.values()), 3),
+        )
+
+        if restore_url:
+            with open(os.path.join(backup_dir, "meta.json"), 'w') as f:
+                json.dump({"id": os.path.basename(backup_dir), "db_format": fmt, "tables": stats,
+                           "chunks": chunks, "chain": []}, f)
+            prepare_target(restore_url)
+            with RssSampler() as rss:
+                started = time.perf_counter()
+                results = restore_database(backup_dir, restore_url, workers=workers, truncate=True)
+                seconds = time.perf_counter() - started
+            failed = [k for k, r in results.items() if "error" in r]
+            entry.update(
+                restore_seconds=round(seconds, 3),
+                restore_rows_per_second=round(rows / seconds, 1),
+                restore_peak_rss_mb=round(rss.peak_mb, 1),
+                restore_failed=failed,
+            )
+    finally:
+        if not keep_output:
+            shutil.rmtree(backup_dir, ignore_errors=True)
+    return entry
+
+def benchmark(dsn, rows, formats, codecs, workers_list, restore_url=None, skip_seed=False,
+              work_dir=None, keep_output=False):
+    os.environ["DATABASE_URL"] = dsn  # before config is imported by run_case
+    counts = table_counts(rows)
+    if not skip_seed:
+        print(f"Seeding {sum(counts.values()):,} rows into {SCHEMA}...")
+        counts = seed(dsn, rows)
+
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SHOW server_version")
+            server_version = cur.fetchone()[0]
+    finally:
+        conn.close()
+
+    work_dir = work_dir or tempfile.gettempdir()
+    runs = []
+    for fmt in formats:
+        for codec in codecs:
+            for workers in workers_list:
+                print(f"Running {fmt} / {codec} / {workers} workers...")
+                runs.append(run_case(fmt, codec, workers, work_dir, restore_url, keep_output))
+    return {
+        "created_at": datetime.datetime.now().isoformat(),
+        "rows_requested": rows,
+        "table_rows": counts,
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "memory_gb": round(psutil.virtual_memory().total / 1024 ** 3, 1),
+            "postgres": server_version,
+        },
+        "runs": runs,
+    }
+
+def _pct(new, old):
+    return f"{(new - old) / old * 100:+.1f}%" if new is not None and old else "n/a"
+
+def print_report(report, previous=None):
+    baseline = {(r["format"], r["codec"], r["workers"]): r for r in (previous or {}).get("runs", [])}
+    header = f"{'format':<7} {'codec':<5} {'wrk':>3} {'dump s':>8} {'rows/s':>11} {'MB/s':>7} " \
+             f"{'on disk MB':>10} {'ratio':>5} {'RSS MB':>7} {'restore s':>9}"
+    if previous:
+        header += f" {'dump vs prev':>12} {'restore vs prev':>15}"
+    print(header)
+    for r in report["runs"]:
+        line = (f"{r['format']:<7} {r['codec']:<5} {r['workers']:>3} {r['dump_seconds']:>8.2f} "
+                f"{r['dump_rows_per_second']:>11,.0f} {r['dump_mb_per_second']:>7.1f} "
+                f"{r['bytes_on_disk'] / 1024 ** 2:>10.1f} {r['compression_ratio'] or 0:>5.1f} "
+                f"{r['dump_peak_rss_mb']:>7.0f} {r.get('restore_seconds', 0):>9.2f}")
+        if previous:
+            old = baseline.get((r["format"], r["codec"], r["workers"]), {})
+            line += f" {_pct(r['dump_seconds'], old.get('dump_seconds')):>12}" \
+                    f" {_pct(r.get('restore_seconds'), old.get('restore_seconds')):>15}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backup dump/compression/restore modes")
+    parser.add_argument("--dsn", required=True, help="Scratch database to seed and dump")
+    parser.add_argument("--rows", type=int, default=100_000, help="Approximate total rows (10k - 10M)")
+    parser.add_argument("--formats", default="jsonl,csv,binary")
+    parser.add_argument("--codecs", default="none,gzip,zstd")
+    parser.add_argument("--workers", default="4", help="Comma-separated worker counts")
+    parser.add_argument("--restore-url", help="Second scratch database to restore into")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the existing bench schema")
+    parser.add_argument("--work-dir", help="Where dumps are written (default: system temp)")
+    parser.add_argument("--keep-output", action="store_true")
+    parser.add_argument("--output", help="Report file (default: benchmark_<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous report to compare against")
+    args = parser.parse_args()
+
+    if args.restore_url and args.restore_url == args.dsn:
+        sys.exit("--restore-url must be a different database than --dsn")
+
+    report = benchmark(
+        args.dsn, args.rows, args.formats.split(","), args.codecs.split(","),
+        [int(w) for w in args.workers.split(",")], args.restore_url, args.skip_seed,
+        args.work_dir, args.keep_output,
+    )
+    output = args.output or f"benchmark_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            previous = json.load(f)
+    print_report(report, previous)
+    print(f"Report written to {output}")
+
+if __name__ == "__main__":
+    main()
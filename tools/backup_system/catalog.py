@@ -0,0 +1,248 @@
+"""SQLite index of the backups stored under BACKUP_ROOT.
+
+list_backups used to scan every folder and parse every meta.json per
+request. The catalog is written when a backup finishes and reconciled with
+the filesystem at most every CATALOG_SYNC_SECONDS (new folders indexed,
+deleted folders dropped), so listing is a single indexed query.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+from config import BACKUP_ROOT, CATALOG_SYNC_SECONDS
+from content_store import MANIFEST_NAME
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = os.path.join(BACKUP_ROOT, "_catalog.sqlite")
+
+_sync_lock = threading.Lock()
+_last_sync = 0.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS backups (
+    id TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    date TEXT,
+    type TEXT,
+    backup_type TEXT NOT NULL DEFAULT 'full',
+    note TEXT,
+    has_db INTEGER NOT NULL DEFAULT 0,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    meta_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_backups_timestamp ON backups (timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_backups_type ON backups (backup_type, timestamp DESC);
+CREATE TABLE IF NOT EXISTS blob_refs (
+    backup_id TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (backup_id, digest)
+);
+CREATE INDEX IF NOT EXISTS idx_blob_refs_digest ON blob_refs (digest);
+CREATE TABLE IF NOT EXISTS backup_timings (
+    backup_id TEXT PRIMARY KEY,
+    recorded_at TEXT NOT NULL,
+    total_seconds REAL,
+    db_seconds REAL,
+    db_rows INTEGER,
+    db_bytes INTEGER,
+    code_mode TEXT,
+    code_seconds REAL,
+    code_files INTEGER,
+    code_bytes INTEGER
+);
+CREATE TABLE IF NOT EXISTS table_timings (
+    backup_id TEXT NOT NULL,
+    table_key TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    db_format TEXT,
+    rows INTEGER,
+    bytes_raw INTEGER,
+    seconds REAL,
+    db_seconds REAL,
+    serialize_seconds REAL,
+    write_seconds REAL,
+    PRIMARY KEY (backup_id, table_key)
+);
+CREATE INDEX IF NOT EXISTS idx_table_timings_table ON table_timings (table_key, recorded_at DESC);
+"""
+
+# Columns added after the first catalog version, applied to existing files
+COLUMN_MIGRATIONS = [
+    ("replication_status", "TEXT"),  # None | replicating | replicated | failed | cancelled
+    ("replicated_at", "TEXT"),
+    ("replication_error", "TEXT"),
+    ("blobs_indexed", "INTEGER NOT NULL DEFAULT 0"),  # blob_refs filled from the source manifest
+]
+
+def get_catalog():
+    os.makedirs(BACKUP_ROOT, exist_ok=True)
+    conn = sqlite3.connect(CATALOG_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    existing = {r[1] for r in conn.execute("PRAGMA table_info(backups)")}
+    for column, col_type in COLUMN_MIGRATIONS:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE backups ADD COLUMN {column} {col_type}")
+    return conn
+
+def dir_size(path):
+    """Recursive size in bytes of a backup folder (database/ included)."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def record_backup(backup_dir, meta, conn=None):
+    """Insert or refresh the catalog row of a finished backup."""
+    own = conn is None
+    conn = conn or get_catalog()
+    try:
+        conn.execute("""
+            INSERT INTO backups
+                (id, timestamp, date, type, backup_type, note, has_db, size_bytes, meta_json)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                timestamp = excluded.timestamp, date = excluded.date, type = excluded.type,
+                backup_type = excluded.backup_type, note = excluded.note, has_db = excluded.has_db,
+                size_bytes = excluded.size_bytes, meta_json = excluded.meta_json
+        """, (
+            meta['id'], meta['timestamp'], meta.get('date'), meta.get('type'),
+            meta.get('backup_type', 'full'), meta.get('note'),
+            1 if (meta.get('snapshot') or {}).get('taken_at') and not meta.get('partial') else 0,
+            dir_size(backup_dir), json.dumps(meta),
+        ))
+        index_blob_refs(conn, meta['id'], backup_dir, meta)
+        conn.commit()
+    finally:
+        if own:
+            conn.close()
+
+def index_blob_refs(conn, backup_id, backup_dir, meta):
+    """Record which content-store blobs a backup's source manifest references.
+
+    Retention uses blob_refs to find orphaned blobs without reading every
+    retained manifest. Caller commits.
+    """
+    conn.execute("DELETE FROM blob_refs WHERE backup_id = ?", (backup_id,))
+    if meta.get('source_snapshot'):
+        manifest_path = os.path.join(backup_dir, MANIFEST_NAME)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                files = json.load(f)['files']
+        except (OSError, ValueError, KeyError) as e:
+            # Leave blobs_indexed at 0 so GC refuses to run until this is fixed
+            logger.warning(f"Could not read source manifest of {backup_id}: {e}")
+            return
+        conn.executemany("INSERT OR IGNORE INTO blob_refs (backup_id, digest) VALUES (?, ?)",
+                         {(backup_id, entry['hash']) for entry in files})
+    conn.execute("UPDATE backups SET blobs_indexed = 1 WHERE id = ?", (backup_id,))
+
+def set_replication_status(backup_id, status, error=None, replicated_at=None):
+    conn = get_catalog()
+    try:
+        conn.execute("""
+            UPDATE backups SET replication_status = ?, replication_error = ?,
+                replicated_at = COALESCE(?, replicated_at)
+            WHERE id = ?
+        """, (status, error, replicated_at, backup_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+def remove_backup(backup_id, conn=None):
+    own = conn is None
+    conn = conn or get_catalog()
+    try:
+        conn.execute("DELETE FROM backups WHERE id = ?", (backup_id,))
+        conn.execute("DELETE FROM blob_refs WHERE backup_id = ?", (backup_id,))
+        conn.commit()
+    finally:
+        if own:
+            conn.close()
+
+def sync_catalog(force=False):
+    """Reconcile the catalog with the folders under BACKUP_ROOT.
+
+    Only folder names are listed; meta.json is parsed just for folders the
+    catalog has not seen yet, so this stays cheap with many backups.
+    """
+    global _last_sync
+    with _sync_lock:
+        if not force and time.time() - _last_sync < CATALOG_SYNC_SECONDS:
+            return
+        if not os.path.exists(BACKUP_ROOT):
+            _last_sync = time.time()
+            return
+        conn = get_catalog()
+        try:
+            on_disk = {e.name for e in os.scandir(BACKUP_ROOT)
+                       if e.is_dir() and not e.name.startswith('_')}
+            indexed = {r[0] for r in conn.execute("SELECT id FROM backups")}
+
+            for backup_id in indexed - on_disk:
+                conn.execute("DELETE FROM backups WHERE id = ?", (backup_id,))
+                conn.execute("DELETE FROM blob_refs WHERE backup_id = ?", (backup_id,))
+            for backup_id in on_disk - indexed:
+                backup_dir = os.path.join(BACKUP_ROOT, backup_id)
+                meta_path = os.path.join(backup_dir, "meta.json")
+                if not os.path.exists(meta_path):
+                    continue  # in progress or incomplete
+                try:
+                    with open(meta_path, 'r') as f:
+                        meta = json.load(f)
+                    record_backup(backup_dir, meta, conn)
+                except Exception as e:
+                    logger.warning(f"Could not index backup {backup_id}: {e}")
+            conn.commit()
+            _last_sync = time.time()
+        finally:
+            conn.close()
+
+def _row_to_meta(row):
+    meta = json.loads(row['meta_json'])
+    meta['size_bytes'] = row['size_bytes']
+    meta['size'] = f"{row['size_bytes'] / (1024*1024):.2f} MB"
+    meta.setdefault('backup_type', 'full')
+    meta['replication'] = {
+        "status": row['replication_status'],
+        "replicated_at": row['replicated_at'],
+        "error": row['replication_error'],
+    }
+    return meta
+
+def query_backups(page=1, page_size=50, backup_type=None):
+    """One page of backups, newest first. Returns (backups, total)."""
+    sync_catalog()
+    where, params = "", []
+    if backup_type:
+        where, params = "WHERE backup_type = ?", [backup_type]
+    conn = get_catalog()
+    try:
+        total = conn.execute(f"SELECT COUNT(*) FROM backups {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT * FROM backups {where} ORDER BY timestamp DESC LIMIT ? OFFSET ?",
+            params + [page_size, (page - 1) * page_size],
+        ).fetchall()
+        return [_row_to_meta(r) for r in rows], total
+    finally:
+        conn.close()
+
+def latest_db_backup():
+    """meta of the newest backup holding a DB dump with a snapshot position, or None."""
+    sync_catalog()
+    conn = get_catalog()
+    try:
+        row = conn.execute(
+            "SELECT * FROM backups WHERE has_db = 1 ORDER BY timestamp DESC LIMIT 1"
+        ).fetchone()
+        return _row_to_meta(row) if row else None
+    finally:
+        conn.close()
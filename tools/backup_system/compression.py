@@ -0,0 +1,149 @@
+"""Streaming compression stage for backup outputs.
+
+Writers are file-like objects that compress as data arrives, so a dump is
+never buffered whole. zstd uses libzstd's own worker threads; gzip with
+threads > 1 compresses fixed-size blocks in a thread pool and writes them
+as consecutive gzip members (a valid gzip stream, like pigz output).
+"""
+import io
+import gzip
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+
+import zstandard
+
+from config import COMPRESSION_CODEC, COMPRESSION_LEVEL, COMPRESSION_THREADS
+
+CODEC_EXTENSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+GZIP_BLOCK_SIZE = 1024 * 1024
+
+class CountingWriter(io.RawIOBase):
+    """Pass-through writer that counts the bytes reaching the file."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.raw.write(data)
+        self.bytes_written += len(data)
+        return len(data)
+
+    def flush(self):
+        self.raw.flush()
+
+class ParallelGzipWriter(io.RawIOBase):
+    """Compress GZIP_BLOCK_SIZE blocks concurrently, writing members in order.
+
+    At most threads * 2 blocks are in flight, which bounds memory use.
+    """
+
+    def __init__(self, raw, level, threads):
+        self.raw = raw
+        self.level = level
+        self.max_pending = threads * 2
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.pending = deque()
+        self.buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def _submit(self, block):
+        self.pending.append(self.executor.submit(gzip.compress, bytes(block), self.level))
+        while len(self.pending) >= self.max_pending:
+            self.raw.write(self.pending.popleft().result())
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= GZIP_BLOCK_SIZE:
+            self._submit(self.buffer[:GZIP_BLOCK_SIZE])
+            del self.buffer[:GZIP_BLOCK_SIZE]
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        if self.buffer:
+            self._submit(self.buffer)
+            self.buffer = bytearray()
+        while self.pending:
+            self.raw.write(self.pending.popleft().result())
+        self.executor.shutdown()
+        super().close()
+
+class CompressedWriter(io.RawIOBase):
+    """Binary writer that compresses into path and reports raw/compressed sizes."""
+
+    def __init__(self, path, codec=COMPRESSION_CODEC, level=None, threads=COMPRESSION_THREADS):
+        if codec not in CODEC_EXTENSIONS:
+            raise ValueError(f"Unknown compression codec '{codec}'")
+        self.path = path
+        self.codec = codec
+        self.bytes_raw = 0
+        self.write_seconds = 0.0  # time spent compressing and writing, for metrics
+        self._file = open(path, 'wb')
+        self._counter = CountingWriter(self._file)
+        level = level or COMPRESSION_LEVEL or DEFAULT_LEVELS.get(codec)
+        if codec == "zstd":
+            cctx = zstandard.ZstdCompressor(level=level, threads=threads if threads > 1 else 0)
+            self._stream = cctx.stream_writer(self._counter, closefd=False)
+        elif codec == "gzip" and threads > 1:
+            self._stream = ParallelGzipWriter(self._counter, level, threads)
+        elif codec == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._counter, mode='wb', compresslevel=level)
+        else:
+            self._stream = self._counter
+
+    @property
+    def bytes_compressed(self):
+        return self._counter.bytes_written
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        started = time.perf_counter()
+        self._stream.write(data)
+        self.write_seconds += time.perf_counter() - started
+        self.bytes_raw += len(data)
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        if self._stream is not self._counter:
+            self._stream.close()
+        self._file.close()
+        super().close()
+
+def open_compressed_reader(path):
+    """Binary reader that decompresses according to the file extension."""
+    if path.endswith(".zst"):
+        f = open(path, 'rb')
+        return zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True, closefd=True)
+    if path.endswith(".gz"):
+        # GzipFile reads multi-member files, as written by ParallelGzipWriter
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+def codec_extension(codec):
+    return CODEC_EXTENSIONS[codec]
+
+def codec_from_name(name):
+    if name.endswith(".zst"):
+        return "zstd"
+    if name.endswith(".gz"):
+        return "gzip"
+    return "none"
+
+def strip_codec_extension(name):
+    for ext in (".zst", ".gz"):
+        if name.endswith(ext):
+            return name[:-len(ext)]
+    return name
@@ -0,0 +1,104 @@
+import os
+from dotenv import load_dotenv
+
+# Load Env
+load_dotenv(os.path.join(os.path.dirname(__file__), '../../.env'))
+
+# Config with Absolute Paths
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+
+BACKUP_ROOT = r"D:\DentalFlow_Backups"
+SOURCE_DIR = r"D:\DentalFlow"
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# Server-side cursor tuning: rows fetched per round trip and the
+# serialized-batch ceiling per table (MB).
+FETCH_BATCH_SIZE = int(os.getenv("BACKUP_FETCH_BATCH_SIZE", "5000"))
+TABLE_MEMORY_LIMIT_MB = int(os.getenv("BACKUP_TABLE_MEMORY_LIMIT_MB", "64"))
+
+# Worker connections used by the parallel dump engine
+DUMP_WORKERS = int(os.getenv("BACKUP_DUMP_WORKERS", "4"))
+
+# Tables larger than this (pg_total_relation_size, MB) are exported as
+# range chunks of about this size by separate workers. 0 disables chunking.
+CHUNK_THRESHOLD_MB = int(os.getenv("BACKUP_CHUNK_THRESHOLD_MB", "512"))
+
+# Incremental backups: change-tracking column and how far before the
+# parent snapshot to start looking (covers transactions in flight then).
+INCREMENTAL_TIMESTAMP_COLUMN = os.getenv("BACKUP_INCREMENTAL_COLUMN", "updated_at")
+INCREMENTAL_OVERLAP_SECONDS = int(os.getenv("BACKUP_INCREMENTAL_OVERLAP_SECONDS", "300"))
+
+# Background backup jobs: concurrent runs, queued jobs accepted before
+# rejecting, and finished jobs kept in memory for the dashboard.
+MAX_CONCURRENT_JOBS = int(os.getenv("BACKUP_MAX_CONCURRENT_JOBS", "1"))
+MAX_QUEUED_JOBS = int(os.getenv("BACKUP_MAX_QUEUED_JOBS", "5"))
+JOB_HISTORY = int(os.getenv("BACKUP_JOB_HISTORY", "50"))
+
+# Seconds between reconciliations of the backup catalog with BACKUP_ROOT
+CATALOG_SYNC_SECONDS = int(os.getenv("BACKUP_CATALOG_SYNC_SECONDS", "60"))
+
+# Restore engine: parallel table loads and rows per committed COPY batch
+RESTORE_WORKERS = int(os.getenv("BACKUP_RESTORE_WORKERS", "4"))
+RESTORE_BATCH_ROWS = int(os.getenv("BACKUP_RESTORE_BATCH_ROWS", "50000"))
+
+# Compression of dump files and code archives: none | gzip | zstd.
+# Level 0 means the codec default; threads > 1 enables block-parallel compression.
+COMPRESSION_CODEC = os.getenv("BACKUP_COMPRESSION", "none")
+COMPRESSION_LEVEL = int(os.getenv("BACKUP_COMPRESSION_LEVEL", "0"))
+COMPRESSION_THREADS = int(os.getenv("BACKUP_COMPRESSION_THREADS", str(os.cpu_count() or 1)))
+
+# Off-site replication to S3-compatible storage (AWS S3, MinIO, ...).
+# Leave S3_BUCKET empty to disable. For offline testing point S3_ENDPOINT_URL
+# at a local MinIO, e.g. http://localhost:9000.
+S3_ENDPOINT_URL = os.getenv("BACKUP_S3_ENDPOINT_URL") or None
+S3_BUCKET = os.getenv("BACKUP_S3_BUCKET", "")
+S3_PREFIX = os.getenv("BACKUP_S3_PREFIX", "dentalflow-backups")
+S3_REGION = os.getenv("BACKUP_S3_REGION", "us-east-1")
+S3_ACCESS_KEY = os.getenv("BACKUP_S3_ACCESS_KEY")
+S3_SECRET_KEY = os.getenv("BACKUP_S3_SECRET_KEY")
+S3_PART_SIZE_MB = int(os.getenv("BACKUP_S3_PART_SIZE_MB", "64"))
+S3_UPLOAD_WORKERS = int(os.getenv("BACKUP_S3_UPLOAD_WORKERS", "4"))
+S3_BANDWIDTH_LIMIT_MBPS = float(os.getenv("BACKUP_S3_BANDWIDTH_LIMIT_MBPS", "0"))  # 0 = unlimited
+S3_REPLICATE_ON_CREATE = os.getenv("BACKUP_S3_REPLICATE_ON_CREATE", "false").lower() == "true"
+
+# Threads used to hash files when writing and verifying checksum manifests
+VERIFY_WORKERS = int(os.getenv("BACKUP_VERIFY_WORKERS", str(os.cpu_count() or 1)))
+
+# Grandfather-father-son retention: newest backup kept per hour/day/week/month
+# for this many periods. 0 disables a tier; the newest backup is always kept.
+RETENTION_HOURLY = int(os.getenv("BACKUP_RETENTION_HOURLY", "24"))
+RETENTION_DAILY = int(os.getenv("BACKUP_RETENTION_DAILY", "7"))
+RETENTION_WEEKLY = int(os.getenv("BACKUP_RETENTION_WEEKLY", "4"))
+RETENTION_MONTHLY = int(os.getenv("BACKUP_RETENTION_MONTHLY", "12"))
+# Partial (per-table, e.g. scheduled) backups are outside the tiers above:
+# the newest N are kept, plus any newer than the newest complete backup
+RETENTION_PARTIAL = int(os.getenv("BACKUP_RETENTION_PARTIAL", "48"))
+# Unreferenced blobs and abandoned backup folders younger than this are left alone
+RETENTION_GRACE_HOURS = float(os.getenv("BACKUP_RETENTION_GRACE_HOURS", "6"))
+RETENTION_PRUNE_ON_CREATE = os.getenv("BACKUP_RETENTION_PRUNE_ON_CREATE", "false").lower() == "true"
+
+# Built-in scheduler: per-schema/table backup intervals (see scheduler.py)
+SCHEDULER_ENABLED = os.getenv("BACKUP_SCHEDULER_ENABLED", "false").lower() == "true"
+SCHEDULE_FILE = os.getenv("BACKUP_SCHEDULE_FILE", os.path.join(BASE_DIR, "schedule.json"))
+SCHEDULER_TICK_SECONDS = int(os.getenv("BACKUP_SCHEDULER_TICK_SECONDS", "30"))
+
+# Continuous backup from a logical replication slot (wal2json). Needs
+# wal_level=logical on the server and a role with REPLICATION.
+WAL_STREAM_ENABLED = os.getenv("BACKUP_WAL_STREAM_ENABLED", "false").lower() == "true"
+WAL_SLOT_NAME = os.getenv("BACKUP_WAL_SLOT_NAME", "dentalflow_backup")
+WAL_SEGMENT_MAX_CHANGES = int(os.getenv("BACKUP_WAL_SEGMENT_MAX_CHANGES", "10000"))
+WAL_SEGMENT_MAX_SECONDS = int(os.getenv("BACKUP_WAL_SEGMENT_MAX_SECONDS", "60"))
+
+# Code backups: comma-separated glob patterns left out of the source tree,
+# matched against each file/folder name and its path relative to SOURCE_DIR
+# (e.g. "node_modules,*.log,public/uploads/*")
+SOURCE_EXCLUDE = [p.strip() for p in os.getenv(
+    "BACKUP_SOURCE_EXCLUDE", "node_modules,.next,.git,logs,tmp,.gemini").split(",") if p.strip()]
+# Already-compressed formats stored as-is in zip archives instead of deflated again
+STORE_UNCOMPRESSED_EXTENSIONS = {e.strip().lower() for e in os.getenv(
+    "BACKUP_STORE_UNCOMPRESSED",
+    ".png,.jpg,.jpeg,.gif,.webp,.avif,.ico,.mp4,.mov,.webm,.mp3,.zip,.gz,.zst,.7z,.rar,.woff,.woff2,.pdf",
+).split(",") if e.strip()}
+# Threads compressing zip members in parallel
+ARCHIVE_WORKERS = int(os.getenv("BACKUP_ARCHIVE_WORKERS", str(os.cpu_count() or 1)))
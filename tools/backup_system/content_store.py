@@ -0,0 +1,199 @@
+"""Content-addressed blob store for source-code snapshots.
+
+Each file of SOURCE_DIR is stored once under BACKUP_ROOT/_store/blobs,
+keyed by the SHA-256 of its content and zlib-compressed. A backup only
+writes a small manifest (path -> hash) plus the blobs that were not in the
+store yet, so unchanged files cost nothing on later runs. A stat cache
+(size + mtime) avoids re-hashing files that have not been touched.
+"""
+import io
+import os
+import json
+import zlib
+import fnmatch
+import hashlib
+import logging
+import tempfile
+
+from config import BACKUP_ROOT, SOURCE_DIR, SOURCE_EXCLUDE
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = os.path.join(BACKUP_ROOT, "_store")
+BLOBS_DIR = os.path.join(STORE_DIR, "blobs")
+STAT_CACHE_FILE = os.path.join(STORE_DIR, "stat_cache.json")
+MANIFEST_NAME = "source_manifest.json"
+READ_SIZE = 1024 * 1024
+
+def blob_path(digest):
+    return os.path.join(BLOBS_DIR, digest[:2], f"{digest}.zlib")
+
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(READ_SIZE), b''):
+            h.update(buf)
+    return h.hexdigest()
+
+def _load_stat_cache():
+    try:
+        with open(STAT_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_stat_cache(cache):
+    os.makedirs(STORE_DIR, exist_ok=True)
+    tmp = STAT_CACHE_FILE + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp, STAT_CACHE_FILE)
+
+def put_blob(path, digest):
+    """Compress path into the store under digest.
+
+    The content is hashed again while it is compressed, so a file that
+    changed after digest was computed is stored under the hash of what was
+    actually read, never under a stale one. Returns (digest, bytes written),
+    written being 0 if the blob was already stored.
+    """
+    target = blob_path(digest)
+    if os.path.exists(target):
+        return digest, 0
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    compressor = zlib.compressobj(6)
+    h = hashlib.sha256()
+    # Write to a temp file in the same folder and rename, so a crash never
+    # leaves a truncated blob behind under its final name
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as out, open(path, 'rb') as f:
+            for buf in iter(lambda: f.read(READ_SIZE), b''):
+                h.update(buf)
+                out.write(compressor.compress(buf))
+            out.write(compressor.flush())
+        actual = h.hexdigest()
+        if actual != digest:
+            logger.warning(f"{path} changed while being stored, keeping the content that was read")
+            digest, target = actual, blob_path(actual)
+            if os.path.exists(target):
+                os.remove(tmp)
+                return digest, 0
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp, target)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return digest, os.path.getsize(target)
+
+def is_excluded(name, rel_path, patterns=SOURCE_EXCLUDE):
+    """True when a file or folder matches one of the exclude globs by name or relative path."""
+    return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(rel_path, p) for p in patterns)
+
+def iter_source_files(source_dir=SOURCE_DIR, patterns=SOURCE_EXCLUDE):
+    for root, dirs, files in os.walk(source_dir):
+        rel_root = os.path.relpath(root, source_dir).replace(os.sep, '/')
+        rel_root = "" if rel_root == "." else rel_root + "/"
+        # Block excluded dirs from traversal
+        dirs[:] = [d for d in dirs if not is_excluded(d, rel_root + d, patterns)]
+        for file in files:
+            if not is_excluded(file, rel_root + file, patterns):
+                yield os.path.join(root, file)
+
+def snapshot_source(backup_dir, source_dir=SOURCE_DIR, on_file_done=None):
+    """Store source_dir in the blob store and write its manifest into backup_dir.
+
+    on_file_done(count, arcname) is called after each file; it may raise to
+    abort the snapshot. Returns a summary dict for meta.json.
+    """
+    cache = _load_stat_cache()
+    entries = []
+    new_blobs = bytes_written = bytes_total = 0
+
+    for file_path in iter_source_files(source_dir):
+        arcname = os.path.relpath(file_path, source_dir).replace(os.sep, '/')
+        try:
+            st = os.stat(file_path)
+            cached = cache.get(file_path)
+            if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+                digest = cached[2]
+            else:
+                digest = hash_file(file_path)
+                cache[file_path] = [st.st_size, st.st_mtime_ns, digest]
+            stored, written = put_blob(file_path, digest)
+            if stored != digest:
+                # Hash again next run rather than trust the stat taken before the change
+                digest = stored
+                cache.pop(file_path, None)
+        except OSError as e:
+            logger.warning(f"Skipping {file_path}: {e}")
+            continue
+        if written:
+            new_blobs += 1
+            bytes_written += written
+        bytes_total += st.st_size
+        entries.append({"path": arcname, "hash": digest, "size": st.st_size,
+                        "mtime": st.st_mtime, "mode": st.st_mode & 0o777})
+        if on_file_done:
+            on_file_done(len(entries), arcname)
+
+    _save_stat_cache(cache)
+    with open(os.path.join(backup_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump({"root": source_dir, "files": entries}, f)
+
+    return {
+        "manifest": MANIFEST_NAME,
+        "files": len(entries),
+        "new_blobs": new_blobs,
+        "bytes_source": bytes_total,
+        "bytes_written": bytes_written,
+    }
+
+class BlobReader(io.RawIOBase):
+    """Readable stream of a blob's original (decompressed) content."""
+
+    def __init__(self, digest):
+        self._file = open(blob_path(digest), 'rb')
+        self._decompressor = zlib.decompressobj()
+        self._buf = b''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buf) < size:
+            compressed = self._file.read(READ_SIZE)
+            if not compressed:
+                self._buf += self._decompressor.flush()
+                break
+            self._buf += self._decompressor.decompress(compressed)
+        if size < 0:
+            data, self._buf = self._buf, b''
+        else:
+            data, self._buf = self._buf[:size], self._buf[size:]
+        return data
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+def open_blob(digest):
+    return BlobReader(digest)
+
+def restore_source(backup_dir, target_dir):
+    """Rebuild the source tree of a snapshot backup into target_dir."""
+    with open(os.path.join(backup_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    for entry in manifest["files"]:
+        out_path = os.path.join(target_dir, *entry["path"].split('/'))
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open_blob(entry["hash"]) as src, open(out_path, 'wb') as out:
+            for buf in iter(lambda: src.read(READ_SIZE), b''):
+                out.write(buf)
+        os.utime(out_path, (entry["mtime"], entry["mtime"]))
+        try:
+            os.chmod(out_path, entry["mode"])
+        except OSError:
+            pass
+    return len(manifest["files"])
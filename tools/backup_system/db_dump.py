@@ -0,0 +1,547 @@
+"""Database dump utilities for the backup sidecar."""
+import os
+import json
+import logging
+import math
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+import psutil
+
+from jobs import BackupCancelled
+from compression import CompressedWriter, codec_extension
+from config import (
+    DATABASE_URL, FETCH_BATCH_SIZE, TABLE_MEMORY_LIMIT_MB, DUMP_WORKERS, CHUNK_THRESHOLD_MB,
+    INCREMENTAL_TIMESTAMP_COLUMN, INCREMENTAL_OVERLAP_SECONDS,
+    COMPRESSION_CODEC, COMPRESSION_LEVEL, COMPRESSION_THREADS,
+)
+
+logger = logging.getLogger(__name__)
+
+def get_db_connection():
+    if not DATABASE_URL:
+        raise Exception("DATABASE_URL not found in .env")
+    return psycopg2.connect(DATABASE_URL)
+
+def get_all_tables(conn):
+    """Retrieve all user tables from public and app schemas."""
+    query = """
+    SELECT table_schema, table_name 
+    FROM information_schema.tables 
+    WHERE table_type = 'BASE TABLE' 
+    AND table_schema IN ('public', 'schema_core', 'schema_medical', 'schema_lab', 'schema_logistics', 'auth');
+    """
+    with conn.cursor() as cur:
+        cur.execute(query)
+        return cur.fetchall()
+
+def get_rss_mb():
+    """Current resident set size of the sidecar process in MB."""
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+# Rows in the first fetch of a JSONL dump, before any row size is known;
+# a single row, since even a few very wide rows could pass the ceiling
+PROBE_BATCH_ROWS = 1
+
+def dump_table_to_json(conn, schema, table, output_file,
+                       batch_size=FETCH_BATCH_SIZE, memory_limit_mb=TABLE_MEMORY_LIMIT_MB, where=None,
+                       compression=None, write_schema=True):
+    """Stream a table to a JSON Lines file through a server-side cursor.
+
+    Rows are pulled from a named cursor in batches of at most batch_size, so
+    only one batch is ever held in memory. The first fetch is a one-row probe;
+    every later one is sized from the average encoded row size so far to
+    stay under memory_limit_mb, keeping wide tables (large jsonb/text
+    columns) under the ceiling too. Returns a stats dict with the row count
+    and peak RSS, or None on failure.
+
+    `where` is an optional, already-escaped SQL predicate (see
+    range_predicate) used to export a slice of the table. `compression`
+    is a (codec, level, threads) tuple for the streaming compressor.
+    Like dump_table_copy it writes a <file>.schema.json sidecar (unless
+    write_schema=False) so the dump can be restored into an empty database.
+    """
+    query = f'SELECT * FROM "{schema}"."{table}"'
+    if where:
+        query += f" WHERE {where}"
+    limit_bytes = memory_limit_mb * 1024 * 1024
+    start_rss = peak_rss = get_rss_mb()
+    rows = bytes_serialized = 0
+    fetch_size = min(batch_size, PROBE_BATCH_ROWS)
+    started = time.perf_counter()
+    db_seconds = serialize_seconds = 0.0
+    try:
+        column_schema = get_table_schema(conn, schema, table) if write_schema else None
+        with conn.cursor(name=f"dump_{schema}_{table}_{os.path.basename(output_file)}",
+                         cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(query)
+            with CompressedWriter(output_file, *(compression or ("none",))) as f:
+                while True:
+                    t0 = time.perf_counter()
+                    batch = cur.fetchmany(fetch_size)
+                    t1 = time.perf_counter()
+                    db_seconds += t1 - t0
+                    if not batch:
+                        break
+                    # Convert datetimes to string
+                    chunk = ''.join(json.dumps(row, default=str) + '\n' for row in batch)
+                    data = chunk.encode('utf-8')
+                    serialize_seconds += time.perf_counter() - t1
+                    f.write(data)
+                    rows += len(batch)
+                    # Encoded bytes: non-ASCII text takes more than len(chunk)
+                    bytes_serialized += len(data)
+                    peak_rss = max(peak_rss, get_rss_mb())
+                    # Size the next fetch before it happens, not after it overshoots
+                    fetch_size = max(1, min(batch_size, int(limit_bytes / (bytes_serialized / rows))))
+                    del batch, chunk, data
+        conn.commit()
+        if column_schema:
+            column_schema["format"] = "jsonl"
+            with open(output_file + ".schema.json", 'w', encoding='utf-8') as sf:
+                json.dump(column_schema, sf, indent=2, default=str)
+        return {
+            "rows": rows,
+            "peak_rss_mb": round(peak_rss, 2),
+            "rss_growth_mb": round(peak_rss - start_rss, 2),
+            "final_batch_size": fetch_size,
+            "bytes_raw": f.bytes_raw,
+            "bytes_compressed": f.bytes_compressed,
+            **_timings(time.perf_counter() - started, db_seconds, serialize_seconds, f.write_seconds),
+        }
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Failed to dump {schema}.{table}: {e}")
+        return None
+
+# Per-dump time split reported in table stats and /metrics
+TIMING_KEYS = ("seconds", "db_seconds", "serialize_seconds", "write_seconds")
+
+def _timings(total, db, serialize, write):
+    return dict(zip(TIMING_KEYS, (round(v, 4) for v in (total, db, serialize, write))))
+
+# COPY-based export formats: extension + COPY options
+COPY_FORMATS = {
+    "csv": (".csv", "FORMAT csv, HEADER true"),
+    "binary": (".copy", "FORMAT binary"),
+}
+DB_FORMATS = ("jsonl",) + tuple(COPY_FORMATS)
+
+def get_table_schema(conn, schema, table):
+    """Column definitions and primary key of a table, used to restore COPY dumps."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT column_name, data_type, udt_schema, udt_name, is_nullable, column_default
+            FROM information_schema.columns
+            WHERE table_schema = %s AND table_name = %s
+            ORDER BY ordinal_position
+        """, (schema, table))
+        columns = [
+            {
+                "name": name,
+                "data_type": data_type,
+                "udt_schema": udt_schema,
+                "udt_name": udt_name,
+                "nullable": is_nullable == 'YES',
+                "default": default,
+            }
+            for name, data_type, udt_schema, udt_name, is_nullable, default in cur.fetchall()
+        ]
+        cur.execute("""
+            SELECT a.attname
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = %s::regclass AND i.indisprimary
+            ORDER BY array_position(i.indkey, a.attnum)
+        """, (f'"{schema}"."{table}"',))
+        primary_key = [r[0] for r in cur.fetchall()]
+    return {"schema": schema, "table": table, "columns": columns, "primary_key": primary_key}
+
+def dump_table_copy(conn, schema, table, output_file, fmt="csv", where=None, write_schema=True,
+                    compression=None):
+    """Stream a table with COPY ... TO STDOUT straight into output_file.
+
+    Rows never pass through Python objects, so this avoids the per-row
+    json.dumps cost of dump_table_to_json. A <file>.schema.json sidecar is
+    written next to the data so the dump can be restored with COPY FROM
+    (skipped with write_schema=False for all but the first chunk of a table).
+    """
+    _, options = COPY_FORMATS[fmt]
+    column_schema = get_table_schema(conn, schema, table)
+    column_schema["format"] = fmt
+    columns = ", ".join(f'"{c["name"]}"' for c in column_schema["columns"])
+    if where:
+        query = f'COPY (SELECT {columns} FROM "{schema}"."{table}" WHERE {where}) TO STDOUT WITH ({options})'
+    else:
+        query = f'COPY "{schema}"."{table}" ({columns}) TO STDOUT WITH ({options})'
+    start_rss = get_rss_mb()
+    started = time.perf_counter()
+    try:
+        with conn.cursor() as cur, CompressedWriter(output_file, *(compression or ("none",))) as f:
+            cur.copy_expert(query, f)
+            rows = cur.rowcount
+        # The server formats COPY rows, so anything not spent writing is DB time
+        elapsed = time.perf_counter() - started
+        timings = _timings(elapsed, elapsed - f.write_seconds, 0.0, f.write_seconds)
+        if write_schema:
+            with open(output_file + ".schema.json", 'w', encoding='utf-8') as f:
+                json.dump(column_schema, f, indent=2, default=str)
+        peak_rss = max(start_rss, get_rss_mb())
+        return {
+            "rows": rows,
+            "peak_rss_mb": round(peak_rss, 2),
+            "rss_growth_mb": round(peak_rss - start_rss, 2),
+            "bytes_raw": f.bytes_raw,
+            "bytes_compressed": f.bytes_compressed,
+            **timings,
+        }
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Failed to COPY {schema}.{table}: {e}")
+        return None
+
+def table_file_name(schema, table, fmt, part=None, codec="none"):
+    """Data file name for a table, or for one chunk of it when part is given."""
+    ext = ".jsonl" if fmt == "jsonl" else COPY_FORMATS[fmt][0]
+    suffix = f".part{part:04d}" if part is not None else ""
+    return f"{schema}_{table}{suffix}{ext}{codec_extension(codec)}"
+
+def dump_table(conn, schema, table, db_dir, fmt="jsonl",
+               batch_size=FETCH_BATCH_SIZE, memory_limit_mb=TABLE_MEMORY_LIMIT_MB,
+               where=None, part=None, compression=None):
+    """Dump a table (or one chunk of it) in the requested format.
+
+    Returns its stats (incl. file name) or None.
+    """
+    compression = compression or (COMPRESSION_CODEC, COMPRESSION_LEVEL, COMPRESSION_THREADS)
+    file_name = table_file_name(schema, table, fmt, part, compression[0])
+    out_file = os.path.join(db_dir, file_name)
+    if fmt == "jsonl":
+        stats = dump_table_to_json(conn, schema, table, out_file, batch_size, memory_limit_mb, where,
+                                   compression, write_schema=part in (None, 0))
+    else:
+        stats = dump_table_copy(conn, schema, table, out_file, fmt, where,
+                                write_schema=part in (None, 0), compression=compression)
+    if stats is None:
+        return None
+    stats["file"] = file_name
+    return stats
+
+# --- Intra-table chunking ---
+
+INTEGER_TYPES = ('int2', 'int4', 'int8')
+
+def plan_chunks(conn, schema, table, size_bytes, chunk_bytes=CHUNK_THRESHOLD_MB * 1024 * 1024):
+    """Split a table larger than chunk_bytes into ranges of roughly chunk_bytes.
+
+    Tables with a single integer primary key are split on key ranges; any
+    other table (uuid keys, composite keys, no key) is split on physical
+    ctid page ranges. The first range has no lower bound and the last has
+    no upper bound so rows outside the estimate are never lost. Returns a
+    chunk plan dict or None when the table is small enough to dump whole.
+    """
+    parts = math.ceil(size_bytes / chunk_bytes) if chunk_bytes > 0 else 1
+    if parts <= 1:
+        return None
+    relation = f'"{schema}"."{table}"'
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT a.attname, t.typname
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            JOIN pg_type t ON t.oid = a.atttypid
+            WHERE i.indrelid = %s::regclass AND i.indisprimary
+        """, (relation,))
+        pk = cur.fetchall()
+
+        if len(pk) == 1 and pk[0][1] in INTEGER_TYPES:
+            column = pk[0][0]
+            cur.execute(f'SELECT min("{column}"), max("{column}") FROM {relation}')
+            low, high = cur.fetchone()
+            if low is None:
+                return None
+            step = max(1, math.ceil((high - low + 1) / parts))
+            bounds = list(range(low + step, high + 1, step))
+            strategy = "pk"
+        else:
+            column = "ctid"
+            cur.execute("SELECT relpages FROM pg_class WHERE oid = %s::regclass", (relation,))
+            pages = cur.fetchone()[0]
+            step = max(1, math.ceil((pages + 1) / parts))
+            bounds = [f"({p},0)" for p in range(step, pages + 1, step)]
+            strategy = "ctid"
+
+    edges = [None] + bounds + [None]
+    ranges = [{"lower": edges[i], "upper": edges[i + 1]} for i in range(len(edges) - 1)]
+    if len(ranges) <= 1:
+        return None
+    return {"strategy": strategy, "column": column, "ranges": ranges}
+
+def range_predicate(conn, plan, chunk):
+    """SQL predicate (escaped) selecting one range of a chunk plan."""
+    column = '"ctid"' if plan["strategy"] == "ctid" else f'"{plan["column"]}"'
+    cast = "::tid" if plan["strategy"] == "ctid" else ""
+    clauses, params = [], []
+    if chunk["lower"] is not None:
+        clauses.append(f"{column} >= %s{cast}")
+        params.append(chunk["lower"])
+    if chunk["upper"] is not None:
+        clauses.append(f"{column} < %s{cast}")
+        params.append(chunk["upper"])
+    with conn.cursor() as cur:
+        return cur.mogrify(" AND ".join(clauses), params).decode()
+
+# --- Parallel, snapshot-consistent dump ---
+
+def get_table_sizes(conn, tables):
+    """Order tables largest-first using pg_class size estimates.
+
+    Returns (schema, table, size_bytes, estimated_rows) tuples.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT n.nspname, c.relname, pg_total_relation_size(c.oid), c.reltuples::bigint
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relkind IN ('r', 'p')
+        """)
+        sizes = {(r[0], r[1]): (r[2], max(r[3], 0)) for r in cur.fetchall()}
+    conn.rollback()
+    sized = [(schema, table) + sizes.get((schema, table), (0, 0)) for schema, table in tables]
+    sized.sort(key=lambda t: t[2], reverse=True)
+    return sized
+
+def export_snapshot(conn):
+    """Open a repeatable-read transaction on conn and export its snapshot.
+
+    The transaction must stay open (conn must not commit) until every worker
+    has imported the snapshot. Returns None when the server or pooler does
+    not support exported snapshots (e.g. pgbouncer in transaction mode).
+    """
+    conn.set_session(isolation_level=psycopg2.extensions.ISOLATION_LEVEL_REPEATABLE_READ,
+                     readonly=True)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_export_snapshot()")
+            return cur.fetchone()[0]
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f"pg_export_snapshot unavailable, dumping without a shared snapshot: {e}")
+        return None
+
+def get_wal_lsn(conn):
+    """Current WAL insert position as text (e.g. '0/16B3748'), or None on a standby.
+
+    Read before the snapshot is exported, so every transaction missing from
+    the snapshot commits after this position; continuous WAL segments are
+    replayed from here (see wal_stream.py).
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_current_wal_lsn()::text")
+            lsn = cur.fetchone()[0]
+        conn.commit()
+        return lsn
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f"Could not read the WAL position: {e}")
+        return None
+
+def get_snapshot_position(conn):
+    """Wall-clock time and transaction horizon of conn's current snapshot.
+
+    Stored in meta.json so a later incremental backup can select the rows
+    changed after this backup.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT now(), txid_snapshot_xmin(txid_current_snapshot())")
+        taken_at, xmin64 = cur.fetchone()
+    return {"taken_at": taken_at.isoformat(), "xmin": xmin64 & 0xFFFFFFFF, "epoch": xmin64 >> 32}
+
+# --- Incremental backups ---
+
+def get_timestamp_column(conn, schema, table):
+    """Name of the table's updated_at column (timestamp types only), or None."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = %s AND table_name = %s
+            AND column_name = %s AND data_type LIKE 'timestamp%%'
+        """, (schema, table, INCREMENTAL_TIMESTAMP_COLUMN))
+        row = cur.fetchone()
+    return row[0] if row else None
+
+def incremental_predicate(conn, schema, table, since):
+    """Predicate selecting rows changed after the parent snapshot `since`.
+
+    Tables with an updated_at column are filtered on it, starting
+    INCREMENTAL_OVERLAP_SECONDS before the parent snapshot so transactions
+    that were still in flight at that instant are not missed. Other tables
+    fall back to the row's xmin against the parent's transaction horizon;
+    after an xid epoch change (wraparound) the table is dumped in full.
+    Deleted rows are not captured, so chains should periodically restart
+    from a full backup.
+
+    Returns (predicate or None, strategy info dict).
+    """
+    column = get_timestamp_column(conn, schema, table)
+    with conn.cursor() as cur:
+        if column:
+            cur.execute("SELECT %s::timestamptz - make_interval(secs => %s)",
+                        (since["taken_at"], INCREMENTAL_OVERLAP_SECONDS))
+            lower = cur.fetchone()[0]
+            where = cur.mogrify(f'"{column}" >= %s', (lower,)).decode()
+            return where, {"strategy": "updated_at", "column": column, "since": lower.isoformat()}
+        current = get_snapshot_position(conn)
+        if since.get("xmin") is None or current["epoch"] != since.get("epoch"):
+            return None, {"strategy": "full"}
+        where = cur.mogrify("xmin::text::bigint >= %s", (since["xmin"],)).decode()
+        return where, {"strategy": "xmin", "since": since["xmin"]}
+
+def _open_worker_connection():
+    conn = get_db_connection()
+    conn.set_session(isolation_level=psycopg2.extensions.ISOLATION_LEVEL_REPEATABLE_READ,
+                     readonly=True)
+    return conn
+
+def _dump_with_snapshot(pool, snapshot_id, schema, table, db_dir, fmt, batch_size, memory_limit_mb,
+                        plan=None, part=None, filter_where=None, cancel_event=None, compression=None):
+    if cancel_event is not None and cancel_event.is_set():
+        return None
+    conn = pool.get()
+    try:
+        if snapshot_id:
+            # First statement of the transaction, so every table sees the same instant
+            with conn.cursor() as cur:
+                cur.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+        clauses = [filter_where, range_predicate(conn, plan, plan["ranges"][part]) if plan else None]
+        where = " AND ".join(f"({c})" for c in clauses if c) or None
+        return dump_table(conn, schema, table, db_dir, fmt, batch_size, memory_limit_mb,
+                          where=where, part=part, compression=compression)
+    except Exception as e:
+        logger.error(f"Failed to dump {schema}.{table}: {e}")
+        return None
+    finally:
+        conn.rollback()
+        pool.put(conn)
+
+def dump_tables_parallel(tables, db_dir, fmt="jsonl", batch_size=FETCH_BATCH_SIZE,
+                         memory_limit_mb=TABLE_MEMORY_LIMIT_MB, workers=DUMP_WORKERS,
+                         chunk_threshold_mb=CHUNK_THRESHOLD_MB, incremental_since=None,
+                         on_table_done=None, cancel_event=None, compression=None):
+    """Dump tables concurrently on a pool of connections sharing one snapshot.
+
+    A coordinator connection exports a snapshot and holds it open while
+    `workers` connections import it per task, so all files reflect the same
+    instant. Tables bigger than chunk_threshold_mb are split into ranges
+    (see plan_chunks) that are dumped as separate part files. Tasks are
+    scheduled largest-first so the wall-clock time tends toward the time of
+    the biggest task.
+
+    With incremental_since (the parent's snapshot position) only rows
+    changed since the parent are exported; see incremental_predicate.
+
+    on_table_done(schema, table, stats) is called as each task finishes.
+    Setting cancel_event stops scheduling new tasks and raises
+    BackupCancelled once the running ones return.
+
+    Returns (stats_by_table, chunk_manifest, snapshot) where snapshot holds
+    the exported snapshot id and its position (get_snapshot_position).
+    """
+    coordinator = get_db_connection()
+    pool = queue.Queue()
+    results = {}
+    chunks = {}
+    try:
+        ordered = get_table_sizes(coordinator, tables)
+        wal_lsn = get_wal_lsn(coordinator)
+        snapshot_id = export_snapshot(coordinator)
+        snapshot = dict(get_snapshot_position(coordinator), id=snapshot_id, wal_lsn=wal_lsn)
+
+        # Plan inside the exported snapshot so key ranges match what workers see
+        tasks = []
+        filters = {}
+        for schema, table, size, _ in ordered:
+            if incremental_since:
+                filters[(schema, table)] = incremental_predicate(coordinator, schema, table, incremental_since)
+            plan = None
+            if chunk_threshold_mb and size > chunk_threshold_mb * 1024 * 1024:
+                plan = plan_chunks(coordinator, schema, table, size, chunk_threshold_mb * 1024 * 1024)
+            if plan:
+                plan["format"] = fmt
+                plan["parts"] = []
+                chunks[f"{schema}.{table}"] = plan
+                share = size // len(plan["ranges"])
+                tasks += [(share, schema, table, plan, part) for part in range(len(plan["ranges"]))]
+            else:
+                tasks.append((size, schema, table, None, None))
+        tasks.sort(key=lambda t: t[0], reverse=True)
+
+        workers = max(1, min(workers, len(tasks) or 1))
+        for _ in range(workers):
+            pool.put(_open_worker_connection())
+
+        part_stats = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_dump_with_snapshot, pool, snapshot_id, schema, table,
+                                db_dir, fmt, batch_size, memory_limit_mb, plan, part,
+                                filters.get((schema, table), (None,))[0], cancel_event,
+                                compression): (schema, table, size, part)
+                for size, schema, table, plan, part in tasks
+            }
+            for future in as_completed(futures):
+                schema, table, size, part = futures[future]
+                stats = future.result()
+                key = f"{schema}.{table}"
+                if stats and part is None:
+                    stats["estimated_bytes"] = size
+                    results[key] = stats
+                elif part is not None:
+                    part_stats[(key, part)] = stats
+                if on_table_done:
+                    on_table_done(schema, table, stats)
+                if cancel_event is not None and cancel_event.is_set():
+                    for pending in futures:
+                        pending.cancel()
+                    raise BackupCancelled("Backup cancelled during DB dump")
+
+        # Fold chunk results into one entry per table plus its manifest.
+        # A table with any failed chunk is left out, like a failed table.
+        for key, plan in chunks.items():
+            parts = [part_stats.get((key, p)) for p in range(len(plan["ranges"]))]
+            if not all(parts):
+                logger.error(f"Chunked dump of {key} incomplete, skipping")
+                continue
+            for rng, stats in zip(plan["ranges"], parts):
+                plan["parts"].append({"file": stats["file"], "lower": rng["lower"],
+                                      "upper": rng["upper"], "rows": stats["rows"]})
+            results[key] = {
+                "rows": sum(p["rows"] for p in parts),
+                "peak_rss_mb": max(p["peak_rss_mb"] for p in parts),
+                "rss_growth_mb": max(p["rss_growth_mb"] for p in parts),
+                "bytes_raw": sum(p["bytes_raw"] for p in parts),
+                "bytes_compressed": sum(p["bytes_compressed"] for p in parts),
+                # Summed worker time across chunks, not wall-clock time
+                **{k: round(sum(p.get(k, 0) for p in parts), 4) for k in TIMING_KEYS},
+                "files": [p["file"] for p in parts],
+                "chunked": True,
+            }
+        for plan in chunks.values():
+            del plan["ranges"]
+
+        for (schema, table), (_, info) in filters.items():
+            if f"{schema}.{table}" in results:
+                results[f"{schema}.{table}"]["incremental"] = info
+
+        # Report in largest-first order rather than completion order
+        ordered_results = {f"{s}.{t}": results[f"{s}.{t}"] for s, t, _, _ in ordered if f"{s}.{t}" in results}
+        ordered_chunks = {k: v for k, v in chunks.items() if k in ordered_results}
+        return ordered_results, ordered_chunks, snapshot
+    finally:
+        while not pool.empty():
+            pool.get().close()
+        coordinator.close()
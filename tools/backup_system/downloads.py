@@ -0,0 +1,166 @@
+"""Streaming download helpers for backup artifacts.
+
+Files are sent in fixed-size chunks (or with the server's zero-copy
+sendfile extension when available) and support single HTTP Range
+requests, so interrupted transfers can resume. Whole backup folders are
+streamed as a tar archive built on the fly: headers are generated per
+file and file bodies are copied through in chunks, so memory use does not
+depend on the archive size and no temporary archive is written.
+"""
+import os
+import re
+import json
+import tarfile
+
+from starlette.responses import Response
+from starlette.concurrency import run_in_threadpool
+
+from config import BACKUP_ROOT
+from content_store import MANIFEST_NAME, open_blob
+
+CHUNK_SIZE = 256 * 1024
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def resolve_backup_path(backup_id, rel_path=""):
+    """Absolute path of rel_path inside a backup folder, or None if it escapes it."""
+    root = os.path.realpath(BACKUP_ROOT)
+    backup_dir = os.path.realpath(os.path.join(root, backup_id))
+    if os.path.dirname(backup_dir) != root or os.path.basename(backup_dir).startswith('_'):
+        return None
+    target = os.path.realpath(os.path.join(backup_dir, rel_path))
+    if target != backup_dir and not target.startswith(backup_dir + os.sep):
+        return None
+    return target
+
+def list_backup_files(backup_dir):
+    files = []
+    for root, _, names in os.walk(backup_dir):
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            files.append({
+                "path": os.path.relpath(path, backup_dir).replace(os.sep, '/'),
+                "size": os.path.getsize(path),
+            })
+    return files
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single 'bytes=' range, None to send the whole
+    file, or 'invalid' for an unsatisfiable range."""
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None  # multi-range or unknown unit: ignore and send everything
+    first, last = match.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":
+        length = int(last)
+        if length == 0:
+            return "invalid"
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return "invalid"
+    return start, end
+
+class RangeFileResponse(Response):
+    """File response with Range support and constant memory use."""
+
+    def __init__(self, path, range_header=None, filename=None, media_type="application/octet-stream"):
+        super().__init__(media_type=media_type)
+        self.path = path
+        self.size = os.path.getsize(path)
+        rng = parse_range(range_header, self.size)
+        self.headers["accept-ranges"] = "bytes"
+        if filename:
+            self.headers["content-disposition"] = f'attachment; filename="{filename}"'
+        if rng == "invalid":
+            self.status_code = 416
+            self.headers["content-range"] = f"bytes */{self.size}"
+            self.start, self.end = 0, -1
+        elif rng:
+            self.status_code = 206
+            self.start, self.end = rng
+            self.headers["content-range"] = f"bytes {self.start}-{self.end}/{self.size}"
+        else:
+            self.start, self.end = 0, self.size - 1
+        self.headers["content-length"] = str(self.end - self.start + 1)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code,
+                    "headers": self.raw_headers})
+        count = self.end - self.start + 1
+        if count <= 0 or scope.get("method") == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        with open(self.path, 'rb') as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                # Let the server sendfile() straight from the descriptor
+                await send({"type": "http.response.zerocopysend", "file": f.fileno(),
+                            "offset": self.start, "count": count})
+                return
+            f.seek(self.start)
+            while count > 0:
+                chunk = await run_in_threadpool(f.read, min(CHUNK_SIZE, count))
+                if not chunk:
+                    break
+                count -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": count > 0})
+            if count > 0:
+                await send({"type": "http.response.body", "body": b""})
+
+def _member(name, size, mtime, opener):
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    return opener, info, info.tobuf(tarfile.PAX_FORMAT)
+
+def tar_members(backup_dir, prefix, include_source=True):
+    """Members of a backup's tar stream as (opener, TarInfo, header) tuples.
+
+    With include_source, a snapshot backup's source tree is rebuilt from the
+    blob store under source/ instead of shipping only its manifest.
+    """
+    members = []
+    for root, _, names in os.walk(backup_dir):
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            st = os.stat(path)
+            arcname = prefix + "/" + os.path.relpath(path, backup_dir).replace(os.sep, '/')
+            members.append(_member(arcname, st.st_size, st.st_mtime, lambda p=path: open(p, 'rb')))
+
+    manifest_path = os.path.join(backup_dir, MANIFEST_NAME)
+    if include_source and os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        for entry in manifest["files"]:
+            members.append(_member(f"{prefix}/source/{entry['path']}", entry["size"], entry["mtime"],
+                                   lambda h=entry["hash"]: open_blob(h)))
+    return members
+
+def tar_stream_length(members):
+    total = 0
+    for _, info, header in members:
+        total += len(header) + info.size + (-info.size % tarfile.BLOCKSIZE)
+    return total + 2 * tarfile.BLOCKSIZE
+
+def iter_tar_stream(members):
+    """Yield a tar archive of members chunk by chunk."""
+    for opener, info, header in members:
+        yield header
+        remaining = info.size
+        with opener() as f:
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f"{info.name} shrank while streaming")
+                remaining -= len(chunk)
+                yield chunk
+        padding = -info.size % tarfile.BLOCKSIZE
+        if padding:
+            yield b"\0" * padding
+    # End-of-archive marker: two zero blocks
+    yield b"\0" * (2 * tarfile.BLOCKSIZE)
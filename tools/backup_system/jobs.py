@@ -0,0 +1,159 @@
+"""Background job runner for the backup sidecar.
+
+Backups run on a bounded thread pool instead of inside the HTTP request.
+Each job keeps an append-only list of progress events that the dashboard
+reads through a Server-Sent Events stream, and a cancel flag that the
+dump/snapshot loops check between tables and files.
+"""
+import time
+import uuid
+import logging
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import MAX_CONCURRENT_JOBS, MAX_QUEUED_JOBS, JOB_HISTORY
+
+logger = logging.getLogger(__name__)
+
+class BackupCancelled(Exception):
+    """Raised inside a job when its cancellation was requested."""
+
+class JobRejected(Exception):
+    """Raised when the job queue is full."""
+
+class BackupJob:
+    def __init__(self, kind, params=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params or {}
+        self.status = "queued"  # queued | running | succeeded | failed | cancelled
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.events = []
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def emit(self, event_type, **data):
+        with self._lock:
+            self.events.append({"seq": len(self.events), "type": event_type, "ts": time.time(), **data})
+
+    def events_since(self, seq):
+        with self._lock:
+            return self.events[seq:]
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise BackupCancelled(f"Job {self.id} cancelled")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            "events": len(self.events),
+        }
+
+class JobManager:
+    def __init__(self, max_workers=MAX_CONCURRENT_JOBS, max_queued=MAX_QUEUED_JOBS, history=JOB_HISTORY):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="backup-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_queued = max_queued
+        self.history = history
+        self.finished_counts = Counter()  # (kind, status) -> jobs, for /metrics
+
+    def active_jobs(self):
+        with self._lock:
+            return [j for j in self._jobs.values() if not j.finished]
+
+    def active_count(self):
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if not j.finished)
+
+    def queue_depth(self):
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j.status == "queued")
+
+    def submit(self, kind, fn, params=None):
+        """Queue fn(job) to run in the pool. Raises JobRejected when the queue is full."""
+        with self._lock:
+            queued = sum(1 for j in self._jobs.values() if j.status == "queued")
+            if queued >= self.max_queued:
+                raise JobRejected(f"Too many queued jobs ({queued}), try again later")
+            job = BackupJob(kind, params)
+            self._jobs[job.id] = job
+            self._prune()
+        job.emit("queued")
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job, fn):
+        if job.cancel_event.is_set():
+            job.finished_at = time.time()
+            job.emit("cancelled")
+            job.status = "cancelled"
+            self._count(job)
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        job.emit("started")
+        # The final event is emitted before the status flips, so a reader
+        # that sees a finished job has already got every event
+        try:
+            job.result = fn(job)
+            job.finished_at = time.time()
+            job.emit("done", result=job.result)
+            job.status = "succeeded"
+        except BackupCancelled:
+            job.finished_at = time.time()
+            job.emit("cancelled")
+            job.status = "cancelled"
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.finished_at = time.time()
+            job.emit("failed", error=str(e))
+            job.status = "failed"
+        self._count(job)
+
+    def _count(self, job):
+        with self._lock:
+            self.finished_counts[(job.kind, job.status)] += 1
+
+    def _prune(self):
+        # Forget the oldest finished jobs beyond the history limit
+        finished = [jid for jid, j in self._jobs.items() if j.finished]
+        for jid in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[jid]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return [j.to_dict() for j in reversed(self._jobs.values())]
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if not job.finished:
+            job.cancel_event.set()
+            job.emit("cancel_requested")
+        return job
+
+job_manager = JobManager()
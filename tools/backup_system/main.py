@@ -1,94 +1,101 @@
 import os
 import shutil
-import zipfile
 import json
 import csv
+import time
 import datetime
 import logging
-from typing import List
+import asyncio
+from typing import List, Optional
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-import psycopg2
-import psycopg2.extras
-from dotenv import load_dotenv
+
+from config import (
+    TEMPLATES_DIR, BACKUP_ROOT,
+    FETCH_BATCH_SIZE, TABLE_MEMORY_LIMIT_MB, DUMP_WORKERS, CHUNK_THRESHOLD_MB,
+    RESTORE_WORKERS, RESTORE_BATCH_ROWS,
+    COMPRESSION_CODEC, COMPRESSION_LEVEL, COMPRESSION_THREADS,
+    S3_REPLICATE_ON_CREATE, RETENTION_PRUNE_ON_CREATE, SCHEDULER_ENABLED, WAL_STREAM_ENABLED,
+)
+from db_dump import DB_FORMATS, get_db_connection, get_all_tables, dump_tables_parallel
+from content_store import snapshot_source
+from archive import zip_source_code, tar_source_code
+from compression import CODEC_EXTENSIONS, codec_extension
+from catalog import query_backups, record_backup, latest_db_backup, sync_catalog
+from restore import restore_database, apply_wal
+from downloads import (
+    RangeFileResponse, resolve_backup_path, list_backup_files,
+    tar_members, tar_stream_length, iter_tar_stream,
+)
+from replication import replicate_backup, replication_enabled
+from verify import write_checksum_manifest, verify_backup
+from retention import apply_retention
+from scheduler import BackupScheduler
+from wal_stream import WalStreamer
+from metrics import record_timings, timing_history, render_metrics
+from jobs import BackupJob, BackupCancelled, JobRejected, job_manager
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Load Env
-# Load Env
-load_dotenv(os.path.join(os.path.dirname(__file__), '../../.env'))
-
 app = FastAPI(title="DentalFlow Backup Sidecar")
 
-# Config with Absolute Paths
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
-BACKUP_ROOT = r"D:\DentalFlow_Backups"
-SOURCE_DIR = r"D:\DentalFlow"
-DATABASE_URL = os.getenv("DATABASE_URL")
+@app.on_event("startup")
+def index_existing_backups():
+    sync_catalog(force=True)
 
-# --- Utilities ---
+@app.on_event("startup")
+def start_scheduler():
+    if SCHEDULER_ENABLED:
+        scheduler.start()
 
-def get_db_connection():
-    if not DATABASE_URL:
-        raise Exception("DATABASE_URL not found in .env")
-    return psycopg2.connect(DATABASE_URL)
-
-def get_all_tables(conn):
-    """Retrieve all user tables from public and app schemas."""
-    query = """
-    SELECT table_schema, table_name 
-    FROM information_schema.tables 
-    WHERE table_type = 'BASE TABLE' 
-    AND table_schema IN ('public', 'schema_core', 'schema_medical', 'schema_lab', 'schema_logistics', 'auth');
-    """
-    with conn.cursor() as cur:
-        cur.execute(query)
-        return cur.fetchall()
-
-def dump_table_to_json(conn, schema, table, output_file):
-    """Select * from table and write to JSON Lines file."""
-    query = f'SELECT * FROM "{schema}"."{table}"'
-    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        try:
-            cur.execute(query)
-            with open(output_file, 'w', encoding='utf-8') as f:
-                for row in cur:
-                    # Convert datetimes to string
-                    json_row = json.dumps(row, default=str)
-                    f.write(json_row + '\n')
-            return True
-        except Exception as e:
-            logger.error(f"Failed to dump {schema}.{table}: {e}")
-            return False
+@app.on_event("shutdown")
+def stop_scheduler():
+    scheduler.stop()
 
-def zip_source_code(output_path):
-    """Zip specific folders from D:\DentalFlow."""
-    # Exclude heavy folders
-    EXCLUDE_DIRS = {'node_modules', '.next', '.git', 'logs', 'tmp', '.gemini'}
-    
-    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(SOURCE_DIR):
-            # Block excluded dirs from traversal
-            dirs[:] = [d for d in dirs if d not in EXCLUDE_DIRS]
-            
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, SOURCE_DIR)
-                zipf.write(file_path, arcname)
+@app.on_event("startup")
+def start_wal_stream():
+    if WAL_STREAM_ENABLED:
+        wal_streamer.start()
+
+@app.on_event("shutdown")
+def stop_wal_stream():
+    wal_streamer.stop()
+
+# --- Utilities ---
+
+def read_backup_meta(backup_id):
+    """meta.json of a backup, or None if it does not exist (or the id is not a backup folder)."""
+    meta_path = resolve_backup_path(backup_id, "meta.json")
+    if not meta_path or not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r') as f:
+        return json.load(f)
 
 # --- Routes ---
 
 class BackupRequest(BaseModel):
     include_code: bool = True
     include_db: bool = True
+    code_mode: str = "snapshot"  # snapshot (deduplicated blob store) | zip
+    db_format: str = "jsonl"  # jsonl | csv | binary
+    fetch_batch_size: int = FETCH_BATCH_SIZE
+    memory_limit_mb: int = TABLE_MEMORY_LIMIT_MB
+    parallel_workers: int = DUMP_WORKERS
+    chunk_threshold_mb: int = CHUNK_THRESHOLD_MB
+    compression: str = COMPRESSION_CODEC  # none | gzip | zstd
+    compression_level: int = COMPRESSION_LEVEL  # 0 = codec default
+    compression_threads: int = COMPRESSION_THREADS
+    backup_type: str = "full"  # full | incremental
+    parent_id: Optional[str] = None  # incremental parent (default: latest DB backup)
+    replicate: bool = S3_REPLICATE_ON_CREATE  # upload to S3 once written
+    tables: Optional[List[str]] = None  # "schema.table" or "schema" names; None = all tables
     note: str = ""
 
 @app.get("/", response_class=HTMLResponse)
@@ -96,31 +103,22 @@ async def read_dashboard(request: Request):
     return templates.TemplateResponse("dashboard.html", {"request": request})
 
 @app.get("/api/backup/list")
-def list_backups():
-    if not os.path.exists(BACKUP_ROOT):
-        return {"backups": []}
-        
-    backups = []
-    for entry in os.scandir(BACKUP_ROOT):
-        if entry.is_dir():
-            meta_path = os.path.join(entry.path, "meta.json")
-            if os.path.exists(meta_path):
-                try:
-                    with open(meta_path, 'r') as f:
-                        meta = json.load(f)
-                        # Calculate size
-                        size_bytes = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
-                        meta['size'] = f"{size_bytes / (1024*1024):.2f} MB"
-                        backups.append(meta)
-                except:
-                    pass
-    
-    # Sort by date desc
-    backups.sort(key=lambda x: x['timestamp'], reverse=True)
-    return {"backups": backups}
+def list_backups(page: int = 1, page_size: int = 50, backup_type: Optional[str] = None):
+    page = max(1, page)
+    page_size = max(1, min(page_size, 500))
+    backups, total = query_backups(page, page_size, backup_type)
+    return {"backups": backups, "total": total, "page": page, "page_size": page_size}
+
+def run_backup(payload: BackupRequest, parent=None, job: Optional[BackupJob] = None):
+    """Run one backup end to end. Raises on failure; returns the result dict.
+
+    When job is given, per-table and per-file progress is emitted on it and
+    its cancel flag is honoured between tables and files.
+    """
+    def progress(event_type, **data):
+        if job:
+            job.emit(event_type, **data)
 
-@app.post("/api/backup/create")
-def create_backup(payload: BackupRequest):
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     backup_dir = os.path.join(BACKUP_ROOT, timestamp)
     os.makedirs(backup_dir, exist_ok=True)
@@ -131,8 +129,19 @@ def create_backup(payload: BackupRequest):
         "date": timestamp,
         "type": [],
         "note": payload.note,
-        "files": []
+        "db_format": payload.db_format if payload.include_db else None,
+        "backup_type": payload.backup_type,
+        "parent_id": parent['id'] if parent else None,
+        # Backups to restore first, oldest (the full base) first
+        "chain": (parent.get('chain', []) + [parent['id']]) if parent else [],
+        "files": [],
+        "tables": {}
     }
+    compression = (payload.compression, payload.compression_level, max(1, payload.compression_threads))
+    summary['compression'] = {"codec": compression[0], "level": compression[1], "threads": compression[2]}
+    timings = summary['timings'] = {}
+    started = time.perf_counter()
+    progress("backup_started", backup_id=timestamp)
 
     try:
         # 1. DB Backup
@@ -140,38 +149,421 @@ def create_backup(payload: BackupRequest):
             db_dir = os.path.join(backup_dir, "database")
             os.makedirs(db_dir, exist_ok=True)
             logger.info("Starting DB Backup...")
+            db_started = time.perf_counter()
             
             conn = get_db_connection()
             tables = get_all_tables(conn)
-            
-            for schema, table in tables:
-                file_name = f"{schema}_{table}.jsonl"
-                out_file = os.path.join(db_dir, file_name)
-                if dump_table_to_json(conn, schema, table, out_file):
-                    summary['files'].append(file_name)
-            
             conn.close()
+            if payload.tables:
+                wanted = set(payload.tables)
+                tables = [(s, t) for s, t in tables if s in wanted or f"{s}.{t}" in wanted]
+                # Not a complete DB image: never used as an incremental parent
+                summary['partial'] = True
+            progress("db_started", tables=len(tables))
+
+            done = []
+            def on_table_done(schema, table, stats):
+                done.append(table)
+                progress("table_done", table=f"{schema}.{table}", ok=stats is not None,
+                         part=(stats or {}).get("file"), rows=(stats or {}).get("rows"), done=len(done))
+
+            table_stats, chunks, snapshot = dump_tables_parallel(
+                tables, db_dir, payload.db_format,
+                payload.fetch_batch_size, payload.memory_limit_mb, payload.parallel_workers,
+                payload.chunk_threshold_mb,
+                incremental_since=parent['snapshot'] if parent else None,
+                on_table_done=on_table_done,
+                cancel_event=job.cancel_event if job else None,
+                compression=compression,
+            )
+            # Keep largest-first order in meta.json
+            for key, stats in table_stats.items():
+                summary['files'].extend(stats['files'] if stats.get('chunked') else [stats['file']])
+                summary['tables'][key] = stats
+            summary['chunks'] = chunks
+            summary['snapshot_id'] = snapshot['id']
+            summary['snapshot'] = snapshot
+            summary['parallel_workers'] = payload.parallel_workers
+            summary['db_bytes_raw'] = sum(s.get('bytes_raw', 0) for s in table_stats.values())
+            summary['db_bytes_compressed'] = sum(s.get('bytes_compressed', 0) for s in table_stats.values())
+
             summary['type'].append("DB")
+            timings['db_seconds'] = round(time.perf_counter() - db_started, 3)
+            progress("db_done", tables=len(table_stats))
             logger.info("DB Backup complete.")
 
         # 2. Code Backup
         if payload.include_code:
             logger.info("Starting Code Backup...")
-            code_zip = os.path.join(backup_dir, f"source_{timestamp}.zip")
-            zip_source_code(code_zip)
+            progress("code_started", mode=payload.code_mode)
+            code_started = time.perf_counter()
+            code_files = [0]
+
+            def on_file_done(count, arcname):
+                code_files[0] = count
+                if job:
+                    job.check_cancelled()
+                if count % 200 == 0:
+                    progress("files_progress", files=count, path=arcname)
+
+            if payload.code_mode == "zip" and payload.compression != "none":
+                archive = f"source_{timestamp}.tar{codec_extension(payload.compression)}"
+                bytes_raw, bytes_compressed = tar_source_code(os.path.join(backup_dir, archive),
+                                                              compression, on_file_done)
+                summary['source_archive'] = {"file": archive, "bytes_raw": bytes_raw,
+                                             "bytes_compressed": bytes_compressed}
+                code_bytes = bytes_raw
+            elif payload.code_mode == "zip":
+                archive = f"source_{timestamp}.zip"
+                zip_stats = zip_source_code(os.path.join(backup_dir, archive), on_file_done)
+                summary['source_archive'] = {"file": archive, **zip_stats}
+                code_bytes = zip_stats['bytes_raw']
+            else:
+                summary['source_snapshot'] = snapshot_source(backup_dir, on_file_done=on_file_done)
+                code_bytes = summary['source_snapshot']['bytes_source']
+            timings['code_seconds'] = round(time.perf_counter() - code_started, 3)
+            timings['code_files'] = code_files[0]
+            timings['code_bytes'] = code_bytes
+            summary['code_mode'] = payload.code_mode
             summary['type'].append("CODE")
+            progress("code_done")
             logger.info("Code Backup complete.")
 
+        # Checksums of everything written so far (meta.json itself excluded)
+        summary['checksums'] = write_checksum_manifest(backup_dir, summary['tables'])
+        progress("checksums_done", files=summary['checksums']['files'])
+
         # Save Metadata
         summary['type'] = " + ".join(summary['type'])
+        timings['total_seconds'] = round(time.perf_counter() - started, 3)
         with open(os.path.join(backup_dir, "meta.json"), 'w') as f:
             json.dump(summary, f, indent=2)
+        record_backup(backup_dir, summary)
+        try:
+            record_timings(summary)
+        except Exception as e:
+            logger.warning(f"Could not record timings of {timestamp}: {e}")
+
+        # 3. Off-site copy
+        if payload.replicate and replication_enabled():
+            progress("replication_started")
+
+            def on_uploaded(count, total):
+                if count % 50 == 0 or count == total:
+                    progress("replication_progress", files=count, total=total)
+
+            try:
+                replication = replicate_backup(timestamp, on_file_done=on_uploaded,
+                                               cancel_event=job.cancel_event if job else None)
+                progress("replication_done", **replication)
+            except BackupCancelled:
+                # Keep the finished local backup; only the upload stops
+                progress("replication_cancelled")
+            except Exception as e:
+                # The local backup is complete; the catalog keeps the failure for a retry
+                logger.error(f"Replication of {timestamp} failed: {e}")
+                progress("replication_failed", error=str(e))
+
+        # 4. Retention
+        if RETENTION_PRUNE_ON_CREATE:
+            try:
+                report = apply_retention(dry_run=False, **retention_guards(job))
+                progress("retention_done", pruned=len(report['pruned']),
+                         bytes_reclaimed=report['bytes_reclaimed'])
+            except Exception as e:
+                logger.error(f"Retention after {timestamp} failed: {e}")
+                progress("retention_failed", error=str(e))
+
+        return {"backup_id": timestamp, "path": backup_dir, "tables": summary['tables']}
+
+    except BackupCancelled:
+        logger.info(f"Backup {timestamp} cancelled, removing partial files")
+        shutil.rmtree(backup_dir, ignore_errors=True)
+        raise
+
+def validate_backup_options(payload):
+    """Error message for an invalid BackupRequest, or None."""
+    if payload.db_format not in DB_FORMATS:
+        return f"Unknown db_format '{payload.db_format}'. Use one of: {', '.join(DB_FORMATS)}"
+    if payload.compression not in CODEC_EXTENSIONS:
+        return f"Unknown compression '{payload.compression}'. Use one of: {', '.join(CODEC_EXTENSIONS)}"
+    if payload.code_mode not in ("snapshot", "zip"):
+        return f"Unknown code_mode '{payload.code_mode}'. Use snapshot or zip"
+    if payload.backup_type not in ("full", "incremental"):
+        return f"Unknown backup_type '{payload.backup_type}'. Use full or incremental"
+    return None
+
+@app.post("/api/backup/create")
+def create_backup(payload: BackupRequest):
+    """Validate the request and queue the backup. Returns the job id at once."""
+    error = validate_backup_options(payload)
+    if error:
+        return {"success": False, "message": error}
+
+    parent = None
+    if payload.backup_type == "incremental":
+        if not payload.include_db:
+            return {"success": False, "message": "Incremental backups require include_db"}
+        parent = read_backup_meta(payload.parent_id) if payload.parent_id else latest_db_backup()
+        if not parent or not (parent.get('snapshot') or {}).get('taken_at'):
+            return {"success": False, "message": "No parent DB backup found for an incremental backup"}
+        if parent.get('partial'):
+            # Same rule as latest_db_backup: the chain would miss every table outside the subset
+            return {"success": False, "message": f"Backup {payload.parent_id} only holds some tables "
+                                                 f"and cannot be an incremental parent"}
+
+    try:
+        job = job_manager.submit("backup", lambda job: run_backup(payload, parent, job),
+                                 params=payload.dict())
+    except JobRejected as e:
+        return JSONResponse(status_code=429, content={"success": False, "message": str(e)})
+    return {"success": True, "message": "Backup queued", "job_id": job.id}
 
-        return {"success": True, "message": "Backup created successfully", "backup_id": timestamp, "path": backup_dir}
+def scheduled_backup_request(options, tables=None, note=""):
+    """BackupRequest for a scheduled DB-only backup with the schedule's "backup" options."""
+    return BackupRequest(**{**options, "include_code": False, "include_db": True,
+                            "backup_type": "full", "tables": tables, "note": note})
 
+def validate_schedule_options(options):
+    """Checked by the scheduler whenever it loads the schedule file."""
+    try:
+        payload = scheduled_backup_request(options)
+    except (TypeError, ValueError) as e:
+        return str(e)
+    return validate_backup_options(payload)
+
+def submit_scheduled_backup(tables, options, note):
+    """Queue a DB-only backup of the given tables for the scheduler."""
+    payload = scheduled_backup_request(options, tables, note)
+    return job_manager.submit("backup", lambda job: run_backup(payload, None, job),
+                              params={**payload.dict(), "scheduled": True})
+
+scheduler = BackupScheduler(
+    submit_scheduled_backup,
+    lambda: any(j.kind == "backup" for j in job_manager.active_jobs()),
+    validate_options=validate_schedule_options,
+)
+
+@app.get("/api/backup/schedule")
+def schedule_status():
+    return scheduler.status()
+
+@app.post("/api/backup/schedule/run")
+def schedule_run_now():
+    """Run one scheduling pass now instead of waiting for the next tick."""
+    try:
+        job = scheduler.tick()
     except Exception as e:
-        logger.error(f"Backup failed: {str(e)}")
+        logger.error(f"Scheduler pass failed: {e}")
         return {"success": False, "message": str(e)}
+    if not job:
+        return {"success": True, "message": "Nothing due", "job_id": None}
+    return {"success": True, "message": "Scheduled backup queued", "job_id": job.id}
+
+@app.get("/api/backup/{backup_id}/files")
+def list_files(backup_id: str):
+    backup_dir = resolve_backup_path(backup_id)
+    if not backup_dir or not os.path.isdir(backup_dir):
+        return JSONResponse(status_code=404, content={"success": False, "message": "Backup not found"})
+    return {"backup_id": backup_id, "files": list_backup_files(backup_dir)}
+
+@app.api_route("/api/backup/{backup_id}/files/{file_path:path}", methods=["GET", "HEAD"])
+def download_file(backup_id: str, file_path: str, request: Request):
+    """Download one artifact (zip, dump, manifest). Supports Range for resumable transfers."""
+    path = resolve_backup_path(backup_id, file_path)
+    if not path or not os.path.isfile(path):
+        return JSONResponse(status_code=404, content={"success": False, "message": "File not found"})
+    return RangeFileResponse(path, request.headers.get("range"), filename=os.path.basename(path))
+
+@app.get("/api/backup/{backup_id}/archive.tar")
+def download_archive(backup_id: str, include_source: bool = True):
+    """Stream the whole backup folder as a tar built on the fly (no temporary archive)."""
+    backup_dir = resolve_backup_path(backup_id)
+    if not backup_dir or not os.path.isdir(backup_dir):
+        return JSONResponse(status_code=404, content={"success": False, "message": "Backup not found"})
+    members = tar_members(backup_dir, backup_id, include_source)
+    return StreamingResponse(iter_tar_stream(members), media_type="application/x-tar", headers={
+        "content-disposition": f'attachment; filename="{backup_id}.tar"',
+        "content-length": str(tar_stream_length(members)),
+    })
+
+@app.post("/api/backup/{backup_id}/replicate")
+def replicate(backup_id: str):
+    """Queue (re-)replication of a backup to S3; interrupted uploads resume."""
+    if not replication_enabled():
+        return JSONResponse(status_code=400, content={"success": False, "message": "S3 replication is not configured"})
+    if not read_backup_meta(backup_id):
+        return JSONResponse(status_code=404, content={"success": False, "message": "Backup not found"})
+
+    def run_replication(job):
+        return replicate_backup(
+            backup_id,
+            on_file_done=lambda i, total: job.emit("replication_progress", files=i, total=total),
+            cancel_event=job.cancel_event,
+        )
+
+    try:
+        job = job_manager.submit("replicate", run_replication, params={"backup_id": backup_id})
+    except JobRejected as e:
+        return JSONResponse(status_code=429, content={"success": False, "message": str(e)})
+    return {"success": True, "message": "Replication queued", "job_id": job.id}
+
+@app.post("/api/backup/{backup_id}/verify")
+def verify(backup_id: str, check_rows: bool = True, deep: bool = False):
+    """Queue a parallel integrity check of a backup against its checksums.json."""
+    if not read_backup_meta(backup_id):
+        return JSONResponse(status_code=404, content={"success": False, "message": "Backup not found"})
+
+    def run_verify(job):
+        report = verify_backup(os.path.join(BACKUP_ROOT, backup_id), check_rows=check_rows, deep=deep)
+        job.emit("verified", ok=report["ok"], problems=len(report.get("problems", [])))
+        return report
+
+    try:
+        job = job_manager.submit("verify", run_verify, params={"backup_id": backup_id, "deep": deep})
+    except JobRejected as e:
+        return JSONResponse(status_code=429, content={"success": False, "message": str(e)})
+    return {"success": True, "message": "Verification queued", "job_id": job.id}
+
+def retention_guards(current=None):
+    """Keep what other live jobs use: their backups, and all garbage while a backup is written."""
+    live = [j for j in job_manager.active_jobs() if j is not current]
+    return {
+        "protected": {j.params.get("backup_id") for j in live if j.params.get("backup_id")},
+        "collect_garbage": not any(j.kind == "backup" for j in live),
+    }
+
+@app.post("/api/backup/retention")
+def retention(dry_run: bool = True, hourly: Optional[int] = None, daily: Optional[int] = None,
+              weekly: Optional[int] = None, monthly: Optional[int] = None):
+    """GFS pruning and store GC. Dry runs answer at once; real runs are queued as a job."""
+    policy = {tier: n for tier, n in
+              (("hourly", hourly), ("daily", daily), ("weekly", weekly), ("monthly", monthly))
+              if n is not None}
+    if dry_run:
+        return apply_retention(policy, dry_run=True, **retention_guards())
+
+    def run_retention(job):
+        return apply_retention(policy, dry_run=False, **retention_guards(job))
+
+    try:
+        job = job_manager.submit("retention", run_retention, params={"policy": policy})
+    except JobRejected as e:
+        return JSONResponse(status_code=429, content={"success": False, "message": str(e)})
+    return {"success": True, "message": "Retention queued", "job_id": job.id}
+
+class RestoreRequest(BaseModel):
+    target_url: str  # destination database, e.g. a scratch DB; never defaulted
+    tables: Optional[List[str]] = None  # schema.table
+    schemas: Optional[List[str]] = None
+    workers: int = RESTORE_WORKERS
+    batch_rows: int = RESTORE_BATCH_ROWS
+    truncate: bool = False
+    cascade: bool = False  # with truncate, also empty tables outside the set that reference it
+    replay_wal: bool = False  # apply the continuous WAL segments after loading
+    until: Optional[str] = None  # point-in-time limit for replay_wal (ISO 8601)
+
+@app.post("/api/backup/{backup_id}/restore")
+def restore_backup(backup_id: str, payload: RestoreRequest):
+    """Queue a COPY-based restore of a backup's database dump (incremental chain included)."""
+    meta = read_backup_meta(backup_id)
+    if not meta or not meta.get('tables'):
+        return JSONResponse(status_code=404, content={"success": False, "message": "Backup has no database dump"})
+
+    def run_restore(job):
+        job.emit("restore_started", backup_id=backup_id)
+        results = restore_database(
+            os.path.join(BACKUP_ROOT, backup_id), payload.target_url, payload.tables, payload.schemas,
+            payload.workers, payload.batch_rows, payload.truncate,
+            on_table_done=lambda key, result: job.emit("table_restored", table=key, **result),
+            cancel_event=job.cancel_event, cascade=payload.cascade,
+        )
+        job.check_cancelled()
+        result = {"backup_id": backup_id, "tables": results}
+        if payload.replay_wal:
+            job.emit("wal_replay_started", until=payload.until)
+            result["wal"] = apply_wal(os.path.join(BACKUP_ROOT, backup_id), payload.target_url, payload.until)
+        return result
+
+    params = payload.dict()
+    params.pop("target_url")  # may hold credentials
+    params["backup_id"] = backup_id
+    try:
+        job = job_manager.submit("restore", run_restore, params=params)
+    except JobRejected as e:
+        return JSONResponse(status_code=429, content={"success": False, "message": str(e)})
+    return {"success": True, "message": "Restore queued", "job_id": job.id}
+
+wal_streamer = WalStreamer()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(render_metrics(job_manager, wal_streamer),
+                             media_type="text/plain; version=0.0.4")
+
+@app.get("/api/backup/metrics/history")
+def metrics_history(table: Optional[str] = None, limit: int = 100):
+    """Stored timings per backup (or per table with ?table=schema.name), oldest first."""
+    return {"table": table, "history": timing_history(table, max(1, min(limit, 1000)))}
+
+@app.get("/api/backup/stream")
+def stream_status():
+    """Continuous WAL backup state and how far it lags behind the database."""
+    return wal_streamer.status()
+
+@app.post("/api/backup/stream/start")
+def stream_start():
+    if not latest_db_backup():
+        return {"success": False, "message": "Take a full DB backup first; WAL segments are stored next to it"}
+    wal_streamer.start()
+    return {"success": True, "message": "WAL stream started"}
+
+@app.post("/api/backup/stream/stop")
+def stream_stop():
+    wal_streamer.stop()
+    return {"success": True, "message": "WAL stream stopped"}
+
+@app.get("/api/backup/jobs")
+def list_jobs():
+    return {"jobs": job_manager.list()}
+
+@app.get("/api/backup/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "message": "Job not found"})
+    return job.to_dict()
+
+@app.post("/api/backup/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "message": "Job not found"})
+    return {"success": True, "status": job.status}
+
+@app.get("/api/backup/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """Server-Sent Events stream of a job's progress, ending when the job finishes."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "message": "Job not found"})
+    last_id = request.headers.get("last-event-id")
+    start = int(last_id) + 1 if last_id and last_id.isdigit() else 0
+
+    async def event_stream():
+        seq = start
+        while True:
+            finished = job.finished
+            for event in job.events_since(seq):
+                yield f"id: {event['seq']}\ndata: {json.dumps(event, default=str)}\n\n"
+                seq = event['seq'] + 1
+            if finished or await request.is_disconnected():
+                break
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,164 @@
+"""Backup timings history and the Prometheus /metrics exposition.
+
+Each finished backup stores one backup_timings row and one table_timings
+row per dumped table in the catalog database, so slow tables and
+throughput regressions can be compared across runs (history endpoint).
+/metrics renders the latest run of every table plus live job state in the
+Prometheus text format; no client library is needed for a handful of
+gauges and counters.
+"""
+import time
+import datetime
+import logging
+
+from catalog import get_catalog
+
+logger = logging.getLogger(__name__)
+
+def record_timings(meta):
+    """Store the timings of a finished backup (meta.json dict) in the catalog."""
+    timings = meta.get('timings') or {}
+    tables = meta.get('tables') or {}
+    recorded_at = datetime.datetime.now().isoformat()
+    conn = get_catalog()
+    try:
+        conn.execute("""
+            INSERT OR REPLACE INTO backup_timings
+                (backup_id, recorded_at, total_seconds, db_seconds, db_rows, db_bytes,
+                 code_mode, code_seconds, code_files, code_bytes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            meta['id'], recorded_at, timings.get('total_seconds'), timings.get('db_seconds'),
+            sum(s.get('rows', 0) for s in tables.values()),
+            sum(s.get('bytes_raw', 0) for s in tables.values()),
+            meta.get('code_mode'), timings.get('code_seconds'), timings.get('code_files'),
+            timings.get('code_bytes'),
+        ))
+        conn.executemany("""
+            INSERT OR REPLACE INTO table_timings
+                (backup_id, table_key, recorded_at, db_format, rows, bytes_raw,
+                 seconds, db_seconds, serialize_seconds, write_seconds)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (meta['id'], key, recorded_at, meta.get('db_format'), s.get('rows'), s.get('bytes_raw'),
+             s.get('seconds'), s.get('db_seconds'), s.get('serialize_seconds'), s.get('write_seconds'))
+            for key, s in tables.items()
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+
+def timing_history(table_key=None, limit=100):
+    """Timings of the last `limit` backups, oldest first (one table or whole backups)."""
+    conn = get_catalog()
+    try:
+        if table_key:
+            rows = conn.execute("""
+                SELECT * FROM table_timings WHERE table_key = ?
+                ORDER BY recorded_at DESC LIMIT ?
+            """, (table_key, limit)).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT * FROM backup_timings ORDER BY recorded_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        history = [dict(r) for r in reversed(rows)]
+    finally:
+        conn.close()
+    for entry in history:
+        seconds = entry.get('seconds') if table_key else entry.get('db_seconds')
+        rows_done = entry.get('rows') if table_key else entry.get('db_rows')
+        bytes_done = entry.get('bytes_raw') if table_key else entry.get('db_bytes')
+        entry['rows_per_second'] = _rate(rows_done, seconds)
+        entry['bytes_per_second'] = _rate(bytes_done, seconds)
+    return history
+
+def _rate(amount, seconds):
+    return round(amount / seconds, 2) if amount and seconds else 0.0
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class _Exposition:
+    """Collects samples grouped by metric, each with its HELP/TYPE header."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def add(self, name, kind, help_text, value, **labels):
+        entry = self._metrics.setdefault(name, (kind, help_text, []))
+        label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        entry[2].append((f"{name}{{{label_text}}}" if label_text else name, value))
+
+    def render(self):
+        lines = []
+        for name, (kind, help_text, samples) in self._metrics.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{sample} {float(value or 0)!r}" for sample, value in samples)
+        return "\n".join(lines) + "\n"
+
+def render_metrics(job_manager, wal_streamer=None):
+    """Prometheus text exposition of job state, store size and per-table timings."""
+    out = _Exposition()
+    out.add("backup_jobs_queued", "gauge", "Jobs waiting for a worker", job_manager.queue_depth())
+    out.add("backup_jobs_active", "gauge", "Jobs queued or running", job_manager.active_count())
+    for (kind, status), count in sorted(job_manager.finished_counts.items()):
+        out.add("backup_jobs_finished_total", "counter", "Finished jobs since start",
+                count, kind=kind, status=status)
+
+    conn = get_catalog()
+    try:
+        count, size, newest = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0), MAX(timestamp) FROM backups").fetchone()
+        last = conn.execute("SELECT * FROM backup_timings ORDER BY recorded_at DESC LIMIT 1").fetchone()
+        tables = conn.execute("""
+            SELECT t.* FROM table_timings t
+            JOIN (SELECT table_key, MAX(recorded_at) AS recorded_at FROM table_timings GROUP BY table_key) latest
+              ON latest.table_key = t.table_key AND latest.recorded_at = t.recorded_at
+            ORDER BY t.table_key
+        """).fetchall()
+    finally:
+        conn.close()
+
+    out.add("backup_store_backups", "gauge", "Backups in the catalog", count)
+    out.add("backup_store_bytes", "gauge", "Bytes used by catalogued backups", size)
+    if newest:
+        out.add("backup_last_timestamp_seconds", "gauge", "Start time of the newest backup",
+                datetime.datetime.fromisoformat(newest).timestamp())
+    if last:
+        for phase in ("total", "db", "code"):
+            out.add("backup_last_duration_seconds", "gauge", "Duration of the last backup by phase",
+                    last[f"{phase}_seconds"], phase=phase)
+        out.add("backup_last_db_rows_per_second", "gauge", "DB dump throughput of the last backup",
+                _rate(last['db_rows'], last['db_seconds']))
+        if last['code_seconds']:
+            out.add("backup_last_code_bytes_per_second", "gauge", "Source archive throughput of the last backup",
+                    _rate(last['code_bytes'], last['code_seconds']), mode=last['code_mode'] or "")
+            out.add("backup_last_code_files_per_second", "gauge", "Source files archived per second",
+                    _rate(last['code_files'], last['code_seconds']), mode=last['code_mode'] or "")
+
+    for row in tables:
+        key = row['table_key']
+        out.add("backup_table_rows", "gauge", "Rows in the table's latest dump", row['rows'], table=key)
+        out.add("backup_table_bytes", "gauge", "Uncompressed bytes of the table's latest dump",
+                row['bytes_raw'], table=key)
+        for phase in ("db", "serialize", "write"):
+            out.add("backup_table_phase_seconds", "gauge",
+                    "Time of the table's latest dump waiting on the DB, serializing and writing",
+                    row[f"{phase}_seconds"], table=key, phase=phase)
+        out.add("backup_table_rows_per_second", "gauge", "Rows per second of the table's latest dump",
+                _rate(row['rows'], row['seconds']), table=key)
+        out.add("backup_table_bytes_per_second", "gauge", "Bytes per second of the table's latest dump",
+                _rate(row['bytes_raw'], row['seconds']), table=key)
+
+    if wal_streamer is not None:
+        out.add("backup_wal_stream_running", "gauge", "1 while the WAL stream is consuming its slot",
+                1 if wal_streamer.running else 0)
+        out.add("backup_wal_pending_changes", "gauge", "Changes received but not yet in a segment",
+                wal_streamer.pending_changes)
+        out.add("backup_wal_segments_written_total", "counter", "WAL segments written since start",
+                wal_streamer.segments_written)
+        if wal_streamer.last_flush_at:
+            out.add("backup_wal_seconds_since_flush", "gauge", "Seconds since the last WAL segment",
+                    time.time() - wal_streamer.last_flush_at)
+    return out.render()
@@ -0,0 +1,281 @@
+"""Replication of finished backups to S3-compatible object storage.
+
+Files are uploaded with parallel multipart uploads. Each part carries a
+SHA-256 checksum that the server verifies. Multipart state (upload id and
+finished parts) is saved in the backup folder, so an interrupted run
+resumes where it stopped instead of starting over. A shared token bucket
+caps the total upload bandwidth. Snapshot backups also push the blobs their
+manifest references; blobs already in the bucket are skipped.
+
+Works against AWS S3 or a local MinIO (set BACKUP_S3_ENDPOINT_URL).
+"""
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.exceptions import ClientError
+
+from config import (
+    BACKUP_ROOT, S3_ENDPOINT_URL, S3_BUCKET, S3_PREFIX, S3_REGION,
+    S3_ACCESS_KEY, S3_SECRET_KEY, S3_PART_SIZE_MB, S3_UPLOAD_WORKERS, S3_BANDWIDTH_LIMIT_MBPS,
+)
+from content_store import MANIFEST_NAME, STORE_DIR, blob_path
+from catalog import set_replication_status
+from jobs import BackupCancelled
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = ".replication.json"
+
+class TokenBucket:
+    """Thread-safe bandwidth limiter shared by all upload workers."""
+
+    def __init__(self, rate_bytes_per_sec):
+        self.rate = rate_bytes_per_sec
+        self.tokens = rate_bytes_per_sec
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+def replication_enabled():
+    return bool(S3_BUCKET)
+
+def get_s3_client():
+    return boto3.client(
+        "s3",
+        endpoint_url=S3_ENDPOINT_URL,
+        region_name=S3_REGION,
+        aws_access_key_id=S3_ACCESS_KEY,
+        aws_secret_access_key=S3_SECRET_KEY,
+    )
+
+def _sha256_b64(data):
+    return base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+def _object_size(client, key):
+    try:
+        return client.head_object(Bucket=S3_BUCKET, Key=key)["ContentLength"]
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+
+class _UploadState:
+    """Multipart progress persisted in the backup folder for resume."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, 'r') as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+
+    def get(self, key):
+        with self.lock:
+            return self.data.get(key)
+
+    def start(self, key, upload_id, size):
+        with self.lock:
+            self.data[key] = {"upload_id": upload_id, "size": size, "parts": {}}
+            self.save()
+
+    def part_done(self, key, number, etag, checksum):
+        with self.lock:
+            self.data[key]["parts"][str(number)] = {"ETag": etag, "ChecksumSHA256": checksum}
+            self.save()
+
+    def finish(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+            self.save()
+
+def _check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise BackupCancelled("Replication cancelled")
+
+def _list_uploaded_parts(client, key, upload_id):
+    """Part numbers the server holds for a multipart upload (list_parts pages at 1000)."""
+    uploaded, marker = set(), 0
+    while True:
+        listed = client.list_parts(Bucket=S3_BUCKET, Key=key, UploadId=upload_id, PartNumberMarker=marker)
+        uploaded.update(p["PartNumber"] for p in listed.get("Parts", []))
+        if not listed.get("IsTruncated"):
+            return uploaded
+        marker = listed["NextPartNumberMarker"]
+
+def _upload_part(client, path, key, upload_id, number, offset, length, limiter, state, cancel_event=None):
+    # Queued parts of a cancelled upload return without sending anything
+    _check_cancelled(cancel_event)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        body = f.read(length)
+    checksum = _sha256_b64(body)
+    limiter.consume(len(body))
+    response = client.upload_part(
+        Bucket=S3_BUCKET, Key=key, UploadId=upload_id, PartNumber=number,
+        Body=body, ChecksumAlgorithm="SHA256", ChecksumSHA256=checksum,
+    )
+    state.part_done(key, number, response["ETag"], checksum)
+
+def upload_file(client, path, key, limiter, state, executor, part_size=S3_PART_SIZE_MB * 1024 * 1024,
+                cancel_event=None):
+    """Upload one file, skipping it when an object of the same size already exists.
+
+    cancel_event is checked before each part, so a large upload stops within
+    a part of being cancelled; the parts already sent are kept for resume.
+    Returns the number of bytes sent.
+    """
+    size = os.path.getsize(path)
+    if _object_size(client, key) == size and not state.get(key):
+        return 0
+
+    if size <= part_size:
+        with open(path, 'rb') as f:
+            body = f.read()
+        limiter.consume(len(body))
+        client.put_object(Bucket=S3_BUCKET, Key=key, Body=body,
+                          ChecksumAlgorithm="SHA256", ChecksumSHA256=_sha256_b64(body))
+        return size
+
+    saved = state.get(key)
+    if saved and saved["size"] == size:
+        try:
+            # Trust the server's view of which parts arrived
+            uploaded = _list_uploaded_parts(client, key, saved["upload_id"])
+            saved["parts"] = {n: p for n, p in saved["parts"].items() if int(n) in uploaded}
+            upload_id = saved["upload_id"]
+            logger.info(f"Resuming upload of {key} ({len(saved['parts'])} parts done)")
+        except ClientError:
+            saved = None
+    else:
+        saved = None
+    if saved is None:
+        upload_id = client.create_multipart_upload(
+            Bucket=S3_BUCKET, Key=key, ChecksumAlgorithm="SHA256")["UploadId"]
+        state.start(key, upload_id, size)
+
+    done = set(state.get(key)["parts"])
+    parts = []
+    sent = 0
+    try:
+        for number, offset in enumerate(range(0, size, part_size), start=1):
+            if str(number) in done:
+                continue
+            _check_cancelled(cancel_event)
+            length = min(part_size, size - offset)
+            parts.append(executor.submit(_upload_part, client, path, key, upload_id, number,
+                                         offset, length, limiter, state, cancel_event))
+            sent += length
+        for future in parts:
+            future.result()
+    except Exception:
+        for future in parts:
+            future.cancel()
+        raise
+
+    completed = state.get(key)["parts"]
+    client.complete_multipart_upload(
+        Bucket=S3_BUCKET, Key=key, UploadId=upload_id,
+        MultipartUpload={"Parts": [
+            {"PartNumber": int(n), "ETag": p["ETag"], "ChecksumSHA256": p["ChecksumSHA256"]}
+            for n, p in sorted(completed.items(), key=lambda item: int(item[0]))
+        ]},
+    )
+    state.finish(key)
+    return sent
+
+def _backup_files(backup_dir, backup_id):
+    """(local path, object key) pairs for a backup, blobs of snapshot backups included."""
+    pairs = []
+    for root, _, names in os.walk(backup_dir):
+        for name in names:
+            if name.startswith(STATE_FILE):
+                continue
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, backup_dir).replace(os.sep, '/')
+            pairs.append((path, f"{S3_PREFIX}/{backup_id}/{rel}"))
+
+    manifest_path = os.path.join(backup_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            hashes = {e["hash"] for e in json.load(f)["files"]}
+        for digest in sorted(hashes):
+            path = blob_path(digest)
+            rel = os.path.relpath(path, STORE_DIR).replace(os.sep, '/')
+            pairs.append((path, f"{S3_PREFIX}/_store/{rel}"))
+    return pairs
+
+def replicate_backup(backup_id, workers=S3_UPLOAD_WORKERS, bandwidth_mbps=S3_BANDWIDTH_LIMIT_MBPS,
+                     on_file_done=None, cancel_event=None):
+    """Upload a finished backup to the configured bucket and record the result in the catalog."""
+    if not replication_enabled():
+        raise RuntimeError("S3 replication is not configured (BACKUP_S3_BUCKET)")
+    backup_dir = os.path.join(BACKUP_ROOT, backup_id)
+    set_replication_status(backup_id, "replicating")
+    try:
+        client = get_s3_client()
+        limiter = TokenBucket(bandwidth_mbps * 1024 * 1024)
+        state = _UploadState(os.path.join(backup_dir, STATE_FILE))
+        files = _backup_files(backup_dir, backup_id)
+        sent = 0
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            # Small files upload concurrently; large files spread their parts over the same pool
+            small, large = [], []
+            for path, key in files:
+                (small if os.path.getsize(path) <= S3_PART_SIZE_MB * 1024 * 1024 else large).append((path, key))
+            _check_cancelled(cancel_event)
+            futures = [executor.submit(upload_file, client, p, k, limiter, state, None) for p, k in small]
+            try:
+                for i, future in enumerate(futures, 1):
+                    _check_cancelled(cancel_event)
+                    sent += future.result()
+                    if on_file_done:
+                        on_file_done(i, len(files))
+            except Exception:
+                # Uploads already running finish; queued ones never start
+                for future in futures:
+                    future.cancel()
+                raise
+            for i, (path, key) in enumerate(large, len(small) + 1):
+                _check_cancelled(cancel_event)
+                sent += upload_file(client, path, key, limiter, state, executor, cancel_event=cancel_event)
+                if on_file_done:
+                    on_file_done(i, len(files))
+        if os.path.exists(state.path) and not state.data:
+            os.remove(state.path)
+        set_replication_status(backup_id, "replicated",
+                               replicated_at=datetime.datetime.now().isoformat())
+        return {"files": len(files), "bytes_sent": sent}
+    except BackupCancelled as e:
+        # The upload state file stays, so a later run resumes where this one stopped
+        set_replication_status(backup_id, "cancelled", error=str(e))
+        raise
+    except Exception as e:
+        set_replication_status(backup_id, "failed", error=str(e))
+        raise
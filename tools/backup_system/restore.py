@@ -0,0 +1,636 @@
+"""Restore tooling for sidecar backups.
+
+Usage:
+    python restore.py reassemble <backup_dir> [--table schema.table]
+    python restore.py source <backup_dir> <target_dir>
+    python restore.py db <backup_dir> --target-url <postgres url>
+        [--table schema.table ...] [--schema name ...] [--workers N]
+        [--batch-rows N] [--truncate [--cascade]]
+    python restore.py wal <backup_dir> --target-url <postgres url> [--until <timestamp>]
+"""
+import io
+import os
+import json
+import shutil
+import struct
+import argparse
+import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import psycopg2
+
+from config import BACKUP_ROOT, RESTORE_WORKERS, RESTORE_BATCH_ROWS
+from db_dump import table_file_name
+from content_store import restore_source
+from compression import CompressedWriter, open_compressed_reader, codec_from_name
+from wal_stream import WAL_DIR_NAME, list_segments, lsn_to_int
+
+logger = logging.getLogger(__name__)
+
+# PGCOPY binary header: 11-byte signature, int32 flags, int32 extension length
+PGCOPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+PGCOPY_TRAILER = b"\xff\xff"
+
+def load_meta(backup_dir):
+    with open(os.path.join(backup_dir, "meta.json"), 'r') as f:
+        return json.load(f)
+
+def _copy_except_tail(src, dst, tail):
+    """Stream src into dst, leaving out its last `tail` bytes."""
+    held = b''
+    while True:
+        buf = src.read(1024 * 1024)
+        if not buf:
+            break
+        held += buf
+        if len(held) > tail:
+            dst.write(held[:len(held) - tail])
+            held = held[len(held) - tail:]
+
+def _skip_binary_header(f, name):
+    header = f.read(len(PGCOPY_SIGNATURE) + 8)
+    if not header.startswith(PGCOPY_SIGNATURE):
+        raise ValueError(f"{name} is not a PGCOPY binary file")
+    ext_len = struct.unpack("!i", header[-4:])[0]
+    f.read(ext_len)
+
+def reassemble_chunks(db_dir, table_key, manifest, output_file=None):
+    """Join the part files of a chunked table into a single dump file.
+
+    jsonl parts are concatenated, csv parts drop the repeated header row
+    and binary parts drop the per-file PGCOPY header/trailer, so the result
+    is identical to an unchunked dump. Parts are streamed through the
+    decompressor and the output uses the same codec. Returns the output path.
+    """
+    schema, table = table_key.split(".", 1)
+    fmt = manifest["format"]
+    parts = [os.path.join(db_dir, p["file"]) for p in manifest["parts"]]
+    codec = codec_from_name(parts[0])
+    if output_file is None:
+        output_file = os.path.join(db_dir, table_file_name(schema, table, fmt, codec=codec))
+
+    with CompressedWriter(output_file, codec) as out:
+        for i, path in enumerate(parts):
+            first, last = i == 0, i == len(parts) - 1
+            with io.BufferedReader(open_compressed_reader(path)) as f:
+                if fmt == "jsonl":
+                    shutil.copyfileobj(f, out)
+                elif fmt == "csv":
+                    if not first:
+                        f.readline()  # header row
+                    shutil.copyfileobj(f, out)
+                else:
+                    if not first:
+                        _skip_binary_header(f, path)
+                    if last:
+                        shutil.copyfileobj(f, out)
+                    else:
+                        _copy_except_tail(f, out, len(PGCOPY_TRAILER))
+
+    schema_file = parts[0] + ".schema.json"
+    if os.path.exists(schema_file):
+        shutil.copyfile(schema_file, output_file + ".schema.json")
+    logger.info(f"Reassembled {table_key} from {len(parts)} chunks into {output_file}")
+    return output_file
+
+def reassemble_backup(backup_dir, table_key=None):
+    """Reassemble every chunked table of a backup (or just table_key)."""
+    meta = load_meta(backup_dir)
+    db_dir = os.path.join(backup_dir, "database")
+    outputs = []
+    for key, manifest in (meta.get("chunks") or {}).items():
+        if table_key and key != table_key:
+            continue
+        outputs.append(reassemble_chunks(db_dir, key, manifest))
+    return outputs
+
+# --- Database restore ---
+
+class JsonlCsvStream(io.RawIOBase):
+    """File-like view of JSON Lines rows as CSV, fed to COPY FROM STDIN.
+
+    Reads at most max_rows rows so callers can commit in batches; the
+    `exhausted` flag tells when the source file has no more rows.
+    """
+
+    def __init__(self, source, columns, max_rows=None):
+        self.source = source
+        self.columns = columns
+        self.max_rows = max_rows
+        self.rows = 0
+        self.exhausted = False
+        self._buf = b''
+
+    def readable(self):
+        return True
+
+    def _encode_row(self, row):
+        values = []
+        for name, udt in self.columns:
+            value = row.get(name)
+            if value is None:
+                values.append(None)
+            elif udt in ('json', 'jsonb'):
+                # Scalars too: a jsonb string "abc" must reach COPY as "abc", not abc
+                values.append(json.dumps(value))
+            elif udt.startswith('_') and isinstance(value, list):
+                values.append(_pg_array_literal(value, json_items=udt in ('_json', '_jsonb')))
+            elif isinstance(value, (dict, list)):
+                values.append(json.dumps(value))
+            elif isinstance(value, bool):
+                values.append('t' if value else 'f')
+            else:
+                values.append(str(value))
+        # Unquoted empty field is NULL; every value is quoted so '' stays ''
+        fields = ['' if v is None else '"' + v.replace('"', '""') + '"' for v in values]
+        return (','.join(fields) + '\n').encode('utf-8')
+
+    def read(self, size=-1):
+        while not self.exhausted and (size < 0 or len(self._buf) < size):
+            if self.max_rows is not None and self.rows >= self.max_rows:
+                break
+            line = self.source.readline()
+            if not line:
+                self.exhausted = True
+                break
+            if line.strip():
+                self._buf += self._encode_row(json.loads(line))
+                self.rows += 1
+        if size < 0:
+            data, self._buf = self._buf, b''
+        else:
+            data, self._buf = self._buf[:size], self._buf[size:]
+        return data
+
+def _pg_array_literal(values, json_items=False):
+    """Postgres array literal; json_items encodes every element as JSON (json[]/jsonb[])."""
+    items = []
+    for v in values:
+        if v is None:
+            items.append('NULL')
+        elif isinstance(v, list) and not json_items:
+            items.append(_pg_array_literal(v))
+        else:
+            s = json.dumps(v) if json_items or isinstance(v, dict) else str(v)
+            s = s.replace('\\', '\\\\').replace('"', '\\"')
+            items.append(f'"{s}"')
+    return '{' + ','.join(items) + '}'
+
+def get_target_columns(conn, schema, table):
+    """(name, udt_name) of the target table's columns, or [] if it does not exist."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT column_name, udt_name FROM information_schema.columns
+            WHERE table_schema = %s AND table_name = %s ORDER BY ordinal_position
+        """, (schema, table))
+        return cur.fetchall()
+
+def get_primary_key(conn, schema, table):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT a.attname
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = %s::regclass AND i.indisprimary
+        """, (f'"{schema}"."{table}"',))
+        return [r[0] for r in cur.fetchall()]
+
+def create_table_from_schema(conn, column_schema):
+    """Create a missing target table from a dump's .schema.json sidecar."""
+    schema, table = column_schema["schema"], column_schema["table"]
+    cols = []
+    for c in column_schema["columns"]:
+        udt = c["udt_name"]
+        base = udt[1:] if udt.startswith('_') else udt
+        # Sidecars written before udt_schema was recorded only have the bare name
+        udt_schema = c.get("udt_schema")
+        col_type = f'"{udt_schema}"."{base}"' if udt_schema and udt_schema != "pg_catalog" else f'"{base}"'
+        if udt.startswith('_'):
+            col_type += "[]"
+        cols.append(f'"{c["name"]}" {col_type}{"" if c["nullable"] else " NOT NULL"}')
+    if column_schema.get("primary_key"):
+        cols.append("PRIMARY KEY (" + ", ".join(f'"{k}"' for k in column_schema["primary_key"]) + ")")
+    with conn.cursor() as cur:
+        cur.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+        cur.execute(f'CREATE TABLE "{schema}"."{table}" ({", ".join(cols)})')
+    conn.commit()
+
+def get_fk_edges(conn):
+    """(child, parent) schema.table pairs for every foreign key in the database."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT cn.nspname || '.' || c.relname, pn.nspname || '.' || p.relname
+            FROM pg_constraint k
+            JOIN pg_class c ON c.oid = k.conrelid
+            JOIN pg_namespace cn ON cn.oid = c.relnamespace
+            JOIN pg_class p ON p.oid = k.confrelid
+            JOIN pg_namespace pn ON pn.oid = p.relnamespace
+            WHERE k.contype = 'f'
+        """)
+        edges = cur.fetchall()
+    conn.rollback()
+    return edges
+
+def get_fk_levels(conn, table_keys):
+    """Group tables into levels so every table comes after the tables it references.
+
+    Tables in the same level have no FK between them and can load in
+    parallel. Tables caught in FK cycles end up in the last level.
+    """
+    edges = get_fk_edges(conn)
+    wanted = set(table_keys)
+    depends = {key: set() for key in table_keys}
+    for child, parent in edges:
+        if child in wanted and parent in wanted and child != parent:
+            depends[child].add(parent)
+
+    levels, placed = [], set()
+    remaining = set(table_keys)
+    while remaining:
+        level = sorted(k for k in remaining if depends[k] <= placed)
+        if not level:
+            level = sorted(remaining)  # FK cycle
+        levels.append(level)
+        placed.update(level)
+        remaining.difference_update(level)
+    return levels
+
+def truncate_tables(conn, table_keys, cascade=False):
+    """Empty every table of the restore set with a single TRUNCATE.
+
+    Truncating them together lets tables referenced by other tables of the
+    set be emptied. Tables outside the set that reference it would be
+    emptied too by CASCADE, so that needs cascade=True; otherwise this
+    raises before touching anything.
+    """
+    if not table_keys:
+        return
+    wanted = set(table_keys)
+    outside = sorted({child for child, parent in get_fk_edges(conn)
+                      if parent in wanted and child not in wanted})
+    if outside and not cascade:
+        raise RuntimeError("Cannot truncate the restore set: referenced by tables outside it "
+                           f"({', '.join(outside)}); restore them too or pass cascade")
+    relations = []
+    for key in table_keys:
+        schema, table = key.split(".", 1)
+        relations.append(f'"{schema}"."{table}"')
+    with conn.cursor() as cur:
+        cur.execute(f"TRUNCATE {', '.join(relations)}" + (" CASCADE" if cascade else ""))
+    conn.commit()
+    if outside:
+        logger.warning(f"TRUNCATE CASCADE also emptied {', '.join(outside)}")
+
+def fk_tangled_tables(edges, table_keys):
+    """Tables of the set that FK ordering alone cannot load: self-referencing
+    tables, tables in FK cycles and the tables that depend on them."""
+    wanted = set(table_keys)
+    depends = {key: set() for key in table_keys}
+    tangled = set()
+    for child, parent in edges:
+        if child in wanted and parent in wanted:
+            if child == parent:
+                tangled.add(child)
+            else:
+                depends[child].add(parent)
+    placed = set()
+    while True:
+        ready = {k for k in wanted - placed if depends[k] <= placed}
+        if not ready:
+            break
+        placed |= ready
+    return sorted(tangled | (wanted - placed))
+
+def _set_replica_role(conn):
+    """Skip FK/trigger checks on conn (needs superuser or replication rights). False if not allowed."""
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET session_replication_role = replica")
+        conn.commit()
+        return True
+    except psycopg2.Error:
+        conn.rollback()
+        return False
+
+def _open_restore_connection(target_url):
+    conn = psycopg2.connect(target_url)
+    # restore_database checks up front that loading works without it
+    _set_replica_role(conn)
+    return conn
+
+def _copy_into(cur, relation, column_list, fmt, source):
+    if fmt == "jsonl":
+        options = "FORMAT csv"
+    elif fmt == "csv":
+        options = "FORMAT csv, HEADER true"
+    else:
+        options = "FORMAT binary"
+    cur.copy_expert(f'COPY {relation} ({column_list}) FROM STDIN WITH ({options})', source)
+
+def _load_file(conn, schema, table, path, fmt, columns, names, batch_rows, upsert_key):
+    """Load one dump file into schema.table, committing every batch_rows rows (jsonl)
+    or once per file (csv/binary). With upsert_key rows are merged through a temp
+    table instead of inserted, so incremental layers overwrite older versions.
+    `names` is the column order of the dump file. Returns the number of rows loaded.
+    """
+    relation = f'"{schema}"."{table}"'
+    column_list = ", ".join(f'"{n}"' for n in names)
+
+    def copy_batch(cur, source):
+        if upsert_key is None:
+            _copy_into(cur, relation, column_list, fmt, source)
+            return
+        cur.execute(f'CREATE TEMP TABLE _restore_batch (LIKE {relation} INCLUDING DEFAULTS) ON COMMIT DROP')
+        _copy_into(cur, "_restore_batch", column_list, fmt, source)
+        updates = ", ".join(f'"{n}" = EXCLUDED."{n}"' for n in names if n not in upsert_key)
+        conflict = ", ".join(f'"{k}"' for k in upsert_key)
+        action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+        cur.execute(f'INSERT INTO {relation} ({column_list}) SELECT {column_list} FROM _restore_batch '
+                    f'ON CONFLICT ({conflict}) {action}')
+
+    total = 0
+    reader = io.BufferedReader(open_compressed_reader(path))
+    with (io.TextIOWrapper(reader, encoding='utf-8') if fmt == "jsonl" else reader) as f:
+        if fmt != "jsonl":
+            with conn.cursor() as cur:
+                copy_batch(cur, f)
+                total = cur.rowcount
+            conn.commit()
+            return total
+        while True:
+            stream = JsonlCsvStream(f, columns, batch_rows)
+            with conn.cursor() as cur:
+                copy_batch(cur, stream)
+            conn.commit()
+            total += stream.rows
+            if stream.exhausted:
+                return total
+
+def _table_files(meta, key):
+    stats = (meta.get("tables") or {}).get(key)
+    if not stats:
+        return []
+    return stats["files"] if stats.get("chunked") else [stats["file"]]
+
+def restore_table(target_url, layers, key, batch_rows=RESTORE_BATCH_ROWS):
+    """Load one table from every backup layer (full base first, then incrementals)."""
+    schema, table = key.split(".", 1)
+    conn = _open_restore_connection(target_url)
+    try:
+        columns = get_target_columns(conn, schema, table)
+        if not columns:
+            base_dir, base_meta = layers[0]
+            files = _table_files(base_meta, key)
+            sidecar = os.path.join(base_dir, "database", files[0] + ".schema.json") if files else None
+            if not sidecar or not os.path.exists(sidecar):
+                # Dumps taken before JSONL wrote sidecars need the table to exist already
+                raise RuntimeError(f"Target table {key} does not exist and the dump has no schema sidecar; "
+                                   "create the table in the target first")
+            with open(sidecar, 'r', encoding='utf-8') as f:
+                create_table_from_schema(conn, json.load(f))
+            columns = get_target_columns(conn, schema, table)
+        primary_key = get_primary_key(conn, schema, table)
+        conn.rollback()
+
+        rows = 0
+        for i, (backup_dir, meta) in enumerate(layers):
+            fmt = meta.get("db_format") or "jsonl"
+            # The base is a plain bulk load; later layers merge on the primary key
+            upsert_key = primary_key if i > 0 and primary_key else None
+            if i > 0 and not primary_key:
+                logger.warning(f"{key} has no primary key, incremental rows are appended")
+            files = _table_files(meta, key)
+            names = [c[0] for c in columns]
+            sidecar = os.path.join(backup_dir, "database", files[0] + ".schema.json") if files else None
+            if fmt != "jsonl" and sidecar and os.path.exists(sidecar):
+                # COPY dumps keep the source's column order, which the target may not share
+                with open(sidecar, 'r', encoding='utf-8') as f:
+                    names = [c["name"] for c in json.load(f)["columns"]]
+            for file_name in files:
+                path = os.path.join(backup_dir, "database", file_name)
+                rows += _load_file(conn, schema, table, path, fmt, columns, names, batch_rows, upsert_key)
+        return {"rows": rows, "layers": len(layers)}
+    finally:
+        conn.close()
+
+def load_chain(backup_dir):
+    """[(dir, meta)] for the backup and its parents, full base first."""
+    meta = load_meta(backup_dir)
+    layers = [(os.path.join(BACKUP_ROOT, parent_id), load_meta(os.path.join(BACKUP_ROOT, parent_id)))
+              for parent_id in meta.get("chain") or []]
+    return layers + [(backup_dir, meta)]
+
+def restore_database(backup_dir, target_url, tables=None, schemas=None,
+                     workers=RESTORE_WORKERS, batch_rows=RESTORE_BATCH_ROWS, truncate=False,
+                     on_table_done=None, cancel_event=None, cascade=False):
+    """Bulk-load a backup (and its incremental chain) into target_url with COPY.
+
+    Tables are restored level by level in FK dependency order; the tables
+    of one level load in parallel on separate connections. Restrict to some
+    tables (schema.table) or schemas to restore part of a backup, e.g. into
+    a scratch database. With truncate the whole set is emptied in one
+    TRUNCATE first; cascade also allows emptying tables outside the set
+    that reference it. Returns per-table results.
+
+    FK and trigger checks are switched off with session_replication_role
+    when the target role may do so. Otherwise they stay on and only the
+    level order keeps them satisfied, which cannot work for self-referencing
+    tables or FK cycles: such a set is refused before anything is loaded.
+    """
+    layers = load_chain(backup_dir)
+    keys = []
+    for _, meta in layers:
+        for key in (meta.get("tables") or {}):
+            if key not in keys:
+                keys.append(key)
+    if tables:
+        keys = [k for k in keys if k in tables]
+    if schemas:
+        keys = [k for k in keys if k.split(".", 1)[0] in schemas]
+
+    conn = psycopg2.connect(target_url)
+    try:
+        levels = get_fk_levels(conn, keys)
+        if not _set_replica_role(conn):
+            tangled = fk_tangled_tables(get_fk_edges(conn), keys)
+            if tangled:
+                raise RuntimeError("Cannot set session_replication_role on the target, so FK checks stay on "
+                                   "and these self-referencing or cyclic tables cannot be loaded: "
+                                   f"{', '.join(tangled)}. Restore as a superuser or leave them out")
+            logger.warning("Cannot set session_replication_role, FK checks stay on; loading in FK order")
+        if truncate:
+            truncate_tables(conn, keys, cascade)
+    finally:
+        conn.close()
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for level in levels:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            futures = {executor.submit(restore_table, target_url, layers, key, batch_rows): key
+                       for key in level}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to restore {key}: {e}")
+                    results[key] = {"error": str(e)}
+                if on_table_done:
+                    on_table_done(key, results[key])
+    return results
+
+# --- Point-in-time recovery from WAL segments ---
+
+def _parse_timestamp(value):
+    """Aware datetime from ISO text or wal2json's '2026-01-01 10:00:00.123+00'."""
+    if len(value) >= 3 and value[-3] in "+-" and value[-2:].isdigit():
+        value += ":00"
+    ts = datetime.datetime.fromisoformat(value)
+    return ts if ts.tzinfo else ts.astimezone()
+
+def get_keyed_tables(conn):
+    """schema.table names of the tables with a primary key."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT n.nspname || '.' || c.relname
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE i.indisprimary
+        """)
+        return {r[0] for r in cur.fetchall()}
+
+def _apply_change(cur, change):
+    relation = f'"{change["schema"]}"."{change["table"]}"'
+    action = change["action"]
+    if action == "T":
+        cur.execute(f"TRUNCATE {relation}")
+        return
+    key = [c["name"] for c in change.get("pk") or []]
+    identity = change.get("identity") or []
+    if action == "D" and not identity:
+        raise ValueError(f"Cannot replay a delete on {relation}: the WAL has no old key values. "
+                         "Give the source table a primary key (REPLICA IDENTITY DEFAULT) or set REPLICA IDENTITY FULL")
+    if action == "D" or (action == "U" and identity and key and
+                         {c["name"]: c["value"] for c in identity if c["name"] in key} !=
+                         {c["name"]: c["value"] for c in change["columns"] if c["name"] in key}):
+        # Delete by the old key; an update that changed the key re-inserts below
+        cur.execute(f"DELETE FROM {relation} WHERE " +
+                    " AND ".join(f'"{c["name"]}" = %s' for c in identity),
+                    [c["value"] for c in identity])
+        if action == "D":
+            return
+    columns = change["columns"]
+    col_list = ", ".join(f'"{c["name"]}"' for c in columns)
+    sql = f"INSERT INTO {relation} ({col_list}) VALUES ({', '.join(['%s'] * len(columns))})"
+    if key:
+        updates = ", ".join(f'"{c["name"]}" = EXCLUDED."{c["name"]}"' for c in columns if c["name"] not in key)
+        conflict = ", ".join(f'"{k}"' for k in key)
+        sql += f" ON CONFLICT ({conflict}) " + (f"DO UPDATE SET {updates}" if updates else "DO NOTHING")
+    cur.execute(sql, [c["value"] for c in columns])
+
+def apply_wal(backup_dir, target_url, until=None):
+    """Replay the backup's WAL segments onto a database restored from it.
+
+    Transactions already inside the base snapshot are skipped by LSN;
+    replay stops before the first transaction committed after `until`.
+    Every change is an upsert or keyed delete, so replaying a segment twice
+    leaves the same result. That needs a primary key: changes to target
+    tables without one are skipped (listed under "skipped" with a warning)
+    instead of being inserted again on top of the base restore.
+    """
+    meta = load_meta(backup_dir)
+    since = (meta.get("snapshot") or {}).get("wal_lsn")
+    since = lsn_to_int(since) if since else 0
+    until_ts = _parse_timestamp(until) if until else None
+    wal_dir = os.path.join(backup_dir, WAL_DIR_NAME)
+
+    stats = {"segments": 0, "transactions": 0, "changes": 0, "last_commit_ts": None, "reached_until": False,
+             "skipped": {}}
+    conn = _open_restore_connection(target_url)
+    try:
+        keyed = get_keyed_tables(conn)
+        conn.commit()
+        for entry in list_segments(wal_dir):
+            if lsn_to_int(entry["end_lsn"]) < since:
+                continue
+            with io.BufferedReader(open_compressed_reader(os.path.join(wal_dir, entry["file"]))) as f:
+                for line in f:
+                    tx = json.loads(line)
+                    if lsn_to_int(tx["lsn"]) < since:
+                        continue
+                    if until_ts and _parse_timestamp(tx["commit_ts"]) > until_ts:
+                        stats["reached_until"] = True
+                        break
+                    with conn.cursor() as cur:
+                        for change in tx["changes"]:
+                            name = f'{change["schema"]}.{change["table"]}'
+                            if change["action"] != "T" and name not in keyed:
+                                if name not in stats["skipped"]:
+                                    logger.warning(f"{name} has no primary key on the target, skipping its WAL changes")
+                                stats["skipped"][name] = stats["skipped"].get(name, 0) + 1
+                                continue
+                            _apply_change(cur, change)
+                            stats["changes"] += 1
+                    stats["transactions"] += 1
+                    stats["last_commit_ts"] = tx["commit_ts"]
+            # One commit per segment; a failed segment can simply be replayed again
+            conn.commit()
+            stats["segments"] += 1
+            if stats["reached_until"]:
+                break
+        return stats
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="DentalFlow backup restore tooling")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("reassemble", help="Join chunked table dumps into single files")
+    p.add_argument("backup_dir")
+    p.add_argument("--table", help="schema.table to reassemble (default: all)")
+
+    p = sub.add_parser("source", help="Rebuild the source tree of a snapshot backup")
+    p.add_argument("backup_dir")
+    p.add_argument("target_dir")
+
+    p = sub.add_parser("db", help="Bulk-load a database backup into a Postgres database")
+    p.add_argument("backup_dir")
+    p.add_argument("--target-url", required=True, help="Destination database (e.g. a scratch DB)")
+    p.add_argument("--table", action="append", help="schema.table to restore (repeatable)")
+    p.add_argument("--schema", action="append", help="Schema to restore (repeatable)")
+    p.add_argument("--workers", type=int, default=RESTORE_WORKERS)
+    p.add_argument("--batch-rows", type=int, default=RESTORE_BATCH_ROWS)
+    p.add_argument("--truncate", action="store_true", help="Empty target tables before loading")
+    p.add_argument("--cascade", action="store_true",
+                   help="With --truncate, also empty tables outside the set that reference it")
+
+    p = sub.add_parser("wal", help="Replay continuous WAL segments after a db restore (point-in-time)")
+    p.add_argument("backup_dir")
+    p.add_argument("--target-url", required=True)
+    p.add_argument("--until", help="Stop at this commit time (ISO 8601, e.g. 2026-03-01T14:30:00+00:00)")
+
+    args = parser.parse_args()
+    if args.command == "reassemble":
+        for path in reassemble_backup(args.backup_dir, args.table):
+            print(path)
+    elif args.command == "source":
+        count = restore_source(args.backup_dir, args.target_dir)
+        print(f"Restored {count} files into {args.target_dir}")
+    elif args.command == "db":
+        results = restore_database(args.backup_dir, args.target_url, args.table, args.schema,
+                                   args.workers, args.batch_rows, args.truncate, cascade=args.cascade)
+        for key, result in results.items():
+            print(f"{key}: {result}")
+    elif args.command == "wal":
+        print(json.dumps(apply_wal(args.backup_dir, args.target_url, args.until), indent=2))
+
+if __name__ == "__main__":
+    main()
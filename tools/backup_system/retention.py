@@ -0,0 +1,274 @@
+"""Grandfather-father-son retention and garbage collection of the backup store.
+
+The keep/prune decision is made from the catalog alone: one query returns
+every backup's timestamp, size and incremental chain, so planning costs the
+same with ten or ten thousand retained backups. For each tier (hourly,
+daily, weekly, monthly) the newest backup of each of the last N periods is
+kept. Incrementals keep their whole chain, since they cannot be restored
+without it.
+
+Partial backups (a subset of tables, as queued by the scheduler) never take
+part in the tiers or count as "latest"; otherwise a few small per-table
+dumps would win every period and push the complete backups out. They have
+their own rule: the newest RETENTION_PARTIAL are kept, and so is every
+partial newer than the newest complete backup, since it holds changes no
+complete backup has yet.
+
+Garbage collection removes:
+  - blobs in the content store that no remaining backup references
+    (catalog blob_refs table, not a re-read of every manifest),
+  - backup folders without meta.json (crashed or abandoned runs),
+  - temp files left by interrupted blob writes.
+Anything younger than RETENTION_GRACE_HOURS is left alone, so a backup
+that is still being written is never touched.
+
+Usage:
+    python retention.py [--apply] [--hourly N] [--daily N] [--weekly N] [--monthly N] [--partial N]
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import datetime
+import logging
+
+from config import (
+    BACKUP_ROOT,
+    RETENTION_HOURLY,
+    RETENTION_DAILY,
+    RETENTION_WEEKLY,
+    RETENTION_MONTHLY,
+    RETENTION_PARTIAL,
+    RETENTION_GRACE_HOURS,
+)
+from catalog import get_catalog, sync_catalog, index_blob_refs, remove_backup
+from content_store import BLOBS_DIR
+
+logger = logging.getLogger(__name__)
+
+# Tier name -> period key of a backup timestamp
+TIERS = {
+    "hourly": lambda dt: dt.strftime("%Y-%m-%d %H"),
+    "daily": lambda dt: dt.strftime("%Y-%m-%d"),
+    "weekly": lambda dt: "%d-W%02d" % dt.isocalendar()[:2],
+    "monthly": lambda dt: dt.strftime("%Y-%m"),
+}
+
+def default_policy():
+    return {
+        "hourly": RETENTION_HOURLY,
+        "daily": RETENTION_DAILY,
+        "weekly": RETENTION_WEEKLY,
+        "monthly": RETENTION_MONTHLY,
+        "partial": RETENTION_PARTIAL,
+    }
+
+def _load_index(conn):
+    """[{id, timestamp, dt, size_bytes, chain, partial}] newest first, from the catalog."""
+    backups = []
+    for row in conn.execute("SELECT id, timestamp, size_bytes, meta_json FROM backups ORDER BY timestamp DESC"):
+        meta = json.loads(row['meta_json'])
+        try:
+            dt = datetime.datetime.fromisoformat(row['timestamp'])
+        except ValueError:
+            logger.warning(f"Backup {row['id']} has an unreadable timestamp, keeping it")
+            dt = None
+        backups.append({
+            "id": row['id'],
+            "timestamp": row['timestamp'],
+            "dt": dt,
+            "size_bytes": row['size_bytes'],
+            "chain": meta.get('chain') or [],
+            "partial": bool(meta.get('partial')),
+        })
+    return backups
+
+def plan_retention(backups, policy, protected=()):
+    """Map backup id -> list of reasons to keep it. Ids not in the map are pruned.
+
+    protected ids (e.g. in use by a job) are kept along with their chain.
+    """
+    keep = {}
+    if not backups:
+        return keep
+    known = {b['id'] for b in backups}
+    for backup_id in protected:
+        if backup_id in known:
+            keep.setdefault(backup_id, []).append("in use")
+    complete = [b for b in backups if not b['partial']]
+    partial = [b for b in backups if b['partial']]
+    if complete:
+        keep.setdefault(complete[0]['id'], []).append("latest")
+    for b in backups:
+        if b['dt'] is None:
+            keep.setdefault(b['id'], []).append("unparsed timestamp")
+
+    for tier, period_of in TIERS.items():
+        limit = policy.get(tier, 0)
+        seen = set()
+        for b in complete:
+            if b['dt'] is None:
+                continue
+            if len(seen) >= limit:
+                break
+            period = period_of(b['dt'])
+            if period not in seen:
+                # Newest first, so the first backup of a period is its newest
+                seen.add(period)
+                keep.setdefault(b['id'], []).append(f"{tier} {period}")
+
+    for b in partial[:policy.get("partial", 0)]:
+        keep.setdefault(b['id'], []).append("recent partial")
+    if complete:
+        # Timestamps are ISO strings, so they compare in time order
+        for b in partial:
+            if b['timestamp'] > complete[0]['timestamp']:
+                keep.setdefault(b['id'], []).append("partial newer than latest complete")
+
+    for b in backups:
+        if b['id'] in keep:
+            for ancestor in b['chain']:
+                if ancestor in known:
+                    keep.setdefault(ancestor, []).append(f"parent of {b['id']}")
+    return keep
+
+def _is_old(path, grace_seconds, now):
+    try:
+        return now - os.path.getmtime(path) > grace_seconds
+    except OSError:
+        return False
+
+def find_orphan_blobs(conn, pruned_ids, grace_seconds, now):
+    """Blob files no kept backup references. Returns (paths_and_sizes, temp_files) or None.
+
+    None means the reference index is incomplete (a manifest could not be
+    read), in which case deleting blobs would not be safe.
+    """
+    for row in conn.execute(
+            "SELECT id, meta_json FROM backups WHERE blobs_indexed = 0").fetchall():
+        index_blob_refs(conn, row['id'], os.path.join(BACKUP_ROOT, row['id']),
+                        json.loads(row['meta_json']))
+    conn.commit()
+    unindexed = conn.execute("SELECT COUNT(*) FROM backups WHERE blobs_indexed = 0").fetchone()[0]
+    if unindexed:
+        return None
+
+    # A temp table rather than one "?" per id, which can exceed SQLite's parameter limit
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS retention_pruned (id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM retention_pruned")
+    conn.executemany("INSERT INTO retention_pruned (id) VALUES (?)", [(i,) for i in pruned_ids])
+    referenced = {r[0] for r in conn.execute(
+        "SELECT DISTINCT digest FROM blob_refs WHERE backup_id NOT IN (SELECT id FROM retention_pruned)")}
+    orphans, temp_files = [], []
+    if not os.path.isdir(BLOBS_DIR):
+        return orphans, temp_files
+    for bucket in os.scandir(BLOBS_DIR):
+        if not bucket.is_dir():
+            continue
+        for entry in os.scandir(bucket.path):
+            if entry.name.endswith(".tmp"):
+                if _is_old(entry.path, grace_seconds, now):
+                    temp_files.append((entry.path, entry.stat().st_size))
+                continue
+            digest = entry.name.split('.', 1)[0]
+            if digest not in referenced and _is_old(entry.path, grace_seconds, now):
+                orphans.append((entry.path, entry.stat().st_size))
+    return orphans, temp_files
+
+def find_orphan_dirs(conn, grace_seconds, now):
+    """Backup folders the catalog does not know (no meta.json) and that are past the grace period."""
+    if not os.path.exists(BACKUP_ROOT):
+        return []
+    indexed = {r[0] for r in conn.execute("SELECT id FROM backups")}
+    return [e.path for e in os.scandir(BACKUP_ROOT)
+            if e.is_dir() and not e.name.startswith('_') and e.name not in indexed
+            and not os.path.exists(os.path.join(e.path, "meta.json"))
+            and _is_old(e.path, grace_seconds, now)]
+
+def apply_retention(policy=None, dry_run=True, protected=(), collect_garbage=True,
+                    grace_hours=RETENTION_GRACE_HOURS):
+    """Prune backups outside the policy and garbage-collect the store.
+
+    protected: backup ids that must survive this run (e.g. in use by a job).
+    collect_garbage: False while a backup is being written, since a running
+    snapshot may reuse a blob that is unreferenced right now and its folder
+    has no meta.json yet.
+    With dry_run nothing is deleted; the report shows what would be.
+    """
+    policy = {**default_policy(), **(policy or {})}
+    grace_seconds = grace_hours * 3600
+    now = time.time()
+
+    sync_catalog(force=True)
+    conn = get_catalog()
+    try:
+        backups = _load_index(conn)
+        keep = plan_retention(backups, policy, protected)
+        pruned = [b for b in backups if b['id'] not in keep]
+        pruned_ids = {b['id'] for b in pruned}
+
+        blobs = find_orphan_blobs(conn, pruned_ids, grace_seconds, now) if collect_garbage else None
+        orphan_dirs = find_orphan_dirs(conn, grace_seconds, now) if collect_garbage else []
+
+        report = {
+            "dry_run": dry_run,
+            "policy": policy,
+            "kept": [{"id": b['id'], "timestamp": b['timestamp'], "reasons": keep[b['id']]}
+                     for b in backups if b['id'] in keep],
+            "pruned": [{"id": b['id'], "timestamp": b['timestamp'], "size_bytes": b['size_bytes']}
+                       for b in pruned],
+            "orphan_dirs": [os.path.basename(p) for p in orphan_dirs],
+            "orphan_blobs": 0,
+            "blob_gc": "done",
+        }
+        bytes_reclaimed = sum(b['size_bytes'] for b in pruned)
+        if blobs is None:
+            report["blob_gc"] = "skipped: backup in progress" if not collect_garbage \
+                else "skipped: blob references incomplete"
+        else:
+            orphans, temp_files = blobs
+            report["orphan_blobs"] = len(orphans)
+            report["temp_files"] = len(temp_files)
+            bytes_reclaimed += sum(size for _, size in orphans + temp_files)
+        report["bytes_reclaimed"] = bytes_reclaimed
+
+        if dry_run:
+            return report
+
+        # Backups first: their catalog rows go with them, so a crash midway
+        # leaves blobs that the next run collects, never dangling references
+        for b in pruned:
+            logger.info(f"Retention: removing backup {b['id']}")
+            shutil.rmtree(os.path.join(BACKUP_ROOT, b['id']), ignore_errors=True)
+            remove_backup(b['id'], conn)
+        for path in orphan_dirs:
+            logger.info(f"Retention: removing abandoned folder {path}")
+            shutil.rmtree(path, ignore_errors=True)
+        if blobs is not None:
+            for path, _ in blobs[0] + blobs[1]:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove {path}: {e}")
+        logger.info(f"Retention: pruned {len(pruned)} backups, {report['orphan_blobs']} blobs, "
+                    f"{bytes_reclaimed / (1024*1024):.2f} MB reclaimed")
+        return report
+    finally:
+        conn.close()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Apply the backup retention policy")
+    parser.add_argument("--apply", action="store_true", help="Delete; without it only report")
+    for tier, limit in default_policy().items():
+        parser.add_argument(f"--{tier}", type=int, default=limit)
+    parser.add_argument("--grace-hours", type=float, default=RETENTION_GRACE_HOURS)
+    args = parser.parse_args()
+
+    policy = {tier: getattr(args, tier) for tier in default_policy()}
+    report = apply_retention(policy, dry_run=not args.apply, grace_hours=args.grace_hours)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Built-in backup scheduler with per-schema and per-table cadences.
+
+Rules come from SCHEDULE_FILE (see schedule.example.json) and are re-read
+when the file changes. Each rule matches "schema.table", "schema" or "*"
+(most specific wins) and gives an interval and a priority.
+
+Every tick the scheduler looks for tables whose interval has elapsed. A due
+table whose pg_stat_user_tables counters (n_tup_ins + n_tup_upd +
+n_tup_del) have not moved since its last backup is skipped and checked
+again one interval later. The remaining due tables of the highest priority
+are dumped in one partial backup job; lower priorities wait for the next
+tick. At most one scheduled job is in flight and nothing is submitted while
+any other backup is queued or running, so jobs never overlap.
+"""
+import os
+import json
+import time
+import logging
+import threading
+
+from config import BACKUP_ROOT, SCHEDULE_FILE, SCHEDULER_TICK_SECONDS
+from db_dump import get_db_connection, get_all_tables
+from jobs import JobRejected
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = os.path.join(BACKUP_ROOT, "_scheduler.json")
+
+# Used when SCHEDULE_FILE does not exist: everything once a day
+DEFAULT_SCHEDULE = {"rules": [{"match": "*", "interval_minutes": 1440, "priority": 0}], "backup": {}}
+
+def get_change_counters(conn):
+    """{"schema.table": inserts + updates + deletes since the last stats reset}."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT schemaname, relname, n_tup_ins + n_tup_upd + n_tup_del
+            FROM pg_stat_user_tables
+        """)
+        return {f"{schema}.{table}": changes for schema, table, changes in cur.fetchall()}
+
+def match_rule(rules, schema, table):
+    """The most specific rule for a table: exact name, then schema, then "*"."""
+    by_match = {r['match']: r for r in rules}
+    return by_match.get(f"{schema}.{table}") or by_match.get(schema) or by_match.get("*")
+
+class BackupScheduler:
+    """Background thread that submits partial backups as tables fall due.
+
+    submit_backup(tables, options, note) must queue a backup of the given
+    "schema.table" names and return its BackupJob; backup_running() tells
+    whether any backup job is queued or running. validate_options(options)
+    returns an error message for invalid "backup" options, or None; a
+    schedule file that fails it is rejected when loaded and the previous
+    schedule stays in effect.
+    """
+
+    def __init__(self, submit_backup, backup_running, schedule_file=SCHEDULE_FILE,
+                 tick_seconds=SCHEDULER_TICK_SECONDS, validate_options=None):
+        self.submit_backup = submit_backup
+        self.backup_running = backup_running
+        self.validate_options = validate_options
+        self.schedule_file = schedule_file
+        self.tick_seconds = tick_seconds
+        self._schedule = DEFAULT_SCHEDULE
+        self._schedule_mtime = None
+        self._schedule_error = None
+        self._state = self._load_state()
+        self._inflight = None  # {"job", "tables": {name: counters}}
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # --- lifecycle ---
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            self._load_schedule()  # report a bad schedule file at startup, not on the first tick
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="backup-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Backup scheduler started (tick {self.tick_seconds}s, rules from {self.schedule_file})")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _loop(self):
+        while not self._stop.wait(self.tick_seconds):
+            try:
+                self.tick()
+            except Exception as e:
+                # A broken tick (DB down, bad rule file) must not kill the thread
+                logger.error(f"Scheduler tick failed: {e}")
+
+    # --- state ---
+
+    def _load_state(self):
+        try:
+            with open(STATE_FILE, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"tables": {}}
+
+    def _save_state(self):
+        os.makedirs(BACKUP_ROOT, exist_ok=True)
+        tmp = STATE_FILE + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self._state, f, indent=2)
+        os.replace(tmp, STATE_FILE)
+
+    def _load_schedule(self):
+        try:
+            mtime = os.path.getmtime(self.schedule_file)
+        except OSError:
+            self._schedule, self._schedule_mtime, self._schedule_error = DEFAULT_SCHEDULE, None, None
+            return self._schedule
+        if mtime != self._schedule_mtime:
+            # Remember the mtime even when rejected, so a bad file is reported once
+            self._schedule_mtime = mtime
+            try:
+                with open(self.schedule_file, 'r') as f:
+                    schedule = json.load(f)
+            except ValueError as e:
+                self._reject_schedule(f"invalid JSON: {e}")
+                return self._schedule
+            schedule.setdefault("rules", [])
+            schedule.setdefault("backup", {})
+            error = self.validate_options(schedule["backup"]) if self.validate_options else None
+            if error:
+                self._reject_schedule(f"invalid backup options: {error}")
+                return self._schedule
+            self._schedule, self._schedule_error = schedule, None
+            logger.info(f"Loaded {len(schedule['rules'])} schedule rules")
+        return self._schedule
+
+    def _reject_schedule(self, error):
+        self._schedule_error = f"{self.schedule_file}: {error}"
+        logger.error(f"Schedule file rejected, keeping the previous schedule. {self._schedule_error}")
+
+    # --- scheduling ---
+
+    def _settle_inflight(self, now):
+        """Record the outcome of the scheduled job. False while it is still running."""
+        job = self._inflight["job"]
+        if not job.finished:
+            return False
+        if job.status == "succeeded":
+            # A table whose dump failed is left out of the result; it stays due
+            dumped = (job.result or {}).get("tables") or {}
+            missing = sorted(set(self._inflight["tables"]) - set(dumped))
+            if missing:
+                logger.warning(f"Scheduled backup {job.id} did not dump {', '.join(missing)}, retrying next tick")
+            for name, counters in self._inflight["tables"].items():
+                if name not in dumped:
+                    continue
+                entry = self._state["tables"].setdefault(name, {})
+                entry.update(last_backup=self._inflight["submitted_at"], last_checked=self._inflight["submitted_at"],
+                             counters=counters, backup_id=(job.result or {}).get("backup_id"))
+            self._save_state()
+        else:
+            # Retried on the next tick, the tables are still due
+            logger.warning(f"Scheduled backup {job.id} ended {job.status}: {job.error}")
+        self._inflight = None
+        return True
+
+    def tick(self, now=None):
+        """One scheduling pass. Returns the submitted job, if any."""
+        now = now or time.time()
+        with self._lock:
+            if self._inflight and not self._settle_inflight(now):
+                return None
+            if self.backup_running():
+                return None
+
+            schedule = self._load_schedule()
+            conn = get_db_connection()
+            try:
+                tables = get_all_tables(conn)
+                counters = get_change_counters(conn)
+            finally:
+                conn.close()
+
+            due, skipped = [], 0
+            for schema, table in tables:
+                rule = match_rule(schedule["rules"], schema, table)
+                if not rule or rule.get("interval_minutes", 0) <= 0:
+                    continue
+                name = f"{schema}.{table}"
+                entry = self._state["tables"].setdefault(name, {})
+                if now - entry.get("last_checked", 0) < rule["interval_minutes"] * 60:
+                    continue
+                current = counters.get(name)
+                if current is not None and entry.get("counters") == current:
+                    entry["last_checked"] = now
+                    skipped += 1
+                    continue
+                due.append((rule.get("priority", 0), name, current))
+
+            if skipped:
+                logger.info(f"Scheduler: {skipped} due tables unchanged since last backup, skipped")
+                self._save_state()
+            if not due:
+                return None
+
+            top = max(priority for priority, _, _ in due)
+            batch = {name: current for priority, name, current in due if priority == top}
+            try:
+                job = self.submit_backup(sorted(batch), schedule["backup"],
+                                         f"Programado: {len(batch)} tablas (prioridad {top})")
+            except JobRejected as e:
+                logger.warning(f"Scheduler could not queue backup: {e}")
+                return None
+            self._inflight = {"job": job, "tables": batch, "submitted_at": now}
+            logger.info(f"Scheduler queued job {job.id} for {len(batch)} tables (priority {top})")
+            return job
+
+    def status(self):
+        with self._lock:
+            schedule = self._load_schedule()
+            return {
+                "running": bool(self._thread and self._thread.is_alive()),
+                "tick_seconds": self.tick_seconds,
+                "rules": schedule["rules"],
+                "schedule_error": self._schedule_error,
+                "inflight_job": self._inflight["job"].id if self._inflight else None,
+                "tables": self._state["tables"],
+            }
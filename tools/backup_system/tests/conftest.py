@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The sidecar uses flat sibling imports (config, catalog, ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
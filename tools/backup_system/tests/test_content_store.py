@@ -0,0 +1,40 @@
+import hashlib
+
+import pytest
+
+import content_store
+from content_store import open_blob, put_blob
+
+@pytest.fixture(autouse=True)
+def blob_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(content_store, "BLOBS_DIR", str(tmp_path / "blobs"))
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+def read_blob(digest):
+    with open_blob(digest) as f:
+        return f.read()
+
+def test_put_blob_stores_under_digest_once(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_bytes(b"hello" * 1000)
+    digest = sha256(path.read_bytes())
+
+    stored, written = put_blob(str(path), digest)
+    assert stored == digest and written > 0
+    assert read_blob(digest) == b"hello" * 1000
+    assert put_blob(str(path), digest) == (digest, 0)
+
+def test_put_blob_uses_hash_of_content_read_when_file_changed(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_bytes(b"old content")
+    stale = sha256(b"old content")
+    # Changed after the snapshot hashed it
+    path.write_bytes(b"new content")
+
+    stored, written = put_blob(str(path), stale)
+    assert stored == sha256(b"new content") and written > 0
+    assert read_blob(stored) == b"new content"
+    assert not (tmp_path / "blobs" / stale[:2] / f"{stale}.zlib").exists()
+    assert not list((tmp_path / "blobs").glob("*/*.tmp"))
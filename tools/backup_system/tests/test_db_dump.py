@@ -0,0 +1,50 @@
+import json
+
+from db_dump import dump_table_to_json
+
+class FakeConnection:
+    """Named-cursor connection serving `rows`, recording each fetchmany size."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetches = []
+
+    def cursor(self, name=None, cursor_factory=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query):
+        self.position = 0
+
+    def fetchmany(self, size):
+        self.fetches.append(size)
+        batch = self.rows[self.position:self.position + size]
+        self.position += size
+        return batch
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+def test_batches_are_sized_before_fetching_to_stay_under_the_limit(tmp_path):
+    # ~60 KB per row once encoded (json.dumps escapes non-ASCII), although only ~10 K characters
+    rows = [{"id": i, "notes": "ñ" * 10000} for i in range(500)]
+    conn = FakeConnection(rows)
+    out = tmp_path / "t.jsonl"
+
+    stats = dump_table_to_json(conn, "public", "t", str(out), batch_size=5000, memory_limit_mb=1,
+                               write_schema=False)
+
+    assert stats["rows"] == 500
+    row_bytes = len((json.dumps(rows[0]) + '\n').encode('utf-8'))
+    assert conn.fetches[0] == 1
+    assert max(conn.fetches) > 1
+    assert all(size * row_bytes <= 1024 * 1024 for size in conn.fetches)
+    assert [json.loads(line)["id"] for line in out.read_text(encoding='utf-8').splitlines()] == list(range(500))
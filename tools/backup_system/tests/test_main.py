@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+import downloads
+import main
+from main import BackupRequest, create_backup, read_backup_meta
+
+@pytest.fixture
+def backup_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloads, "BACKUP_ROOT", str(tmp_path))
+    return tmp_path
+
+def write_meta(root, backup_id, **meta):
+    (root / backup_id).mkdir()
+    (root / backup_id / "meta.json").write_text(json.dumps(meta))
+
+def test_read_backup_meta_rejects_paths_outside_the_backup_root(backup_root):
+    write_meta(backup_root, "2026-03-01_020000", note="ok")
+    (backup_root / "meta.json").write_text("{}")
+
+    assert read_backup_meta("2026-03-01_020000") == {"note": "ok"}
+    assert read_backup_meta("..") is None
+    assert read_backup_meta("../etc") is None
+    assert read_backup_meta("_store") is None
+
+def test_partial_backup_cannot_be_an_incremental_parent(backup_root, monkeypatch):
+    write_meta(backup_root, "part", partial=True, snapshot={"taken_at": "2026-03-01T02:00:00"})
+    monkeypatch.setattr(main.job_manager, "submit", lambda *a, **k: pytest.fail("must not queue"))
+
+    result = create_backup(BackupRequest(backup_type="incremental", parent_id="part"))
+
+    assert result["success"] is False
+    assert "cannot be an incremental parent" in result["message"]
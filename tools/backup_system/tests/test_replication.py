@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from botocore.exceptions import ClientError
+
+from jobs import BackupCancelled
+from replication import TokenBucket, _UploadState, upload_file
+
+class FakeS3:
+    """Just enough of the S3 client for multipart uploads."""
+
+    def __init__(self, on_part=None, parts=()):
+        self.uploaded = []
+        self.listed = list(parts)
+        self.on_part = on_part
+
+    def head_object(self, **kwargs):
+        raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+    def create_multipart_upload(self, **kwargs):
+        return {"UploadId": "up1"}
+
+    def list_parts(self, PartNumberMarker=0, **kwargs):
+        page = [n for n in self.listed if n > PartNumberMarker][:1000]
+        truncated = bool(page) and page[-1] < self.listed[-1]
+        return {"Parts": [{"PartNumber": n} for n in page], "IsTruncated": truncated,
+                "NextPartNumberMarker": page[-1] if page else 0}
+
+    def upload_part(self, PartNumber, **kwargs):
+        self.uploaded.append(PartNumber)
+        if self.on_part:
+            self.on_part(PartNumber)
+        return {"ETag": f"etag{PartNumber}"}
+
+    def complete_multipart_upload(self, **kwargs):
+        self.completed = kwargs["MultipartUpload"]["Parts"]
+
+def test_cancel_stops_a_multipart_upload_between_parts(tmp_path):
+    path = tmp_path / "big.bin"
+    path.write_bytes(b"x" * 10)
+    cancel = threading.Event()
+    client = FakeS3(on_part=lambda number: cancel.set())
+    state = _UploadState(str(tmp_path / ".replication.json"))
+
+    with ThreadPoolExecutor(max_workers=1) as executor, pytest.raises(BackupCancelled):
+        upload_file(client, str(path), "k", TokenBucket(0), state, executor, part_size=1, cancel_event=cancel)
+
+    assert client.uploaded == [1]
+    assert list(state.get("k")["parts"]) == ["1"]
+
+def test_resume_lists_more_than_one_page_of_parts(tmp_path):
+    path = tmp_path / "big.bin"
+    path.write_bytes(b"x" * 1500)
+    state = _UploadState(str(tmp_path / ".replication.json"))
+    state.data["k"] = {"upload_id": "up1", "size": 1500,
+                       "parts": {str(n): {"ETag": f"etag{n}", "ChecksumSHA256": "c"} for n in range(1, 1201)}}
+    client = FakeS3(parts=range(1, 1201))
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        sent = upload_file(client, str(path), "k", TokenBucket(0), state, executor, part_size=1)
+
+    assert sent == 300
+    assert sorted(client.uploaded) == list(range(1201, 1501))
+    assert len(client.completed) == 1500
@@ -0,0 +1,78 @@
+import io
+import csv
+import json
+
+import pytest
+
+from restore import JsonlCsvStream, _apply_change, create_table_from_schema, fk_tangled_tables
+
+COLUMNS = [("id", "int4"), ("doc", "jsonb"), ("tags", "_jsonb"), ("ok", "bool")]
+
+def copy_rows(*rows):
+    source = io.StringIO(''.join(json.dumps(r) + '\n' for r in rows))
+    data = JsonlCsvStream(source, COLUMNS).read().decode('utf-8')
+    return list(csv.reader(io.StringIO(data)))
+
+def test_jsonb_scalars_are_encoded_as_json():
+    rows = copy_rows({"id": 1, "doc": "abc", "ok": True},
+                     {"id": 2, "doc": True},
+                     {"id": 3, "doc": 4.5},
+                     {"id": 4, "doc": {"a": [1, "b"]}})
+
+    assert [r[1] for r in rows] == ['"abc"', 'true', '4.5', '{"a": [1, "b"]}']
+    assert rows[0][3] == 't'
+
+def test_jsonb_array_items_are_encoded_as_json():
+    rows = copy_rows({"id": 1, "tags": [{"k": "v"}, "s", None]})
+
+    assert rows[0][2] == '{"{\\"k\\": \\"v\\"}","\\"s\\"",NULL}'
+
+def test_fk_tangled_tables():
+    edges = [("public.child", "public.parent"),
+             ("public.tree", "public.tree"),
+             ("public.a", "public.b"), ("public.b", "public.a"),
+             ("public.a_items", "public.a"),
+             ("public.outside", "public.parent")]
+    keys = ["public.parent", "public.child", "public.tree", "public.a", "public.b", "public.a_items"]
+
+    assert fk_tangled_tables(edges, keys) == ["public.a", "public.a_items", "public.b", "public.tree"]
+    assert fk_tangled_tables(edges, ["public.parent", "public.child"]) == []
+
+class RecordingConnection:
+    def __init__(self):
+        self.sql = []
+
+    def cursor(self):
+        conn = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql):
+                conn.sql.append(sql)
+        return Cursor()
+
+    def commit(self):
+        pass
+
+def test_create_table_qualifies_user_defined_types():
+    conn = RecordingConnection()
+    create_table_from_schema(conn, {"schema": "app", "table": "visits", "primary_key": ["id"], "columns": [
+        {"name": "id", "udt_schema": "pg_catalog", "udt_name": "int8", "nullable": False},
+        {"name": "status", "udt_schema": "app", "udt_name": "visit_status", "nullable": True},
+        {"name": "history", "udt_schema": "app", "udt_name": "_visit_status", "nullable": True},
+        {"name": "note", "udt_name": "text", "nullable": True},
+    ]})
+
+    assert conn.sql[-1] == ('CREATE TABLE "app"."visits" ("id" "int8" NOT NULL, "status" "app"."visit_status", '
+                            '"history" "app"."visit_status"[], "note" "text", PRIMARY KEY ("id"))')
+
+def test_wal_delete_without_identity_names_the_table():
+    change = {"action": "D", "schema": "public", "table": "logs", "identity": []}
+
+    with pytest.raises(ValueError, match='"public"."logs".*REPLICA IDENTITY'):
+        _apply_change(None, change)
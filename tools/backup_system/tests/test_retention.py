@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import datetime
+
+import retention
+from catalog import COLUMN_MIGRATIONS, SCHEMA
+from retention import find_orphan_blobs, plan_retention
+
+POLICY = {"hourly": 0, "daily": 2, "weekly": 0, "monthly": 0, "partial": 2}
+
+def backup(backup_id, timestamp, partial=False, chain=()):
+    return {"id": backup_id, "timestamp": timestamp, "dt": datetime.datetime.fromisoformat(timestamp),
+            "size_bytes": 1, "chain": list(chain), "partial": partial}
+
+def newest_first(backups):
+    return sorted(backups, key=lambda b: b['timestamp'], reverse=True)
+
+def test_partial_backups_do_not_displace_complete_ones():
+    backups = newest_first([
+        backup("full-day1", "2026-03-01T02:00:00"),
+        backup("full-day2", "2026-03-02T02:00:00"),
+        backup("full-day3", "2026-03-03T02:00:00"),
+        # Scheduler runs after the last complete backup, every few hours
+        *(backup(f"part-day{d}-{h}", f"2026-03-0{d}T{h:02d}:00:00", partial=True)
+          for d in (2, 3) for h in (8, 14, 20)),
+    ])
+    keep = plan_retention(backups, POLICY)
+
+    assert "latest" in keep["full-day3"]
+    assert "daily 2026-03-03" in keep["full-day3"]
+    assert "daily 2026-03-02" in keep["full-day2"]
+    assert "full-day1" not in keep
+    # Newer than the latest complete backup: kept regardless of the count
+    assert {"part-day3-8", "part-day3-14", "part-day3-20"} <= set(keep)
+    assert not any(k.startswith("part-day2") for k in keep)
+
+def test_partial_count_limit_applies_to_older_partials():
+    backups = newest_first([
+        backup("part-1", "2026-03-01T08:00:00", partial=True),
+        backup("part-2", "2026-03-01T09:00:00", partial=True),
+        backup("part-3", "2026-03-01T10:00:00", partial=True),
+        backup("full", "2026-03-01T12:00:00"),
+    ])
+    keep = plan_retention(backups, POLICY)
+
+    assert set(keep) == {"full", "part-3", "part-2"}
+    assert keep["part-3"] == ["recent partial"]
+
+def test_only_partials_keeps_recent_ones():
+    backups = newest_first([backup(f"part-{h}", f"2026-03-01T{h:02d}:00:00", partial=True) for h in range(5)])
+    keep = plan_retention(backups, POLICY)
+
+    assert set(keep) == {"part-4", "part-3"}
+
+def test_incremental_keeps_its_chain():
+    backups = newest_first([
+        backup("base", "2026-03-01T02:00:00"),
+        backup("inc", "2026-03-03T02:00:00", chain=["base"]),
+    ])
+    keep = plan_retention(backups, {**POLICY, "daily": 1})
+
+    assert "parent of inc" in keep["base"]
+
+def test_protected_incremental_keeps_its_chain():
+    backups = newest_first([
+        backup("base", "2026-03-01T02:00:00"),
+        backup("inc", "2026-03-02T02:00:00", chain=["base"]),
+        backup("full", "2026-03-04T02:00:00"),
+        backup("full-2", "2026-03-05T02:00:00"),
+    ])
+    keep = plan_retention(backups, POLICY, protected=["inc", "unknown"])
+
+    assert keep["inc"] == ["in use"]
+    assert "parent of inc" in keep["base"]
+    assert "unknown" not in keep
+
+def test_orphan_blobs_with_more_pruned_ids_than_sqlite_parameters(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "BLOBS_DIR", str(tmp_path))
+    for digest in ("aa11", "bb22"):
+        os.makedirs(tmp_path / digest[:2], exist_ok=True)
+        (tmp_path / digest[:2] / f"{digest}.zlib").write_bytes(b"x")
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    for column, col_type in COLUMN_MIGRATIONS:
+        conn.execute(f"ALTER TABLE backups ADD COLUMN {column} {col_type}")
+    pruned = {f"old-{i}" for i in range(40000)}
+    rows = [("kept", "aa11")] + [(i, "bb22") for i in pruned]
+    conn.executemany("INSERT INTO blob_refs (backup_id, digest) VALUES (?, ?)", rows)
+
+    orphans, temp_files = find_orphan_blobs(conn, pruned, grace_seconds=0,
+                                            now=datetime.datetime.now().timestamp() + 10)
+
+    assert [os.path.basename(p) for p, _ in orphans] == ["bb22.zlib"]
+    assert temp_files == []
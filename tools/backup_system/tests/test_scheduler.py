@@ -0,0 +1,28 @@
+from types import SimpleNamespace
+
+import pytest
+
+import scheduler
+from scheduler import BackupScheduler
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(scheduler, "BACKUP_ROOT", str(tmp_path))
+    monkeypatch.setattr(scheduler, "STATE_FILE", str(tmp_path / "_scheduler.json"))
+
+def finished_job(result, status="succeeded"):
+    return SimpleNamespace(id="job1", finished=True, status=status, result=result, error=None)
+
+def test_tables_missing_from_the_result_stay_due(tmp_path):
+    sched = BackupScheduler(None, lambda: False, schedule_file=str(tmp_path / "none.json"))
+    sched._inflight = {
+        "job": finished_job({"backup_id": "b1", "tables": {"public.ok": {"rows": 3}}}),
+        "tables": {"public.ok": 10, "public.failed": 20},
+        "submitted_at": 1000,
+    }
+
+    assert sched._settle_inflight(2000)
+    assert sched._state["tables"]["public.ok"]["backup_id"] == "b1"
+    assert sched._state["tables"]["public.ok"]["counters"] == 10
+    assert "public.failed" not in sched._state["tables"]
+    assert sched._inflight is None
@@ -0,0 +1,218 @@
+"""Checksum manifest and integrity verification for backups.
+
+When a backup is written, every file gets a SHA-256 and size entry in
+checksums.json, together with the row count of each dumped table.
+verify_backup re-hashes the files in parallel (hashlib releases the GIL,
+so threads use every core; large dumps are hashed from an mmap instead of
+read() copies) and re-counts dump rows. It reports missing, truncated and
+corrupt files and row count mismatches without restoring anything.
+
+Usage:
+    python verify.py <backup_dir> [--workers N] [--skip-rows] [--deep]
+"""
+import io
+import os
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from config import VERIFY_WORKERS
+from compression import open_compressed_reader, strip_codec_extension
+from content_store import MANIFEST_NAME, open_blob, blob_path
+
+logger = logging.getLogger(__name__)
+
+CHECKSUM_FILE = "checksums.json"
+MMAP_THRESHOLD = 16 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+# Files that change after the manifest is written
+UNTRACKED = {CHECKSUM_FILE, "meta.json", ".replication.json", ".replication.json.tmp"}
+
+def hash_file(path):
+    """SHA-256 hex digest; files above MMAP_THRESHOLD are hashed from an mmap."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # One update over the mapping: no copies, GIL released while hashing
+                view = memoryview(mm)
+                try:
+                    h.update(view)
+                finally:
+                    view.release()
+        else:
+            for buf in iter(lambda: f.read(READ_SIZE), b''):
+                h.update(buf)
+    return h.hexdigest()
+
+def _tracked_files(backup_dir):
+    for root, _, names in os.walk(backup_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, backup_dir).replace(os.sep, '/')
+            if rel not in UNTRACKED:
+                yield rel, path
+
+def write_checksum_manifest(backup_dir, table_stats, workers=VERIFY_WORKERS):
+    """Hash every file of a finished backup and save checksums.json.
+
+    table_stats is meta['tables']; its row counts are kept for verification.
+    Returns a short summary for meta.json.
+    """
+    files = list(_tracked_files(backup_dir))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        digests = list(executor.map(lambda item: hash_file(item[1]), files))
+    manifest = {
+        "algorithm": "sha256",
+        "files": {rel: {"sha256": digest, "size": os.path.getsize(path)}
+                  for (rel, path), digest in zip(files, digests)},
+        "tables": {
+            key: {"rows": stats.get("rows"),
+                  "files": ["database/" + f for f in (stats["files"] if stats.get("chunked") else [stats["file"]])]}
+            for key, stats in (table_stats or {}).items()
+        },
+    }
+    with open(os.path.join(backup_dir, CHECKSUM_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return {"file": CHECKSUM_FILE, "files": len(files)}
+
+# --- Row counting ---
+
+def _count_jsonl(f):
+    return sum(1 for line in f if line.strip())
+
+def _count_csv(f):
+    # Quoted fields may span lines; a record ends on a newline outside quotes
+    rows, in_quotes = 0, False
+    for line in f:
+        if line.count(b'"') % 2:
+            in_quotes = not in_quotes
+        if not in_quotes:
+            rows += 1
+    return max(0, rows - 1)  # header row
+
+def _count_binary(f):
+    header = f.read(19)
+    f.read(struct.unpack("!i", header[15:19])[0])
+    rows = 0
+    while True:
+        raw = f.read(2)
+        if len(raw) < 2:
+            raise ValueError("truncated PGCOPY stream")
+        fields = struct.unpack("!h", raw)[0]
+        if fields == -1:
+            return rows
+        for _ in range(fields):
+            length = struct.unpack("!i", f.read(4))[0]
+            if length > 0:
+                f.seek(length, io.SEEK_CUR) if f.seekable() else f.read(length)
+        rows += 1
+
+def count_rows(path):
+    """Number of rows in a dump file (any format/codec)."""
+    name = strip_codec_extension(path)
+    with io.BufferedReader(open_compressed_reader(path)) as f:
+        if name.endswith(".jsonl"):
+            return _count_jsonl(f)
+        if name.endswith(".csv"):
+            return _count_csv(f)
+        return _count_binary(f)
+
+# --- Verification ---
+
+def _check_file(backup_dir, rel, expected):
+    path = os.path.join(backup_dir, *rel.split('/'))
+    if not os.path.exists(path):
+        return rel, "missing", None
+    size = os.path.getsize(path)
+    if size < expected["size"]:
+        return rel, "truncated", f"{size} of {expected['size']} bytes"
+    if size != expected["size"]:
+        return rel, "corrupt", f"size {size}, expected {expected['size']}"
+    if hash_file(path) != expected["sha256"]:
+        return rel, "corrupt", "checksum mismatch"
+    return rel, "ok", None
+
+def _check_rows(backup_dir, key, expected):
+    if expected.get("rows") is None or expected["rows"] < 0:
+        return key, "ok", None
+    try:
+        rows = sum(count_rows(os.path.join(backup_dir, *f.split('/'))) for f in expected["files"])
+    except Exception as e:
+        return key, "unreadable", str(e)
+    if rows != expected["rows"]:
+        return key, "row_mismatch", f"{rows} rows, expected {expected['rows']}"
+    return key, "ok", None
+
+def _check_blob(digest):
+    if not os.path.exists(blob_path(digest)):
+        return digest, "missing", None
+    h = hashlib.sha256()
+    try:
+        with open_blob(digest) as f:
+            for buf in iter(lambda: f.read(READ_SIZE), b''):
+                h.update(buf)
+    except Exception as e:
+        return digest, "corrupt", str(e)
+    return digest, "ok" if h.hexdigest() == digest else "corrupt", None
+
+def verify_backup(backup_dir, workers=VERIFY_WORKERS, check_rows=True, deep=False):
+    """Verify a backup against its checksums.json.
+
+    With deep, the content-store blobs referenced by a source snapshot are
+    decompressed and re-hashed too. Returns a report dict; report['ok'] is
+    False when anything is missing, truncated, corrupt or miscounted.
+    """
+    manifest_path = os.path.join(backup_dir, CHECKSUM_FILE)
+    if not os.path.exists(manifest_path):
+        return {"ok": False, "error": f"{CHECKSUM_FILE} not found", "problems": []}
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+
+    problems = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        file_checks = [executor.submit(_check_file, backup_dir, rel, exp)
+                       for rel, exp in manifest["files"].items()]
+        row_checks = [executor.submit(_check_rows, backup_dir, key, exp)
+                      for key, exp in manifest["tables"].items()] if check_rows else []
+        blob_checks = []
+        snapshot = os.path.join(backup_dir, MANIFEST_NAME)
+        if deep and os.path.exists(snapshot):
+            with open(snapshot, 'r', encoding='utf-8') as f:
+                hashes = {e["hash"] for e in json.load(f)["files"]}
+            blob_checks = [executor.submit(_check_blob, h) for h in sorted(hashes)]
+        for kind, checks in (("file", file_checks), ("table", row_checks), ("blob", blob_checks)):
+            for future in checks:
+                name, status, detail = future.result()
+                if status != "ok":
+                    problems.append({"kind": kind, "name": name, "status": status, "detail": detail})
+
+    return {
+        "ok": not problems,
+        "files_checked": len(file_checks),
+        "tables_checked": len(row_checks),
+        "blobs_checked": len(blob_checks),
+        "problems": problems,
+    }
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Verify a DentalFlow backup")
+    parser.add_argument("backup_dir")
+    parser.add_argument("--workers", type=int, default=VERIFY_WORKERS)
+    parser.add_argument("--skip-rows", action="store_true", help="Only check file hashes")
+    parser.add_argument("--deep", action="store_true", help="Also re-hash source snapshot blobs")
+    args = parser.parse_args()
+
+    report = verify_backup(args.backup_dir, args.workers, not args.skip_rows, args.deep)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""Continuous backup from a PostgreSQL logical replication slot.
+
+Full and incremental dumps leave hours between recovery points. The
+streamer consumes a wal2json slot and appends every committed transaction
+to change segments under <latest DB backup>/wal/, so the base backup plus
+its segments can be restored to any commit (restore.py wal --until).
+
+Segments are written as .part files and renamed once complete; only then
+is the flushed position confirmed to the slot, so the server keeps the WAL
+until it is on disk and a crash never loses committed changes. Replaying a
+transaction twice is harmless (replay upserts by primary key), which keeps
+restarts and base-backup switches simple.
+
+Server requirements: wal_level = logical, the wal2json plugin and a role
+with the REPLICATION attribute. To try it against a local Postgres:
+
+    python wal_stream.py --seconds 120        # stream for two minutes
+    python wal_stream.py --drop-slot          # remove the slot again
+
+A slot that is not consumed makes the server retain WAL without limit, so
+drop it when continuous backup is switched off for good.
+"""
+import os
+import json
+import time
+import shutil
+import select
+import argparse
+import logging
+import threading
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extras
+
+from config import (
+    DATABASE_URL, BACKUP_ROOT, COMPRESSION_CODEC,
+    WAL_SLOT_NAME, WAL_SEGMENT_MAX_CHANGES, WAL_SEGMENT_MAX_SECONDS,
+)
+from catalog import latest_db_backup
+from compression import CompressedWriter, codec_extension
+
+logger = logging.getLogger(__name__)
+
+WAL_DIR_NAME = "wal"
+INDEX_NAME = "segments.jsonl"
+FEEDBACK_SECONDS = 10
+RECONNECT_SECONDS = 5
+WAL2JSON_OPTIONS = {"format-version": "2", "include-timestamp": "1", "include-lsn": "1", "include-pk": "1"}
+
+def lsn_to_int(lsn):
+    hi, lo = lsn.split('/')
+    return (int(hi, 16) << 32) + int(lo, 16)
+
+def int_to_lsn(value):
+    return f"{value >> 32:X}/{value & 0xFFFFFFFF:X}"
+
+def list_segments(wal_dir):
+    """Index entries of the segments in wal_dir, oldest first."""
+    path = os.path.join(wal_dir, INDEX_NAME)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return sorted(entries, key=lambda e: lsn_to_int(e['end_lsn']))
+
+def get_slot_lag(conn, slot=WAL_SLOT_NAME):
+    """Bytes of WAL the server holds for the slot beyond its confirmed position."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), confirmed_flush_lsn)::bigint, active
+            FROM pg_replication_slots WHERE slot_name = %s
+        """, (slot,))
+        row = cur.fetchone()
+    conn.rollback()
+    return {"lag_bytes": row[0], "slot_active": row[1]} if row else None
+
+class WalStreamer:
+    """Consumes the slot on a background thread and writes change segments."""
+
+    def __init__(self, dsn=DATABASE_URL, slot=WAL_SLOT_NAME, max_changes=WAL_SEGMENT_MAX_CHANGES,
+                 max_seconds=WAL_SEGMENT_MAX_SECONDS, codec=COMPRESSION_CODEC):
+        self.dsn = dsn
+        self.slot = slot
+        self.max_changes = max_changes
+        self.max_seconds = max_seconds
+        self.codec = codec
+        self._stop = threading.Event()
+        self._thread = None
+        self._batch = []
+        self._batch_changes = 0
+        self._batch_started = None
+        self.base_id = None
+        self.received_lsn = 0
+        self.flushed_lsn = 0
+        self.last_commit_ts = None
+        self.last_flush_at = None
+        self.segments_written = 0
+        self.error = None
+
+    # --- lifecycle ---
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="wal-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=30)
+
+    def run(self, seconds=None):
+        """Stream until stop() (or for `seconds`), reconnecting after errors."""
+        deadline = time.time() + seconds if seconds else None
+        while not self._stop.is_set() and not (deadline and time.time() >= deadline):
+            try:
+                self._stream(deadline)
+                self.error = None
+            except Exception as e:
+                self.error = str(e)
+                logger.error(f"WAL stream interrupted: {e}; reconnecting in {RECONNECT_SECONDS}s")
+                # Unconfirmed transactions are sent again by the server after reconnecting
+                self._reset_batch()
+                self._stop.wait(RECONNECT_SECONDS)
+
+    # --- streaming ---
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, connection_factory=psycopg2.extras.LogicalReplicationConnection)
+        cur = conn.cursor()
+        try:
+            cur.create_replication_slot(self.slot, output_plugin="wal2json")
+            logger.info(f"Created replication slot {self.slot}")
+        except psycopg2.errors.DuplicateObject:
+            pass
+        cur.start_replication(slot_name=self.slot, decode=True, options=WAL2JSON_OPTIONS)
+        return conn, cur
+
+    def _stream(self, deadline):
+        conn, cur = self._connect()
+        logger.info(f"Streaming changes from slot {self.slot}")
+        tx = None
+        last_feedback = time.time()
+        try:
+            while not self._stop.is_set() and not (deadline and time.time() >= deadline):
+                msg = cur.read_message()
+                if msg is None:
+                    if self._batch and time.time() - self._batch_started >= self.max_seconds:
+                        self._flush(cur)
+                    if time.time() - last_feedback >= FEEDBACK_SECONDS:
+                        # Keepalive; re-sends the last confirmed position
+                        cur.send_feedback(flush_lsn=self.flushed_lsn, reply=True)
+                        last_feedback = time.time()
+                    select.select([cur], [], [], 1.0)
+                    continue
+
+                change = json.loads(msg.payload)
+                action = change.get("action")
+                if action == "B":
+                    tx = {"xid": change.get("xid"), "changes": []}
+                elif action == "C" and tx is not None:
+                    self.received_lsn = msg.data_start
+                    self.last_commit_ts = change.get("timestamp")
+                    if tx["changes"]:
+                        tx.update(lsn=int_to_lsn(msg.data_start), commit_ts=change.get("timestamp"))
+                        self._add(tx, msg.data_start)
+                    elif not self._batch:
+                        # Nothing pending: confirm empty transactions so the slot
+                        # does not pin WAL while the tables are idle
+                        self.flushed_lsn = msg.data_start
+                    tx = None
+                    if self._batch_changes >= self.max_changes:
+                        self._flush(cur)
+                elif action in ("I", "U", "D", "T") and tx is not None:
+                    tx["changes"].append(change)
+            if self._batch:
+                self._flush(cur)
+        finally:
+            conn.close()
+
+    def _add(self, tx, lsn):
+        if not self._batch:
+            self._batch_started = time.time()
+        self._batch.append((lsn, tx))
+        self._batch_changes += len(tx["changes"])
+
+    def _reset_batch(self):
+        self._batch = []
+        self._batch_changes = 0
+        self._batch_started = None
+
+    def _flush(self, cur):
+        end = self._write_segment(self._batch)
+        cur.send_feedback(flush_lsn=end, reply=True)
+        self.flushed_lsn = end
+        self.last_flush_at = time.time()
+        self._reset_batch()
+
+    def _wal_dir(self):
+        """wal/ of the newest DB backup, switching over when a new base appears."""
+        base = latest_db_backup()
+        if not base:
+            raise RuntimeError("No DB backup to attach WAL segments to; take a full DB backup first")
+        wal_dir = os.path.join(BACKUP_ROOT, base['id'], WAL_DIR_NAME)
+        if base['id'] != self.base_id:
+            os.makedirs(wal_dir, exist_ok=True)
+            if self.base_id:
+                self._carry_over(os.path.join(BACKUP_ROOT, self.base_id, WAL_DIR_NAME), wal_dir, base)
+            logger.info(f"WAL segments now go to backup {base['id']}")
+            self.base_id = base['id']
+        return wal_dir
+
+    def _carry_over(self, old_dir, new_dir, base):
+        """Copy the previous base's segments that may hold changes the new base missed."""
+        since = (base.get('snapshot') or {}).get('wal_lsn')
+        since = lsn_to_int(since) if since else 0
+        for entry in list_segments(old_dir):
+            if lsn_to_int(entry['end_lsn']) < since:
+                continue
+            src, dst = os.path.join(old_dir, entry['file']), os.path.join(new_dir, entry['file'])
+            if not os.path.exists(dst):
+                try:
+                    os.link(src, dst)
+                except OSError:
+                    shutil.copyfile(src, dst)
+                self._append_index(new_dir, entry)
+
+    def _append_index(self, wal_dir, entry):
+        with open(os.path.join(wal_dir, INDEX_NAME), 'a') as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_segment(self, batch):
+        wal_dir = self._wal_dir()
+        start, end = batch[0][0], batch[-1][0]
+        name = f"wal_{start:016X}_{end:016X}.jsonl{codec_extension(self.codec)}"
+        tmp = os.path.join(wal_dir, name + ".part")
+        writer = CompressedWriter(tmp, self.codec)
+        try:
+            for _, tx in batch:
+                writer.write((json.dumps(tx, default=str) + "\n").encode('utf-8'))
+        finally:
+            writer.close()
+        with open(tmp, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(wal_dir, name))
+        self._append_index(wal_dir, {
+            "file": name,
+            "start_lsn": int_to_lsn(start),
+            "end_lsn": int_to_lsn(end),
+            "first_commit_ts": batch[0][1]["commit_ts"],
+            "last_commit_ts": batch[-1][1]["commit_ts"],
+            "transactions": len(batch),
+            "changes": sum(len(tx["changes"]) for _, tx in batch),
+        })
+        self.segments_written += 1
+        logger.info(f"WAL segment {name}: {len(batch)} transactions")
+        return end
+
+    # --- reporting ---
+
+    @property
+    def pending_changes(self):
+        return self._batch_changes
+
+    def status(self):
+        report = {
+            "running": self.running,
+            "slot": self.slot,
+            "base_id": self.base_id,
+            "received_lsn": int_to_lsn(self.received_lsn),
+            "flushed_lsn": int_to_lsn(self.flushed_lsn),
+            "last_commit_ts": self.last_commit_ts,
+            "pending_transactions": len(self._batch),
+            "pending_changes": self.pending_changes,
+            "seconds_since_flush": round(time.time() - self.last_flush_at, 1) if self.last_flush_at else None,
+            "segments_written": self.segments_written,
+            "error": self.error,
+        }
+        try:
+            conn = psycopg2.connect(self.dsn)
+            try:
+                report.update(get_slot_lag(conn, self.slot) or {"lag_bytes": None})
+            finally:
+                conn.close()
+        except psycopg2.Error as e:
+            report["lag_error"] = str(e)
+        return report
+
+def drop_slot(dsn=DATABASE_URL, slot=WAL_SLOT_NAME):
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_drop_replication_slot(%s)", (slot,))
+        conn.commit()
+    finally:
+        conn.close()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Continuous WAL backup from a logical replication slot")
+    parser.add_argument("--dsn", default=DATABASE_URL)
+    parser.add_argument("--slot", default=WAL_SLOT_NAME)
+    parser.add_argument("--seconds", type=int, help="Stop after this many seconds (default: run until Ctrl+C)")
+    parser.add_argument("--drop-slot", action="store_true", help="Drop the replication slot and exit")
+    args = parser.parse_args()
+
+    if args.drop_slot:
+        drop_slot(args.dsn, args.slot)
+        print(f"Dropped slot {args.slot}")
+        return
+    streamer = WalStreamer(args.dsn, args.slot)
+    try:
+        streamer.run(args.seconds)
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(streamer.status(), indent=2))
+
+if __name__ == "__main__":
+    main()